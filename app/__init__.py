@@ -0,0 +1,7 @@
+# app/__init__.py
+
+from dotenv import load_dotenv
+
+# Before any submodule reads its settings with os.getenv at import
+# (DATABASE_URL in app.core.db, the LLM_*/JOB_*/cache knobs, ...)
+load_dotenv()
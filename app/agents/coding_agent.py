@@ -1,15 +1,10 @@
 # app/agents/coding_agent.py
 
-import os
 import json
-from typing import Dict, Any
-from dotenv import load_dotenv
-from openai import OpenAI
+from typing import Dict, Any, List, Iterator
 
 from app.core.mcp import BaseAgent
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 SYSTEM_PROMPT = """You are a senior interview mentor who writes correct, clean code and clear explanations.
 Given a problem statement and (optionally) a target language, produce a structured solution.
@@ -32,13 +27,11 @@ Guidelines:
 - If language not specified, default to 'python'."""
 
 class CodingAgent(BaseAgent):
-    def run(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        input_data = {
-            "problem": "...",
-            "language": "python"  # optional
-        }
-        """
+    route = "coding"
+    reads = ("last_problem",)
+    writes = ("last_solution", "last_solution_problem")
+
+    def _messages(self, input_data: Dict[str, Any]) -> List[Dict[str, str]]:
         problem = input_data.get("problem", "").strip()
         lang = input_data.get("language", "").strip().lower()
 
@@ -46,20 +39,15 @@ class CodingAgent(BaseAgent):
             raise ValueError("CodingAgent requires 'problem' text.")
 
         user_prompt = f"Problem:\n{problem}\n\nPreferred language: {lang or 'python'}"
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
 
-        resp = client.chat.completions.create(
-            model="gpt-3.5-turbo",   # upgrade to gpt-4 if you want better quality
-            temperature=0.2,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ]
-        )
-
-        text = resp.choices[0].message.content.strip()
-
+    def _finish(self, text: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        lang = input_data.get("language", "").strip().lower()
         try:
-            data = json.loads(text)
+            data = self.parse_json(text, expect=dict)
         except json.JSONDecodeError:
             # fallback: wrap in minimal structure
             data = {
@@ -69,6 +57,45 @@ class CodingAgent(BaseAgent):
                 "complexity": {"time": "N/A", "space": "N/A"}
             }
 
-        # Save to shared context for convenience
+        # Save to shared context for convenience; remember which problem it
+        # solves so feedback on another problem doesn't use it as a reference
         self.update_context("last_solution", data)
+        self.update_context("last_solution_problem", input_data.get("problem", ""))
         return data
+
+    def run(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        input_data = {
+            "problem": "...",
+            "language": "python"  # optional
+        }
+        """
+        text = self.chat(
+            temperature=0.2,
+            messages=self._messages(input_data)
+        ).strip()
+        return self._finish(text, input_data)
+
+    async def arun(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        text = (await self.achat(
+            temperature=0.2,
+            messages=self._messages(input_data)
+        )).strip()
+        return self._finish(text, input_data)
+
+    def run_from_context(self) -> Dict[str, Any]:
+        return self.run({"problem": self.get_context("last_problem", "")})
+
+    def run_stream(self, input_data: Dict[str, Any]) -> Iterator[str]:
+        """
+        Yield the raw model output as it streams in. Once complete, the parsed
+        solution is stored under 'last_solution' exactly as run() does.
+        """
+        parts = []
+        for delta in self.chat_stream(
+            temperature=0.2,
+            messages=self._messages(input_data)
+        ):
+            parts.append(delta)
+            yield delta
+        self._finish("".join(parts).strip(), input_data)
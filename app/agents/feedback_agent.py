@@ -1,15 +1,13 @@
 # app/agents/feedback_agent.py
 
-import os
 import json
-from typing import Dict, Any
-from dotenv import load_dotenv
-from openai import OpenAI
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional
 
 from app.core.mcp import BaseAgent
+from app.core.tracing import tracer
+from app.core.sandbox import SANDBOX_ENABLED, submit_profile, collect_profile, acollect_profile
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 SYSTEM_PROMPT = """You are a strict but constructive interviewer.
 Grade the candidate's code for correctness, clarity, efficiency, and edge cases.
@@ -23,15 +21,22 @@ Return ONLY JSON like:
   "potential_bugs": ["...", "..."]
 }"""
 
+def _normalise(problem: Any) -> str:
+    return " ".join(str(problem or "").split()).lower()
+
+
+def _cancel(pending: Optional[Dict[str, Future]]) -> None:
+    """Drop sandbox runs nobody will collect; queued ones never start, running ones hit the wall timeout."""
+    for future in (pending or {}).values():
+        future.cancel()
+
+
 class FeedbackAgent(BaseAgent):
-    def run(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        input_data = {
-            "problem": "...",
-            "code": "...",
-            "language": "python"
-        }
-        """
+    route = "feedback"
+    # Python submissions are also run in the sandbox while the model reviews them
+    measure = SANDBOX_ENABLED
+
+    def _messages(self, input_data: Dict[str, Any]) -> List[Dict[str, str]]:
         problem = input_data.get("problem", "").strip()
         code = input_data.get("code", "").strip()
         language = input_data.get("language", "python")
@@ -40,20 +45,43 @@ class FeedbackAgent(BaseAgent):
             raise ValueError("FeedbackAgent requires 'code'.")
 
         user_prompt = f"Problem:\n{problem}\n\nLanguage: {language}\n\nCandidate's code:\n{code}"
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
 
-        resp = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            temperature=0.2,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ]
-        )
+    def _reference(self, input_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The last python solution, but only if it was generated for this same problem."""
+        solution = self.get_context("last_solution")
+        if not isinstance(solution, dict) or not solution.get("solution_code"):
+            return None
+        if str(solution.get("language", "python")).lower() != "python":
+            return None
+        problem = _normalise(input_data.get("problem", ""))
+        if not problem or problem != _normalise(self.get_context("last_solution_problem", "")):
+            return None
+        return solution
 
-        text = resp.choices[0].message.content.strip()
+    def _start_measuring(self, input_data: Dict[str, Any]) -> Optional[Dict[str, Future]]:
+        """Submit the code (and the matching python reference solution, if any) to the sandbox."""
+        if not self.measure or str(input_data.get("language", "python")).lower() != "python":
+            return None
+        solution = self._reference(input_data)
+        reference = solution["solution_code"] if solution else None
+        return submit_profile(input_data.get("code", ""), reference=reference)
 
+    def _performance(self, measured: Dict[str, Any], input_data: Dict[str, Any]) -> Dict[str, Any]:
+        # Put the reference's self-reported complexity next to the measured one
+        if "reference" in measured:
+            solution = self._reference(input_data) or {}
+            claimed = solution.get("complexity")
+            measured["reference"]["claimed"] = claimed.get("time") if isinstance(claimed, dict) else claimed
+        return measured
+
+    def _finish(self, text: str, input_data: Dict[str, Any],
+                measured: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         try:
-            data = json.loads(text)
+            data = self.parse_json(text, expect=dict)
         except json.JSONDecodeError:
             data = {
                 "score": 3,
@@ -62,7 +90,52 @@ class FeedbackAgent(BaseAgent):
                 "improvements": ["Return was not valid JSON; displaying raw text."],
                 "potential_bugs": []
             }
+        if measured is not None:
+            data["performance"] = self._performance(measured, input_data)
 
         # Save last feedback in context
         self.update_context("last_feedback", data)
         return data
+
+    def run(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        input_data = {
+            "problem": "...",
+            "code": "...",
+            "language": "python"
+        }
+        Python code is also executed in the sandbox; measured timings, the
+        fitted complexity, hot spots and peak memory land under "performance".
+        """
+        messages = self._messages(input_data)
+        pending = self._start_measuring(input_data)
+        try:
+            text = self.chat(
+                temperature=0.2,
+                messages=messages
+            ).strip()
+        except BaseException:
+            _cancel(pending)
+            raise
+        if not pending:
+            return self._finish(text, input_data)
+        with tracer.span("sandbox.collect"):
+            measured = collect_profile(pending)
+        return self._finish(text, input_data, measured)
+
+    async def arun(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        messages = self._messages(input_data)
+        pending = self._start_measuring(input_data)
+        try:
+            text = (await self.achat(
+                temperature=0.2,
+                messages=messages
+            )).strip()
+        except BaseException:
+            _cancel(pending)
+            raise
+        if not pending:
+            return self._finish(text, input_data)
+        with tracer.span("sandbox.collect"):
+            measured = await acollect_profile(pending)
+        return self._finish(text, input_data, measured)
@@ -2,17 +2,23 @@
 
 import os
 import json
-from typing import Dict, Any, List
-from dotenv import load_dotenv
-from openai import OpenAI
+import asyncio
+import logging
+import threading
+import time
+from uuid import uuid4
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from typing import Dict, Any, List, Optional
 from app.core.mcp import BaseAgent
+from app.core.tracing import tracer
+from app.core.question_bank import question_bank
+
+log = logging.getLogger(__name__)
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 GENERATOR_PROMPT = """You are a seasoned technical interviewer.
-Given a role and focus area, generate 5 concise interview questions.
-Return ONLY JSON: {"questions": ["Q1", "Q2", "Q3", "Q4", "Q5"]}.
+Given a role and focus area, generate the requested number of concise interview questions.
+Return ONLY JSON: {"questions": ["Q1", "Q2", ...]}.
 Questions should be specific and non-trivial.
 """
 
@@ -26,40 +32,158 @@ Return ONLY JSON:
 Be concise and concrete.
 """
 
+BATCH_EVALUATOR_PROMPT = """You are an interviewer evaluating a full mock interview.
+For each numbered question/answer pair, grade the answer briefly.
+Return ONLY JSON:
+{"evaluations": [
+  {"n": 1, "score": 1-5, "feedback": "<2-4 sentences constructive feedback>", "key_points": ["...", "..."]},
+  ...
+]}
+Return exactly one evaluation per pair, in order. Be concise and concrete.
+"""
+
+# Background grading: one small pool per process; futures are keyed by
+# session id so they survive agent re-instantiation on every UI rerun.
+_eval_pool = ThreadPoolExecutor(max_workers=int(os.getenv("MOCK_EVAL_WORKERS", "4")))
+_pending: Dict[str, Dict[int, Future]] = {}
+_pending_touched: Dict[str, float] = {}
+_pending_lock = threading.Lock()
+# Grades nobody collected (the tab was closed) are dropped after this long
+PENDING_TTL = float(os.getenv("MOCK_PENDING_TTL", "3600"))
+
+QUESTIONS_PER_SESSION = 5
+
+
+def _drop_pending(sid: str) -> None:
+    """Forget a session's background grades; ones not started yet are cancelled."""
+    with _pending_lock:
+        futures = _pending.pop(sid, {})
+        _pending_touched.pop(sid, None)
+    for fut in futures.values():
+        fut.cancel()
+
+
+def _prune_pending() -> None:
+    cutoff = time.monotonic() - PENDING_TTL
+    with _pending_lock:
+        stale = [sid for sid, t in _pending_touched.items() if t < cutoff]
+    for sid in stale:
+        _drop_pending(sid)
+
+
+def _bank_session(role: str, focus: str, generated: List[str], served: List[str]) -> None:
+    question_bank.add(role, focus, generated)
+    question_bank.mark_served(role, focus, served)
+    question_bank.sync_stats()
+
+
+def _log_bank_error(fut: Future) -> None:
+    if not fut.cancelled() and fut.exception() is not None:
+        log.error("question bank bookkeeping failed", exc_info=fut.exception())
+
 
 class MockInterviewAgent(BaseAgent):
     """Handles mock interview sessions and evaluations."""
+    route = "mock"
+    reads = ("mock_role", "mock_focus")
+    writes = ("mock_session",)
 
-    def start_session(self, role: str, focus: str) -> Dict[str, Any]:
-        """Generate 5 interview questions for the given role and focus."""
-        user_prompt = f"Role: {role}\nFocus: {focus}\nGenerate 5 questions."
-        resp = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            temperature=0.5,
-            messages=[
-                {"role": "system", "content": GENERATOR_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-        )
+    def _question_messages(self, role: str, focus: str, n: int = QUESTIONS_PER_SESSION,
+                           avoid: List[str] = ()) -> List[Dict[str, str]]:
+        user_prompt = f"Role: {role}\nFocus: {focus}\nGenerate {n} questions."
+        if avoid:
+            user_prompt += "\nDo not repeat any of these:\n" + "\n".join(f"- {q}" for q in avoid)
+        return [
+            {"role": "system", "content": GENERATOR_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def _from_bank(self, role: str, focus: str, user: Optional[str]) -> List[str]:
+        """Unseen banked questions for this user; the previous session's are skipped too."""
+        previous = (self.get_context("mock_session", {}) or {}).get("questions", [])
+        return question_bank.take(role, focus, QUESTIONS_PER_SESSION, user=user, exclude=previous)
 
-        text = resp.choices[0].message.content.strip()
+    def _parse_questions(self, text: str, banked: List[str]) -> List[str]:
         try:
-            data = json.loads(text)
-            questions: List[str] = data.get("questions", [])
+            questions = self.parse_json(text, expect=dict).get("questions", [])
         except json.JSONDecodeError:
             questions = []
+        seen = {q.strip().lower() for q in banked}
+        return [q for q in questions if isinstance(q, str) and q.strip().lower() not in seen]
 
+    def start_session(self, role: str, focus: str, user: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Start a session of 5 questions for the given role and focus. Questions
+        come from the shared bank when enough exist that `user` (the token
+        mock turns are logged under) has not answered; the LLM only tops up.
+        """
+        banked = self._from_bank(role, focus, user)
+        generated: List[str] = []
+        if len(banked) < QUESTIONS_PER_SESSION:
+            # Not cached: a repeated role/focus should still get new questions
+            text = self.chat(
+                temperature=0.5,
+                messages=self._question_messages(role, focus, QUESTIONS_PER_SESSION - len(banked), banked),
+                cache=False,
+            ).strip()
+            generated = self._parse_questions(text, banked)
+        return self._new_session(role, focus, banked, generated)
+
+    async def astart_session(self, role: str, focus: str, user: Optional[str] = None) -> Dict[str, Any]:
+        banked = await asyncio.to_thread(self._from_bank, role, focus, user)
+        generated: List[str] = []
+        if len(banked) < QUESTIONS_PER_SESSION:
+            text = (await self.achat(
+                temperature=0.5,
+                messages=self._question_messages(role, focus, QUESTIONS_PER_SESSION - len(banked), banked),
+                cache=False,
+            )).strip()
+            generated = self._parse_questions(text, banked)
+        return self._new_session(role, focus, banked, generated)
+
+    def _new_session(self, role: str, focus: str, banked: List[str], generated: List[str]) -> Dict[str, Any]:
+        # the previous session has ended: its ungraded answers won't be collected
+        previous = self.get_context("mock_session", {}) or {}
+        if previous.get("id"):
+            _drop_pending(previous["id"])
+        questions = (banked + generated)[:QUESTIONS_PER_SESSION]
         session = {
+            "id": uuid4().hex,
             "role": role,
             "focus": focus,
             "questions": questions,
+            "from_bank": len(banked),
             "index": 0,
-            "history": [],  # list of {q, a, eval}
+            "history": [],  # list of {q, a, eval}; eval is None until graded
         }
 
         self.update_context("mock_session", session)
+        # Bank bookkeeping stays off the session-start path
+        _eval_pool.submit(_bank_session, role, focus, generated, questions).add_done_callback(_log_bank_error)
         return session
 
+    def _eval_messages(self, question: str, answer: str) -> List[Dict[str, str]]:
+        user_prompt = f"Question:\n{question}\n\nCandidate answer:\n{answer}"
+        return [
+            {"role": "system", "content": EVALUATOR_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def _parse_evaluation(self, text: str) -> Dict[str, Any]:
+        try:
+            evaluation = self.parse_json(text, expect=dict)
+        except json.JSONDecodeError:
+            evaluation = {"score": 3, "feedback": text[:400], "key_points": []}
+        return evaluation
+
+    def _evaluate(self, question: str, answer: str) -> Dict[str, Any]:
+        text = self.chat(
+            temperature=0.2,
+            task="evaluate",
+            messages=self._eval_messages(question, answer),
+        ).strip()
+        return self._parse_evaluation(text)
+
     def evaluate_answer(self, answer: str) -> Dict[str, Any]:
         """Evaluate the candidate's answer to the current question."""
         session = self.get_context("mock_session", {})
@@ -69,23 +193,27 @@ class MockInterviewAgent(BaseAgent):
             return {"done": True}
 
         q = qs[idx]
-        user_prompt = f"Question:\n{q}\n\nCandidate answer:\n{answer}"
+        return self._record_evaluation(session, q, answer, self._evaluate(q, answer))
 
-        resp = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            temperature=0.2,
-            messages=[
-                {"role": "system", "content": EVALUATOR_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-        )
+    async def aevaluate_answer(self, answer: str) -> Dict[str, Any]:
+        session = self.get_context("mock_session", {})
+        idx = session.get("index", 0)
+        qs = session.get("questions", [])
+        if idx >= len(qs):
+            return {"done": True}
 
-        text = resp.choices[0].message.content.strip()
-        try:
-            evaluation = json.loads(text)
-        except json.JSONDecodeError:
-            evaluation = {"score": 3, "feedback": text[:400], "key_points": []}
+        q = qs[idx]
+        text = (await self.achat(
+            temperature=0.2,
+            task="evaluate",
+            messages=self._eval_messages(q, answer),
+        )).strip()
+        return self._record_evaluation(session, q, answer, self._parse_evaluation(text))
 
+    def _record_evaluation(self, session: Dict[str, Any], q: str, answer: str,
+                           evaluation: Dict[str, Any]) -> Dict[str, Any]:
+        idx = session.get("index", 0)
+        qs = session.get("questions", [])
         # Update session state
         session["history"].append({"q": q, "a": answer, "eval": evaluation})
         session["index"] = idx + 1
@@ -98,15 +226,144 @@ class MockInterviewAgent(BaseAgent):
             "done": session["index"] >= len(qs),
         }
 
+    def submit_answer(self, answer: str, grading: str = "background") -> Dict[str, Any]:
+        """
+        Record the answer and advance to the next question without waiting
+        for a grade. grading="background" evaluates it on a worker thread
+        (pick it up with collect_evaluations()); grading="batch" defers it to
+        evaluate_batch() at the end of the session.
+        """
+        session = self.get_context("mock_session", {})
+        idx = session.get("index", 0)
+        qs = session.get("questions", [])
+        if idx >= len(qs):
+            return {"done": True}
+
+        q = qs[idx]
+        session["history"].append({"q": q, "a": answer, "eval": None})
+        session["index"] = idx + 1
+        self.update_context("mock_session", session)
+
+        if grading == "background":
+            _prune_pending()
+            fut = _eval_pool.submit(tracer.bind(self._evaluate), q, answer)
+            sid = session.get("id", "")
+            with _pending_lock:
+                _pending.setdefault(sid, {})[len(session["history"]) - 1] = fut
+                _pending_touched[sid] = time.monotonic()
+
+        return {
+            "question": q,
+            "next_index": session["index"],
+            "done": session["index"] >= len(qs),
+        }
+
+    def pending_count(self) -> int:
+        session = self.get_context("mock_session", {}) or {}
+        with _pending_lock:
+            return len(_pending.get(session.get("id", ""), {}))
+
+    def collect_evaluations(self, timeout: Optional[float] = 0) -> List[Dict[str, Any]]:
+        """
+        Attach finished background grades to session["history"]. Returns the
+        newly graded turns ({question, answer, evaluation}) exactly once, so
+        the caller can log them. timeout=None waits for all outstanding ones.
+        """
+        session = self.get_context("mock_session", {}) or {}
+        sid = session.get("id", "")
+        with _pending_lock:
+            futures = dict(_pending.get(sid, {}))
+        if not futures:
+            return []
+        if timeout != 0:
+            wait(list(futures.values()), timeout=timeout)
+
+        done = []
+        history = session.get("history", [])
+        for pos, fut in sorted(futures.items()):
+            if not fut.done():
+                continue
+            try:
+                evaluation = fut.result()
+            except Exception as e:
+                evaluation = {"score": None, "feedback": f"Evaluation failed: {e}", "key_points": []}
+            history[pos]["eval"] = evaluation
+            done.append({"question": history[pos]["q"], "answer": history[pos]["a"], "evaluation": evaluation})
+            with _pending_lock:
+                _pending.get(sid, {}).pop(pos, None)
+                if not _pending.get(sid):
+                    _pending.pop(sid, None)
+                    _pending_touched.pop(sid, None)
+
+        if done:
+            self.update_context("mock_session", session)
+        return done
+
+    def evaluate_batch(self) -> List[Dict[str, Any]]:
+        """
+        Grade every ungraded answer of the session in a single LLM call.
+        Returns the newly graded turns, like collect_evaluations().
+        """
+        session = self.get_context("mock_session", {}) or {}
+        history = session.get("history", [])
+        with _pending_lock:
+            in_flight = set(_pending.get(session.get("id", ""), {}))
+        todo = [i for i, h in enumerate(history) if h.get("eval") is None and i not in in_flight]
+        if not todo:
+            return []
+
+        pairs = "\n\n".join(
+            f"{n}. Question:\n{history[i]['q']}\nCandidate answer:\n{history[i]['a']}"
+            for n, i in enumerate(todo, start=1)
+        )
+        text = self.chat(
+            temperature=0.2,
+            task="evaluate",
+            messages=[
+                {"role": "system", "content": BATCH_EVALUATOR_PROMPT},
+                {"role": "user", "content": pairs},
+            ],
+        ).strip()
+        try:
+            evaluations = self.parse_json(text, expect=dict).get("evaluations", [])
+        except json.JSONDecodeError:
+            evaluations = []
+        # keyed by the pair number the model echoes back, not by position:
+        # a skipped or reordered item must not shift grades onto other answers
+        by_n: Dict[int, Dict[str, Any]] = {}
+        for ev in evaluations if isinstance(evaluations, list) else []:
+            try:
+                by_n.setdefault(int(ev.get("n")), ev)
+            except (AttributeError, TypeError, ValueError):
+                continue
+
+        done = []
+        for n, i in enumerate(todo, start=1):
+            ev = by_n.get(n)
+            if ev is None:
+                # missing or malformed in the batch answer: grade this one individually
+                ev = self._evaluate(history[i]["q"], history[i]["a"])
+            ev.pop("n", None)
+            history[i]["eval"] = ev
+            done.append({"question": history[i]["q"], "answer": history[i]["a"], "evaluation": ev})
+
+        self.update_context("mock_session", session)
+        return done
+
+    def run_from_context(self) -> Dict[str, Any]:
+        return self.start_session(self.get_context("mock_role", ""), self.get_context("mock_focus", ""))
+
     def run(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Generic shim to satisfy BaseAgent.run() and dispatch to the correct action.
 
         input_data = {
-          "action": "start" | "answer",
+          "action": "start" | "answer" | "submit" | "collect" | "grade_all",
           "role": "...",      # required for action=start
           "focus": "...",     # required for action=start
-          "answer": "..."     # required for action=answer
+          "user": "...",      # optional for action=start: skip bank questions this user answered
+          "answer": "...",    # required for action=answer | submit
+          "grading": "background" | "batch"   # optional for action=submit
         }
         """
         action = (input_data or {}).get("action", "start")
@@ -114,11 +371,30 @@ class MockInterviewAgent(BaseAgent):
         if action == "start":
             role = input_data.get("role", "")
             focus = input_data.get("focus", "")
-            return self.start_session(role, focus)
+            return self.start_session(role, focus, input_data.get("user"))
 
         elif action == "answer":
             ans = input_data.get("answer", "")
             return self.evaluate_answer(ans)
 
+        elif action == "submit":
+            return self.submit_answer(input_data.get("answer", ""), input_data.get("grading", "background"))
+
+        elif action == "collect":
+            return {"evaluated": self.collect_evaluations(input_data.get("timeout", 0))}
+
+        elif action == "grade_all":
+            return {"evaluated": self.evaluate_batch()}
+
         else:
             return {"error": f"Unknown action: {action}"}
+
+    async def arun(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Async dispatch; start/answer use the async client, the rest run on a thread."""
+        action = (input_data or {}).get("action", "start")
+        if action == "start":
+            return await self.astart_session(input_data.get("role", ""), input_data.get("focus", ""),
+                                             input_data.get("user"))
+        if action == "answer":
+            return await self.aevaluate_answer(input_data.get("answer", ""))
+        return await super().arun(input_data)
@@ -2,13 +2,14 @@
 
 import os
 import json
-from typing import Dict, Any, List
-from dotenv import load_dotenv
-from openai import OpenAI
+from typing import Dict, Any, List, Iterator, Optional
 from app.core.mcp import BaseAgent
+from app.core.json_stream import ArrayItemStream
+from app.core.plan_text import parse_plan, dedupe_topics
+
+# Local parses scoring below this fall back to the LLM
+MIN_CONFIDENCE = float(os.getenv("PLAN_PARSE_MIN_CONFIDENCE", "0.6"))
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 SYSTEM_PROMPT = """You are a precise syllabus parser.
 Input: a 4-week interview prep plan in free text.
@@ -20,29 +21,88 @@ Return ONLY valid JSON with keys: weeks.
 """
 
 class PlanParserAgent(BaseAgent):
-    def run(self, plan_text: str) -> Dict[str, Any]:
+    route = "parser"
+    reads = ("interview_plan",)
+    writes = ("topics_by_week", "topics_flat")
+    source = None   # "local" or "llm" for the last parse
+
+    def _messages(self, plan_text: str) -> List[Dict[str, str]]:
         if not plan_text or not plan_text.strip():
             raise ValueError("PlanParserAgent requires non-empty plan text.")
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": plan_text}
+        ]
 
-        resp = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            temperature=0.2,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": plan_text}
-            ],
-        )
+    def _local(self, plan_text: str) -> Optional[Dict[str, Any]]:
+        """Deterministic parse of the planner's layout, or None when it is not confident."""
+        if not plan_text or not plan_text.strip():
+            raise ValueError("PlanParserAgent requires non-empty plan text.")
+        data, confidence = parse_plan(plan_text)
+        self.source = "local" if confidence >= MIN_CONFIDENCE else "llm"
+        return self._store(data) if self.source == "local" else None
 
-        text = resp.choices[0].message.content.strip()
-        try:
-            data = json.loads(text)
-        except json.JSONDecodeError:
-            data = {"weeks": []}
+    def _store(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        weeks = []
+        for w in data.get("weeks", []):
+            if isinstance(w, dict):
+                weeks.append({**w, "topics": dedupe_topics(w.get("topics", []))})
+        data = {**data, "weeks": weeks}
 
         self.update_context("topics_by_week", data)
         # Also flatten topics
         flat = []
-        for w in data.get("weeks", []):
-            flat.extend(w.get("topics", []))
+        for w in weeks:
+            flat.extend(w["topics"])
         self.update_context("topics_flat", list(dict.fromkeys(flat)))  # unique preserve order
         return data
+
+    def _finish(self, text: str) -> Dict[str, Any]:
+        try:
+            data = self.parse_json(text, expect=dict)
+        except json.JSONDecodeError:
+            data = {"weeks": []}
+        return self._store(data)
+
+    def run(self, plan_text: str) -> Dict[str, Any]:
+        data = self._local(plan_text)
+        if data is not None:
+            return data
+        text = self.chat(
+            temperature=0.2,
+            messages=self._messages(plan_text),
+        ).strip()
+        return self._finish(text)
+
+    async def arun(self, plan_text: str) -> Dict[str, Any]:
+        data = self._local(plan_text)
+        if data is not None:
+            return data
+        text = (await self.achat(
+            temperature=0.2,
+            messages=self._messages(plan_text),
+        )).strip()
+        return self._finish(text)
+
+    def run_from_context(self) -> Dict[str, Any]:
+        return self.run(self.get_context("interview_plan", ""))
+
+    def stream_weeks(self, plan_text: str) -> Iterator[Dict[str, Any]]:
+        """Yield each {"week": n, "topics": [...]} entry as soon as it is parsed."""
+        data = self._local(plan_text)
+        if data is not None:
+            yield from data["weeks"]
+            return
+        weeks = ArrayItemStream("weeks")
+        parts = []
+        for delta in self.chat_stream(
+            temperature=0.2,
+            messages=self._messages(plan_text),
+        ):
+            parts.append(delta)
+            for week in weeks.feed(delta):
+                if isinstance(week, dict):
+                    yield week
+        data = self._finish("".join(parts).strip())
+        if weeks.count == 0:
+            yield from data.get("weeks", [])
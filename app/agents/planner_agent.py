@@ -1,15 +1,16 @@
 # app/agents/planner_agent.py
 
-import os
-from openai import OpenAI
 from app.core.mcp import BaseAgent
-from dotenv import load_dotenv
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 class PlannerAgent(BaseAgent):
-    def run(self, input_data):
+    route = "planner"
+    # temperature 0.7: users expect a fresh plan when they regenerate
+    cache_enabled = False
+    reads = ("goal",)
+    writes = ("interview_plan",)
+
+    def _messages(self, input_data):
         prompt = f"""
         You are an expert career coach. Break down the following interview goal into a 4-week plan with weekly objectives.
 
@@ -21,13 +22,34 @@ class PlannerAgent(BaseAgent):
         Week 3: ...
         Week 4: ...
         """
+        return [{"role": "user", "content": prompt}]
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
+    def run(self, input_data):
+        plan = self.chat(
+            messages=self._messages(input_data),
             temperature=0.7
         )
+        self.update_context("interview_plan", plan)
+        return plan
 
-        plan = response.choices[0].message.content
+    async def arun(self, input_data):
+        plan = await self.achat(
+            messages=self._messages(input_data),
+            temperature=0.7
+        )
         self.update_context("interview_plan", plan)
         return plan
+
+    def run_from_context(self):
+        return self.run(self.get_context("goal", ""))
+
+    def run_stream(self, input_data):
+        """Yield the plan as it is generated; stores it in context once complete."""
+        parts = []
+        for delta in self.chat_stream(
+            messages=self._messages(input_data),
+            temperature=0.7
+        ):
+            parts.append(delta)
+            yield delta
+        self.update_context("interview_plan", "".join(parts))
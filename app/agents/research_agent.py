@@ -2,14 +2,16 @@
 
 import os
 import json
-from typing import List, Dict, Any
-from dotenv import load_dotenv
-from openai import OpenAI
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 
 from app.core.mcp import BaseAgent
+from app.core.tracing import tracer
+from app.core.json_stream import ArrayItemStream
+from app.core.topic_index import topic_index
+from app.core.search_index import search_index
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 RESEARCH_SYSTEM_PROMPT = """You are a precise research assistant.
 Given a technical topic, return a curated list of the best learning resources.
@@ -18,31 +20,53 @@ Return a concise JSON object with a 'resources' array.
 Each resource must have: title, url, type (doc|tutorial|practice|video|paper), and why (1-2 bullet points as a single string).
 Keep results high quality, current, and non-duplicative. Do not include paywalled links when a free equivalent exists."""
 
+# Upper bound on simultaneous LLM calls when researching a whole plan
+MAX_PARALLEL_RESEARCH = int(os.getenv("RESEARCH_MAX_WORKERS", "6"))
+
+
+def _failed(topic: str, error: Exception) -> List[Dict[str, Any]]:
+    """The single note item standing in for a topic whose research failed."""
+    return [{
+        "title": f"Research failed for: {topic}",
+        "url": "",
+        "type": "note",
+        "why": str(error)[:400],
+    }]
+
+
 class ResearchAgent(BaseAgent):
     """
     ResearchAgent collects high-quality resources for a given topic.
     It uses the OpenAI chat API to curate a structured list of sources.
     """
+    route = "research"
+    reads = ("topics_flat",)
+    writes = ("resources::*",)
 
-    def run(self, topic: str) -> List[Dict[str, Any]]:
+    def _messages(self, topic: str) -> List[Dict[str, str]]:
         user_prompt = f"Topic: {topic}\nReturn exactly 5–7 items."
+        return [
+            {"role": "system", "content": RESEARCH_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ]
 
-        resp = client.chat.completions.create(
-            model="gpt-3.5-turbo",  # economical; swap to gpt-4 for higher quality
-            temperature=0.2,
-            messages=[
-                {"role": "system", "content": RESEARCH_SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ]
-        )
-
-        text = resp.choices[0].message.content.strip()
+    def _reuse(self, topic: str) -> Optional[List[Dict[str, Any]]]:
+        """Resources of an already researched near-duplicate topic, stored as if freshly researched."""
+        if not self.cache_enabled:
+            return None
+        hit = topic_index.lookup(topic)
+        if hit is None:
+            return None
+        return self._store(topic, hit["resources"])
 
+    def _finish(self, topic: str, text: str) -> List[Dict[str, Any]]:
         # Try to parse JSON; if it fails, wrap as a single note.
         data = {"resources": []}
         try:
-            data = json.loads(text)
+            data = self.parse_json(text, expect=dict)
             resources = data.get("resources", [])
+            if resources:
+                topic_index.add(topic, resources)
         except json.JSONDecodeError:
             resources = [{
                 "title": f"Suggested reading for: {topic}",
@@ -50,7 +74,9 @@ class ResearchAgent(BaseAgent):
                 "type": "note",
                 "why": text[:1000]
             }]
+        return self._store(topic, resources)
 
+    def _store(self, topic: str, resources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         # Persist into shared context for other agents / UI
         key = f"resources::{topic.lower()}"
         self.update_context(key, resources)
@@ -58,4 +84,94 @@ class ResearchAgent(BaseAgent):
         # Also keep a simple "last_resources" pointer
         self.update_context("last_resources", {"topic": topic, "items": resources})
 
+        # Make them findable from the Search tab
+        search_index.add(topic, resources)
+
         return resources
+
+    def run(self, topic: str) -> List[Dict[str, Any]]:
+        reused = self._reuse(topic)
+        if reused is not None:
+            return reused
+        text = self.chat(
+            temperature=0.2,
+            messages=self._messages(topic)
+        ).strip()
+        return self._finish(topic, text)
+
+    async def arun(self, topic: str) -> List[Dict[str, Any]]:
+        reused = await asyncio.to_thread(self._reuse, topic)
+        if reused is not None:
+            return reused
+        text = (await self.achat(
+            temperature=0.2,
+            messages=self._messages(topic)
+        )).strip()
+        return self._finish(topic, text)
+
+    async def arun_many(self, topics: Iterable[str], max_concurrency: int = MAX_PARALLEL_RESEARCH
+                        ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Async fan-out over several topics with bounded concurrency. Like
+        run_many(), a topic that fails gets a single note item instead of
+        aborting the whole batch.
+        """
+        sem = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def one(t: str):
+            async with sem:
+                try:
+                    return t, await self.arun(t)
+                except Exception as e:
+                    return t, _failed(t, e)
+
+        topics = list(dict.fromkeys(t for t in topics if t and t.strip()))
+        return dict(await asyncio.gather(*(one(t) for t in topics)))
+
+    def stream_resources(self, topic: str) -> Iterator[Dict[str, Any]]:
+        """
+        Yield each resource as soon as its JSON object closes in the response
+        stream. The complete list is stored in context exactly as run() does.
+        """
+        reused = self._reuse(topic)
+        if reused is not None:
+            yield from reused
+            return
+        items = ArrayItemStream("resources")
+        parts = []
+        for delta in self.chat_stream(
+            temperature=0.2,
+            messages=self._messages(topic)
+        ):
+            parts.append(delta)
+            for item in items.feed(delta):
+                if isinstance(item, dict):
+                    yield item
+        resources = self._finish(topic, "".join(parts).strip())
+        if items.count == 0:
+            # nothing streamed (non-JSON answer): surface the fallback note
+            yield from resources
+
+    def run_from_context(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Research every topic in topics_flat (the plan's extracted topics)."""
+        return dict(self.run_many(self.get_context("topics_flat", []) or []))
+
+    def run_many(self, topics: Iterable[str], max_workers: int = MAX_PARALLEL_RESEARCH
+                 ) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Research several topics concurrently and yield (topic, resources)
+        as each one completes. Results are stored under resources::<topic>
+        exactly as with run(). A topic that fails yields a single note item
+        instead of aborting the whole batch.
+        """
+        topics = list(dict.fromkeys(t for t in topics if t and t.strip()))
+        if not topics:
+            return
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(topics)))) as pool:
+            futures = {pool.submit(tracer.bind(self.run), t): t for t in topics}
+            for fut in as_completed(futures):
+                topic = futures[fut]
+                try:
+                    yield topic, fut.result()
+                except Exception as e:
+                    yield topic, _failed(topic, e)
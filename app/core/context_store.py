@@ -1,18 +1,290 @@
 # app/core/context_store.py
 
+import os
+import json
+import time
+import weakref
+import threading
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+# Process-wide memory budget for stores that have a spill backend
+MAX_CONTEXT_BYTES = int(os.getenv("CONTEXT_MEMORY_BUDGET", str(64 * 1024 * 1024)))
+IDLE_SECONDS = int(os.getenv("CONTEXT_IDLE_SECONDS", "1800"))
+
+
+def _size_of(value) -> int:
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str))
+    except (TypeError, ValueError):
+        return 64
+
+
+class MemoryBudget:
+    """
+    Caps the bytes held by all spill-enabled ContextStores in this process.
+    When the total exceeds `max_bytes`, the least recently used values are
+    written to their store's spill backend and dropped from memory; values
+    idle for longer than `idle_seconds` are spilled regardless. Spilled
+    values are loaded back transparently on the next get().
+    """
+
+    def __init__(self, max_bytes: int = MAX_CONTEXT_BYTES, idle_seconds: int = IDLE_SECONDS):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.total = 0
+        self.spills = 0
+        self._stores = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._last_idle_scan = time.time()
+
+    def register(self, store: "ContextStore") -> None:
+        with self._lock:
+            self._stores.add(store)
+
+    def forget(self, store: "ContextStore") -> None:
+        with self._lock:
+            self.total -= sum(store._sizes.values())
+            self._stores.discard(store)
+
+    def note(self, delta: int) -> None:
+        with self._lock:
+            self.total += delta
+
+    def enforce(self) -> None:
+        now = time.time()
+        scan_idle = now - self._last_idle_scan > min(60, self.idle_seconds)
+        if self.total <= self.max_bytes and not scan_idle:
+            return
+        with self._lock:
+            self._last_idle_scan = now
+            entries = []
+            for store in list(self._stores):
+                for key, size in list(store._sizes.items()):
+                    entries.append((store._atime.get(key, 0), size, store, key))
+            # recount from live stores: sessions that were garbage-collected drop out
+            self.total = sum(e[1] for e in entries)
+            entries.sort(key=lambda e: e[0])   # least recently used first
+            target = int(self.max_bytes * 0.9)
+            for atime, size, store, key in entries:
+                idle = now - atime > self.idle_seconds
+                if not idle and self.total <= target:
+                    break
+                freed = store._spill(key)
+                self.total -= freed
+                self.spills += 1 if freed else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stores": len(self._stores),
+            "resident_bytes": self.total,
+            "max_bytes": self.max_bytes,
+            "spills": self.spills,
+        }
+
+
+budget = MemoryBudget()
+
+
 class ContextStore:
-    def __init__(self):
+    def __init__(self, namespace: Optional[str] = None, spill=None):
         self.store = {}
+        # agents may write from worker threads (e.g. fan-out research)
+        self._lock = threading.RLock()
+        # Change tracking so backends persist deltas instead of the whole dict.
+        # Changes and deletions are stamped with `version`; each sink (the
+        # session file, a DB namespace, ...) keeps the version it last saved
+        # up to, so one sink's save doesn't hide changes from another.
+        self.version = 0
+        self.versions: Dict[str, int] = {}
+        self._dirty: Dict[str, int] = {}      # key -> version of its last change
+        self._deleted: Dict[str, int] = {}    # key -> version of its deletion
+        self._sinks: Dict[str, Dict[str, Any]] = {}   # sink -> {"seen": version, "keys": set, "deleted": set}
+        # Optional spill-to-backend support (see MemoryBudget); `spill` must
+        # provide put(namespace, key, value, version), get(namespace, key),
+        # delete(namespace, key) and clear(namespace). A spill row exists only
+        # while its key is in _spilled.
+        self.namespace = namespace
+        self._spill_backend = spill
+        self._spilled: Set[str] = set()
+        self._sizes: Dict[str, int] = {}
+        self._atime: Dict[str, float] = {}
+        if spill is not None:
+            budget.register(self)
+
+    def _touch(self, key):
+        self.version += 1
+        self.versions[key] = self.version
+        self._dirty[key] = self.version
+        self._deleted.pop(key, None)
+
+    def _mark_deleted(self, key):
+        self.version += 1
+        self.versions.pop(key, None)
+        self._dirty.pop(key, None)
+        self._deleted[key] = self.version
+
+    def _mark_loaded(self, key):
+        """A value that came from persistence: nothing to save for it."""
+        self._dirty.pop(key, None)
+        self._deleted.pop(key, None)
+
+    def _account(self, key, value) -> int:
+        """Update size/access bookkeeping for a resident value; returns the size delta."""
+        if self._spill_backend is None:
+            return 0
+        size = _size_of(value)
+        delta = size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+        self._atime[key] = time.time()
+        return delta
+
+    def _drop_spilled(self, key):
+        """Remove a key's spill row once it is resident again or deleted (call under self._lock)."""
+        if key in self._spilled:
+            self._spilled.discard(key)
+            self._spill_backend.delete(self.namespace, key)
+
+    def _after_write(self, delta: int):
+        # called without holding self._lock (budget lock is always taken first)
+        if self._spill_backend is not None:
+            budget.note(delta)
+            budget.enforce()
 
     def set(self, key, value):
-        self.store[key] = value
+        with self._lock:
+            self._drop_spilled(key)
+            self.store[key] = value
+            self._touch(key)
+            delta = self._account(key, value)
+        self._after_write(delta)
 
     def get(self, key, default=None):
-        return self.store.get(key, default)
+        if key in self.store:
+            if self._spill_backend is not None:
+                self._atime[key] = time.time()
+            return self.store.get(key, default)
+        if key in self._spilled:
+            return self._unspill(key, default)
+        return default
+
+    def keys(self) -> Set[str]:
+        """All keys, including spilled ones, without loading any values."""
+        return set(self.store) | self._spilled
 
     def get_all(self):
+        # Materializes spilled values; prefer keys()/get() on hot paths.
+        for k in list(self._spilled):
+            self.get(k)
         return self.store
 
     def update(self, key, func):
-        current = self.store.get(key)
-        self.store[key] = func(current)
+        current = self.get(key)
+        with self._lock:
+            current = self.store.get(key, current)
+            self._drop_spilled(key)
+            self.store[key] = func(current)
+            self._touch(key)
+            delta = self._account(key, self.store[key])
+        self._after_write(delta)
+
+    def delete(self, key):
+        freed = 0
+        with self._lock:
+            if key in self.store or key in self._spilled:
+                self.store.pop(key, None)
+                self._drop_spilled(key)
+                self._mark_deleted(key)
+                freed = self._sizes.pop(key, 0)
+                self._atime.pop(key, None)
+        self._after_write(-freed)
+
+    def load(self, data: Dict[str, Any]):
+        """Bulk-load persisted values without marking them dirty."""
+        delta = 0
+        with self._lock:
+            for k, v in data.items():
+                self._drop_spilled(k)
+                self.store[k] = v
+                self.version += 1
+                self.versions[k] = self.version
+                self._mark_loaded(k)
+                delta += self._account(k, v)
+        self._after_write(delta)
+
+    # --- spilling ---
+
+    def _spill(self, key) -> int:
+        """Write a resident value to the spill backend and drop it from memory."""
+        with self._lock:
+            if key not in self.store or self._spill_backend is None:
+                return 0
+            self._spill_backend.put(self.namespace, key, self.store[key], self.versions.get(key, 0))
+            del self.store[key]
+            # still dirty for the sinks: the spill table isn't necessarily
+            # where they save, and take_dirty() loads it back when needed
+            self._spilled.add(key)
+            self._atime.pop(key, None)
+            return self._sizes.pop(key, 0)
+
+    def _unspill(self, key, default=None):
+        value = self._spill_backend.get(self.namespace, key)
+        with self._lock:
+            if key in self.store:          # loaded concurrently
+                return self.store[key]
+            if key not in self._spilled:   # deleted meanwhile
+                return default
+            self._drop_spilled(key)
+            self.store[key] = value
+            delta = self._account(key, value)
+        self._after_write(delta)
+        return value
+
+    def close(self):
+        """Release this store's share of the memory budget and drop its spill rows."""
+        if self._spill_backend is not None:
+            budget.forget(self)
+            with self._lock:
+                if self._spilled:
+                    self._spill_backend.clear(self.namespace)
+                    self._spilled.clear()
+
+    # --- delta persistence ---
+
+    def _dirty_since(self, sink: str, advance: bool = True) -> Tuple[Set[str], Set[str]]:
+        """(changed keys, deleted keys) since `sink` last saved; advances its cursor."""
+        with self._lock:
+            state = self._sinks.setdefault(sink, {"seen": 0, "keys": set(), "deleted": set()})
+            keys = {k for k, v in self._dirty.items() if v > state["seen"]} | state["keys"]
+            deleted = {k for k, v in self._deleted.items() if v > state["seen"]} | state["deleted"]
+            if advance:
+                state.update(seen=self.version, keys=set(), deleted=set())
+            return keys, deleted
+
+    def dirty_keys(self, sink: str = "default") -> Set[str]:
+        return self._dirty_since(sink, advance=False)[0]
+
+    def take_dirty(self, sink: str = "default") -> Tuple[Dict[str, Any], Set[str]]:
+        """
+        Return ({key: value} changed since `sink` last saved, {deleted keys})
+        and move that sink's cursor; other sinks still see the changes. Call
+        mark_dirty() with the keys and the same sink if the save fails.
+        """
+        keys, deleted = self._dirty_since(sink)
+        with self._lock:
+            changed = {k: self.store[k] for k in keys if k in self.store}
+            spilled = [k for k in keys if k not in self.store and k in self._spilled]
+        for k in spilled:
+            value = self.get(k)
+            if k in self.keys():
+                changed[k] = value
+        return changed, deleted
+
+    def mark_dirty(self, keys: Iterable[str] = None, deleted: Iterable[str] = (), sink: str = "default"):
+        with self._lock:
+            state = self._sinks.setdefault(sink, {"seen": 0, "keys": set(), "deleted": set()})
+            for k in (self.keys() if keys is None else keys):
+                if k in self.store or k in self._spilled:
+                    state["keys"].add(k)
+            for k in deleted:
+                if k not in self.store and k not in self._spilled:
+                    state["deleted"].add(k)
@@ -1,15 +1,31 @@
 # app/core/db.py
 import os
-from typing import Optional, Dict, Any, List
+import re
+import json
+import time
+import queue
+import atexit
+import threading
+import uuid
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterator
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks; run one writer process per journal directory
+    fcntl = None
+
 from sqlalchemy import (
-    create_engine, Column, String, Integer, Text, TIMESTAMP, func
+    create_engine, Column, String, Integer, Float, Text, TIMESTAMP, Index, func, insert
 )
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.types import JSON as SA_JSON
 
+from app.core.metrics import metrics, instrument_engine
+from app.core.tracing import instrument_sessions
+
 # Choose JSON type that works both on Postgres and SQLite
 def _json_type_from_url(url: str):
     return JSONB if url.startswith("postgresql") else SA_JSON
@@ -19,6 +35,8 @@ JSONType = _json_type_from_url(DATABASE_URL)
 
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+instrument_engine(engine)
+instrument_sessions(SessionLocal)
 Base = declarative_base()
 
 # --- Tables ---
@@ -28,6 +46,15 @@ class KV(Base):
     key = Column(String(255), primary_key=True)
     value = Column(JSONType)
 
+class ContextEntry(Base):
+    """One row per context key, so saves write only the keys that changed."""
+    __tablename__ = "context_entries"
+    namespace = Column(String(128), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    value = Column(JSONType)
+    version = Column(Integer, default=0)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
 class MockQA(Base):
     __tablename__ = "mock_qa_history"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -37,11 +64,119 @@ class MockQA(Base):
     evaluation = Column(JSONType)                 # {"score":..., "feedback":..., "key_points":[...]}
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+    # Serves "WHERE session_id = ? AND id > ? ORDER BY id" (keyset pagination)
+    __table_args__ = (Index("ix_mock_qa_session_id_id", "session_id", "id"),)
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache"
+    key = Column(String(64), primary_key=True)     # sha256 of (model, messages, temperature)
+    agent = Column(String(64), index=True)
+    model = Column(String(64))
+    response = Column(Text, nullable=False)
+    hits = Column(Integer, default=0)
+    created_at = Column(Float)                    # epoch seconds
+    expires_at = Column(Float, index=True)        # NULL = never expires
+    last_accessed = Column(Float, index=True)     # drives LRU eviction
+
+class TopicIndexEntry(Base):
+    """Researched topic keyed by its canonical form (app/core/topic_index.py)."""
+    __tablename__ = "topic_index"
+    key = Column(String(255), primary_key=True)    # canonical topic (normalised, stemmed)
+    topic = Column(String(255))                    # topic as first researched
+    signature = Column(JSONType)                   # MinHash signature of the key's character n-grams
+    resources = Column(JSONType)
+    hits = Column(Integer, default=0)
+    updated_at = Column(Float, index=True)         # epoch seconds
+
+class TopicIndexBand(Base):
+    """LSH buckets: topics sharing any (band, bucket) are near-duplicate candidates."""
+    __tablename__ = "topic_index_bands"
+    band = Column(Integer, primary_key=True)
+    bucket = Column(String(16), primary_key=True)
+    key = Column(String(255), primary_key=True)
+
+class SearchDoc(Base):
+    """One curated resource in the full-text index (app/core/search_index.py)."""
+    __tablename__ = "search_docs"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    doc_key = Column(String(64), unique=True, nullable=False)   # sha1 of url (or title)
+    topics = Column(Text)                         # comma-separated topics it was curated for
+    title = Column(Text)
+    url = Column(Text)
+    type = Column(String(32))
+    why = Column(Text)
+    length = Column(Integer, default=0)           # indexed terms, for BM25 length normalisation
+    updated_at = Column(Float)
+
+class SearchPosting(Base):
+    __tablename__ = "search_postings"
+    term = Column(String(64), primary_key=True)
+    doc_id = Column(Integer, primary_key=True)
+    tf = Column(Integer, nullable=False)
+
+    # Deletes on re-index look postings up by document
+    __table_args__ = (Index("ix_search_postings_doc_id", "doc_id"),)
+
+class QuestionBankEntry(Base):
+    """Generated interview question, reusable across sessions (app/core/question_bank.py)."""
+    __tablename__ = "question_bank"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    role_key = Column(String(128), nullable=False)     # canonical role
+    focus_key = Column(String(128), nullable=False)    # canonical focus
+    question = Column(Text, nullable=False)
+    question_hash = Column(String(40), nullable=False)  # sha1 of the normalised question
+    times_served = Column(Integer, default=0)
+    answers = Column(Integer, default=0)               # from mock_qa_history
+    score_sum = Column(Float, default=0.0)
+    score_count = Column(Integer, default=0)
+    created_at = Column(Float)
+
+    # Session start: "WHERE role_key = ? AND focus_key = ?", ranked by times_served and stats
+    __table_args__ = (
+        Index("ix_question_bank_role_focus_served", "role_key", "focus_key", "times_served"),
+        Index("ux_question_bank_role_focus_hash", "role_key", "focus_key", "question_hash", unique=True),
+        Index("ix_question_bank_hash", "question_hash"),
+    )
+
+class Job(Base):
+    """Background agent call (app/core/jobs.py); outlives reruns and reconnects."""
+    __tablename__ = "jobs"
+    id = Column(String(32), primary_key=True)          # uuid4 hex
+    session_id = Column(String(64), nullable=False)    # session token that submitted it
+    kind = Column(String(32), nullable=False)          # key into app.core.jobs.HANDLERS
+    status = Column(String(16), nullable=False)        # queued | running | done | error | cancelled
+    payload = Column(JSONType)                         # {"args", "kwargs", "context"}
+    result = Column(JSONType)                          # {"value", "context"} once done
+    progress = Column(Text)                            # partial output of streaming handlers
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    worker = Column(String(64))
+    created_at = Column(Float)                         # epoch seconds
+    started_at = Column(Float)
+    heartbeat_at = Column(Float)
+    finished_at = Column(Float)
+    delivered_at = Column(Float)                       # result merged into the session's context
+
+    # Workers: "WHERE status = 'queued' ORDER BY created_at"; UI: a session's latest jobs
+    __table_args__ = (
+        Index("ix_jobs_status_created", "status", "created_at"),
+        Index("ix_jobs_session_created", "session_id", "created_at"),
+    )
+
 def init_db():
     Base.metadata.create_all(engine)
+    # create_all() skips indexes added to tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for idx in table.indexes:
+            idx.create(engine, checkfirst=True)
+    if WRITE_BEHIND:
+        # start the turn writer now so journals left by a crashed process are
+        # replayed at startup rather than on this process's first mock turn
+        get_turn_writer()
 
 # --- High-level helpers you can call from Streamlit ---
 
+@metrics.timed("db_helper_seconds", errors="db_helper_errors_total")
 def save_context_dict(context_dict: Dict[str, Any], key: str = "context") -> None:
     """Upsert entire context dict into KV."""
     with SessionLocal() as s:
@@ -53,12 +188,327 @@ def save_context_dict(context_dict: Dict[str, Any], key: str = "context") -> Non
             s.add(row)
         s.commit()
 
+@metrics.timed("db_helper_seconds", errors="db_helper_errors_total")
 def load_context_dict(key: str = "context") -> Dict[str, Any]:
     with SessionLocal() as s:
         row = s.get(KV, key)
         return row.value if row and row.value else {}
 
-def log_mock_turn(session_id: str, question: str, answer: str, evaluation: Dict[str, Any]) -> None:
+@metrics.timed("db_helper_seconds", errors="db_helper_errors_total")
+def save_context_delta(ctx, namespace: str = "context") -> int:
+    """
+    Persist only the keys of a ContextStore that changed since the last save
+    to this namespace (one row per key). Returns the number of rows written
+    or deleted.
+    """
+    sink = f"db:{namespace}"
+    changed, deleted = ctx.take_dirty(sink)
+    if not changed and not deleted:
+        return 0
+    try:
+        with SessionLocal() as s:
+            for k, v in changed.items():
+                s.merge(ContextEntry(namespace=namespace, key=k, value=v,
+                                     version=ctx.versions.get(k, 0)))
+            if deleted:
+                s.query(ContextEntry).filter(
+                    ContextEntry.namespace == namespace, ContextEntry.key.in_(deleted)
+                ).delete(synchronize_session=False)
+            s.commit()
+    except Exception:
+        ctx.mark_dirty(changed.keys(), deleted, sink=sink)
+        raise
+    return len(changed) + len(deleted)
+
+@metrics.timed("db_helper_seconds", errors="db_helper_errors_total")
+def load_context_entries(namespace: str = "context") -> Dict[str, Any]:
+    """Load a namespace's per-key rows, on top of any legacy whole-blob save."""
+    data = load_context_dict(namespace)
+    with SessionLocal() as s:
+        rows = s.query(ContextEntry.key, ContextEntry.value).filter(ContextEntry.namespace == namespace)
+        for k, v in rows:
+            data[k] = v
+    return data
+
+@metrics.timed("db_helper_seconds", errors="db_helper_errors_total")
+def compact_context_entries(namespace: str = "context") -> int:
+    """
+    Fold a legacy kv_store blob for this namespace into per-key rows and
+    drop it. Returns the number of live rows.
+    """
+    with SessionLocal() as s:
+        blob = s.get(KV, namespace)
+        if blob is not None:
+            existing = {k for (k,) in s.query(ContextEntry.key).filter(ContextEntry.namespace == namespace)}
+            for k, v in (blob.value or {}).items():
+                if k not in existing:
+                    s.add(ContextEntry(namespace=namespace, key=k, value=v, version=0))
+            s.delete(blob)
+        s.commit()
+        return s.query(ContextEntry).filter(ContextEntry.namespace == namespace).count()
+
+class ContextSpill:
+    """
+    Spill backend for ContextStore: parks evicted values in context_entries
+    under "spill::<namespace>", apart from the rows an explicit save writes,
+    so a spilled value never shows up as saved state on the next load.
+    """
+
+    @staticmethod
+    def _namespace(namespace: str) -> str:
+        return f"spill::{namespace}"
+
+    def put(self, namespace: str, key: str, value: Any, version: int = 0) -> None:
+        with SessionLocal() as s:
+            s.merge(ContextEntry(namespace=self._namespace(namespace), key=key, value=value, version=version))
+            s.commit()
+
+    def get(self, namespace: str, key: str) -> Any:
+        with SessionLocal() as s:
+            row = s.get(ContextEntry, (self._namespace(namespace), key))
+            return row.value if row else None
+
+    def delete(self, namespace: str, key: str) -> None:
+        with SessionLocal() as s:
+            s.query(ContextEntry).filter(
+                ContextEntry.namespace == self._namespace(namespace), ContextEntry.key == key
+            ).delete(synchronize_session=False)
+            s.commit()
+
+    def clear(self, namespace: str) -> None:
+        with SessionLocal() as s:
+            s.query(ContextEntry).filter(
+                ContextEntry.namespace == self._namespace(namespace)
+            ).delete(synchronize_session=False)
+            s.commit()
+
+# --- Write-behind logging of mock turns ---
+
+WRITE_BEHIND = os.getenv("MOCK_WRITE_BEHIND", "1").lower() not in ("0", "false", "no")
+TURN_JOURNAL_PATH = Path(os.getenv("MOCK_TURN_JOURNAL", "mock_turns.journal"))
+
+def _lock_journal(f) -> bool:
+    """Take an exclusive, non-blocking lock on an open journal; held until the file is closed."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+class MockTurnWriter:
+    """
+    Buffers MockQA inserts on a background thread and writes them with one
+    bulk INSERT per batch, flushing when `batch_size` turns are queued or
+    `flush_interval` seconds have passed.
+
+    Crash safety: every turn is appended to a journal before it is queued.
+    Each writer owns its own journal (`<journal_path>.<pid>-<id>`) and holds
+    a lock on it for its lifetime, so processes sharing a directory never
+    mix lines. A checkpoint file records how many journal lines are
+    committed. On start, journals nobody holds (left by a process that
+    died) are adopted: lines past their checkpoint are copied into this
+    writer's journal and replayed. Delivery is therefore at-least-once (a
+    crash between COMMIT and the checkpoint write can replay one batch).
+
+    Backpressure: at most `max_pending` turns are queued; submit() blocks
+    up to `timeout` seconds and then raises queue.Full.
+    """
+
+    def __init__(self, journal_path: Path = TURN_JOURNAL_PATH, batch_size: int = 100,
+                 flush_interval: float = 0.5, max_pending: int = 5000):
+        self.base_path = Path(journal_path)
+        self.journal_path = self.base_path.with_name(
+            f"{self.base_path.name}.{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        self.ckpt_path = Path(str(self.journal_path) + ".ckpt")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._q: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_pending)
+        self._journal_lock = threading.Lock()
+        self._journal_lines = 0      # lines in the journal file
+        self._committed_lines = 0    # journal lines known to be in the DB
+        self._wake = threading.Event()
+        self._stop = False
+        self._failing = False        # last write attempt failed; retrying
+        self.stats = {"submitted": 0, "written": 0, "batches": 0, "errors": 0, "replayed": 0}
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        _lock_journal(self._journal)
+        pending = self._recover_journals()
+        self._thread = threading.Thread(target=self._run, name="mock-turn-writer", daemon=True)
+        self._thread.start()
+        for turn in pending:
+            self._q.put(turn)
+        self.stats["replayed"] = len(pending)
+        self._wake.set()
+
+    # --- journal ---
+
+    def _orphans(self) -> List[Path]:
+        """Journals from earlier writers next to ours (including the old shared one)."""
+        own = re.compile(re.escape(self.base_path.name) + r"(\.\d+-[0-9a-f]+)?")
+        return sorted(p for p in self.base_path.parent.glob(self.base_path.name + "*")
+                      if own.fullmatch(p.name) and p != self.journal_path)
+
+    def _recover_journals(self) -> List[Dict[str, Any]]:
+        """Adopt uncommitted turns from journals whose writer is gone; return them."""
+        pending: List[Dict[str, Any]] = []
+        for path in self._orphans():
+            try:
+                f = open(path, "r", encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            with f:
+                if not _lock_journal(f):
+                    continue  # its writer is alive
+                try:
+                    if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino:
+                        continue  # adopted and removed by another process meanwhile
+                except FileNotFoundError:
+                    continue
+                ckpt = Path(str(path) + ".ckpt")
+                done = int(ckpt.read_text() or 0) if ckpt.exists() else 0
+                for line in f.readlines()[done:]:
+                    try:
+                        pending.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue  # torn write at crash time
+                # make them durable in our journal before dropping the orphan
+                for turn in pending[self._journal_lines:]:
+                    self._journal.write(json.dumps(turn, ensure_ascii=False, default=str) + "\n")
+                self._journal.flush()
+                self._journal_lines = len(pending)
+                ckpt.unlink(missing_ok=True)
+                path.unlink(missing_ok=True)
+        return pending
+
+    def _checkpoint(self, n: int) -> None:
+        with self._journal_lock:
+            self._committed_lines += n
+            if self._committed_lines >= self._journal_lines and self._q.empty():
+                # everything journaled is committed: start the journal afresh
+                self._journal.truncate(0)
+                self.ckpt_path.unlink(missing_ok=True)
+                self._journal_lines = self._committed_lines = 0
+            else:
+                self.ckpt_path.write_text(str(self._committed_lines))
+
+    # --- API ---
+
+    def submit(self, turn: Dict[str, Any], timeout: Optional[float] = 5.0) -> None:
+        """Journal and enqueue one turn. Raises queue.Full under sustained backpressure."""
+        with self._journal_lock:
+            if self._q.full():
+                # wait outside the journal lock would reorder lines; a short block here is fine
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while self._q.full():
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise queue.Full("mock turn writer backlog is full")
+                    self._wake.set()
+                    time.sleep(0.01)
+            self._journal.write(json.dumps(turn, ensure_ascii=False, default=str) + "\n")
+            self._journal.flush()
+            self._journal_lines += 1
+            self._q.put_nowait(turn)
+        self.stats["submitted"] += 1
+        if self._q.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def pending(self) -> int:
+        return self._q.unfinished_tasks
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything queued so far. Returns False if it timed out or
+        the database is failing (the turns stay journaled and queued)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._q.unfinished_tasks:
+            self._wake.set()
+            if self._failing or self._stop:
+                return False
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        self.flush(timeout)
+        self._stop = True
+        self._wake.set()
+        self._thread.join(timeout)
+        with self._journal_lock:
+            if not self._journal_lines:
+                # nothing left to replay; otherwise the journal stays for the next process
+                self.journal_path.unlink(missing_ok=True)
+                self.ckpt_path.unlink(missing_ok=True)
+            self._journal.close()
+
+    # --- worker ---
+
+    def _run(self) -> None:
+        while not self._stop:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            while not self._q.empty() and not self._stop:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._q.get_nowait())
+                    except queue.Empty:
+                        break
+                if batch:
+                    self._write(batch)
+        # stopping: whatever is still queued stays in the journal for the next start
+        while True:
+            try:
+                self._q.get_nowait()
+            except queue.Empty:
+                break
+            self._q.task_done()
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            while True:
+                try:
+                    with SessionLocal() as s:
+                        s.execute(insert(MockQA), batch)
+                        s.commit()
+                    break
+                except Exception:
+                    # keep the turns (they are journaled) and retry after a pause
+                    self.stats["errors"] += 1
+                    self._failing = True
+                    time.sleep(min(5.0, self.flush_interval * 2))
+                    if self._stop:
+                        return
+            self._failing = False
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+            self._checkpoint(len(batch))
+        finally:
+            for _ in batch:
+                self._q.task_done()
+
+_turn_writer: Optional[MockTurnWriter] = None
+_turn_writer_lock = threading.Lock()
+
+def get_turn_writer() -> MockTurnWriter:
+    """Process-wide writer; created (and its journal replayed) on first use."""
+    global _turn_writer
+    if _turn_writer is None:
+        with _turn_writer_lock:
+            if _turn_writer is None:
+                _turn_writer = MockTurnWriter()
+                atexit.register(_turn_writer.close)
+    return _turn_writer
+
+@metrics.timed("db_helper_seconds", errors="db_helper_errors_total")
+def log_mock_turn(session_id: str, question: str, answer: str, evaluation: Dict[str, Any],
+                  sync: bool = not WRITE_BEHIND) -> None:
+    if not sync:
+        get_turn_writer().submit({
+            "session_id": session_id, "question": question, "answer": answer, "evaluation": evaluation
+        })
+        return
     with SessionLocal() as s:
         rec = MockQA(
             session_id=session_id, question=question, answer=answer, evaluation=evaluation
@@ -66,16 +516,45 @@ def log_mock_turn(session_id: str, question: str, answer: str, evaluation: Dict[
         s.add(rec)
         s.commit()
 
-def fetch_mock_history(session_id: str) -> List[Dict[str, Any]]:
-    with SessionLocal() as s:
-        rows = s.query(MockQA).filter(MockQA.session_id == session_id).order_by(MockQA.id).all()
-        out = []
-        for r in rows:
-            out.append({
-                "id": r.id,
-                "question": r.question,
-                "answer": r.answer,
-                "evaluation": r.evaluation,
-                "created_at": r.created_at.isoformat() if isinstance(r.created_at, datetime) else str(r.created_at)
-            })
-        return out
+def _mock_row_to_dict(r: MockQA) -> Dict[str, Any]:
+    return {
+        "id": r.id,
+        "question": r.question,
+        "answer": r.answer,
+        "evaluation": r.evaluation,
+        "created_at": r.created_at.isoformat() if isinstance(r.created_at, datetime) else str(r.created_at)
+    }
+
+def iter_mock_history(session_id: str, page_size: int = 50, after_id: int = 0) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield a session's turns in pages of `page_size`, oldest first, using
+    keyset pagination on (session_id, id): each page costs one index range
+    scan regardless of how many turns precede it.
+    """
+    last_id = after_id
+    while True:
+        with SessionLocal() as s:
+            rows = (
+                s.query(MockQA)
+                .filter(MockQA.session_id == session_id, MockQA.id > last_id)
+                .order_by(MockQA.id)
+                .limit(page_size)
+                .all()
+            )
+            page = [_mock_row_to_dict(r) for r in rows]
+        if not page:
+            return
+        yield page
+        last_id = page[-1]["id"]
+        if len(page) < page_size:
+            return
+
+@metrics.timed("db_helper_seconds", errors="db_helper_errors_total")
+def fetch_mock_history(session_id: str, since_id: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Turns with id > since_id (all of them by default), oldest first."""
+    out: List[Dict[str, Any]] = []
+    for page in iter_mock_history(session_id, page_size=min(limit or 200, 200), after_id=since_id):
+        out.extend(page)
+        if limit is not None and len(out) >= limit:
+            return out[:limit]
+    return out
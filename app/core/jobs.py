@@ -0,0 +1,342 @@
+# app/core/jobs.py
+"""
+Durable background jobs for agent calls.
+
+The UI submits a job (a row in `jobs`) and keeps only its id; a pool of
+worker threads claims queued rows, runs the agent against a scratch
+context seeded with the keys it reads, and stores the return value plus
+the context keys it wrote. Results therefore survive reruns, tab switches
+and reconnects, and the pool size (JOB_WORKERS per process, plus any
+`python -m app.core.jobs` worker processes) is independent of how many
+UI sessions are open.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import importlib
+import threading
+from typing import Optional, Dict, Any, List, Tuple, NamedTuple, Iterable
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.db import SessionLocal, Job
+from app.core.context_store import ContextStore
+from app.core.tracing import tracer
+
+log = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))      # seconds between queue scans when idle
+STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "120"))          # running jobs without a heartbeat this long are requeued
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+HEARTBEAT = 10.0
+FINISH_RETRIES = 5          # attempts at writing a job's outcome before leaving it to the stale sweep
+PROGRESS_EVERY = 0.5        # seconds between progress writes of streaming handlers
+
+PENDING = ("queued", "running")
+
+
+class JobSpec(NamedTuple):
+    module: str
+    cls: str
+    method: str
+    reads: Tuple[str, ...] = ()        # context keys copied into the job at submit time
+    stream: bool = False               # method yields text deltas or items, mirrored into Job.progress
+    result_key: Optional[str] = None   # return this context key instead of the method's value
+    extras: Tuple[str, ...] = ()       # agent attributes worth reporting (e.g. the parser's source)
+
+
+HANDLERS: Dict[str, JobSpec] = {
+    "plan": JobSpec("app.agents.planner_agent", "PlannerAgent", "run_stream", stream=True),
+    "research": JobSpec("app.agents.research_agent", "ResearchAgent", "stream_resources", stream=True),
+    "research_many": JobSpec("app.agents.research_agent", "ResearchAgent", "run_many", stream=True),
+    "parse": JobSpec("app.agents.plan_parser_agent", "PlanParserAgent", "stream_weeks", stream=True,
+                     result_key="topics_by_week", extras=("source",)),
+    "coding": JobSpec("app.agents.coding_agent", "CodingAgent", "run_stream", stream=True,
+                      result_key="last_solution"),
+    "feedback": JobSpec("app.agents.feedback_agent", "FeedbackAgent", "run",
+                        reads=("last_solution", "last_solution_problem")),
+    "mock_start": JobSpec("app.agents.mock_agent", "MockInterviewAgent", "start_session", reads=("mock_session",)),
+}
+
+
+def _jsonable(value: Any) -> Any:
+    return json.loads(json.dumps(value, default=str))
+
+
+def _row(job: Job) -> Dict[str, Any]:
+    return {
+        "id": job.id, "session_id": job.session_id, "kind": job.kind, "status": job.status,
+        "args": (job.payload or {}).get("args", []), "result": job.result, "progress": job.progress,
+        "error": job.error, "attempts": job.attempts,
+        "created_at": job.created_at, "started_at": job.started_at, "finished_at": job.finished_at,
+        "delivered_at": job.delivered_at,
+    }
+
+
+class JobQueue:
+    """
+    DB-backed job queue with an in-process worker pool. Claims are a
+    conditional UPDATE (status 'queued' -> 'running'), so any number of
+    threads and processes can share the table; jobs whose worker stops
+    heartbeating are requeued up to MAX_ATTEMPTS times.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._threads: List[threading.Thread] = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._running: Dict[str, float] = {}      # job id -> claim time, for heartbeats
+        self.counters = {"submitted": 0, "done": 0, "failed": 0, "requeued": 0}
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self.counters[field] += 1
+
+    # --- producer side ---
+
+    def submit(self, session_id: str, kind: str, args: Iterable[Any] = (), kwargs: Optional[Dict[str, Any]] = None,
+               context: Optional[Dict[str, Any]] = None) -> str:
+        """Queue a job and return its id; `context` seeds the keys the handler reads."""
+        spec = HANDLERS[kind]
+        seed = {k: v for k, v in (context or {}).items() if k in spec.reads and v is not None}
+        job_id = uuid.uuid4().hex
+        with SessionLocal() as s:
+            s.add(Job(id=job_id, session_id=session_id, kind=kind, status="queued", attempts=0,
+                      payload=_jsonable({"args": list(args), "kwargs": kwargs or {}, "context": seed,
+                                         # the job's spans join the submitter's trace
+                                         "trace": tracer.current_ref()}),
+                      created_at=time.time()))
+            s.commit()
+        self._count("submitted")
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with SessionLocal() as s:
+            job = s.get(Job, job_id)
+            return _row(job) if job is not None else None
+
+    def latest(self, session_id: str, limit: int = 50) -> Dict[str, Dict[str, Any]]:
+        """The most recent job of each kind for a session (rebuilds UI state after a reconnect)."""
+        with SessionLocal() as s:
+            rows = s.scalars(
+                select(Job).where(Job.session_id == session_id).order_by(Job.created_at.desc()).limit(limit)
+            ).all()
+        out: Dict[str, Dict[str, Any]] = {}
+        for job in rows:
+            out.setdefault(job.kind, _row(job))
+        return out
+
+    def mark_delivered(self, job_id: str) -> bool:
+        """Record that the job's context writes were applied; False if already delivered."""
+        with SessionLocal() as s:
+            res = s.execute(update(Job).where(Job.id == job_id, Job.delivered_at.is_(None))
+                            .values(delivered_at=time.time()))
+            s.commit()
+            return res.rowcount == 1
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that no worker has claimed yet."""
+        with SessionLocal() as s:
+            res = s.execute(update(Job).where(Job.id == job_id, Job.status == "queued")
+                            .values(status="cancelled", finished_at=time.time()))
+            s.commit()
+            return res.rowcount == 1
+
+    # --- worker side ---
+
+    def start(self, workers: Optional[int] = None) -> None:
+        """Start the worker threads once per process (no-op when already running or workers == 0)."""
+        with self._lock:
+            if self._threads:
+                return
+            n = self.workers if workers is None else workers
+            for i in range(n):
+                t = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            if n:
+                t = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def _claim(self) -> Optional[Job]:
+        now = time.time()
+        try:
+            with SessionLocal() as s:
+                self._requeue_stale(s, now)
+                ids = s.scalars(select(Job.id).where(Job.status == "queued")
+                                .order_by(Job.created_at).limit(8)).all()
+                for job_id in ids:
+                    res = s.execute(
+                        update(Job).where(Job.id == job_id, Job.status == "queued")
+                        .values(status="running", worker=self.worker_id, started_at=now, heartbeat_at=now,
+                                attempts=Job.attempts + 1)
+                    )
+                    s.commit()
+                    if res.rowcount == 1:
+                        job = s.get(Job, job_id)
+                        s.expunge(job)
+                        return job
+        except SQLAlchemyError:
+            log.exception("job claim failed")
+        return None
+
+    def _requeue_stale(self, s, now: float) -> None:
+        stale = s.scalars(select(Job).where(Job.status == "running", Job.heartbeat_at < now - STALE_AFTER)).all()
+        for job in stale:
+            if (job.attempts or 0) < MAX_ATTEMPTS:
+                job.status, job.worker = "queued", None
+                self._count("requeued")
+            else:
+                job.status, job.error, job.finished_at = "error", "worker stopped responding", now
+        if stale:
+            s.commit()
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(HEARTBEAT):
+            with self._lock:
+                ids = list(self._running)
+            if not ids:
+                continue
+            try:
+                with SessionLocal() as s:
+                    s.execute(update(Job).where(Job.id.in_(ids), Job.status == "running")
+                              .values(heartbeat_at=time.time()))
+                    s.commit()
+            except SQLAlchemyError:
+                log.exception("job heartbeat failed")
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            job = self._claim()
+            if job is None:
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+                continue
+            with self._lock:
+                self._running[job.id] = time.time()
+            try:
+                try:
+                    outcome = {"status": "done", "result": self._execute(job)}
+                except Exception as e:
+                    log.exception("job %s (%s) failed", job.id, job.kind)
+                    outcome = {"status": "error", "error": f"{type(e).__name__}: {e}"[:2000]}
+                if self._finish(job, **outcome):
+                    self._count("done" if outcome["status"] == "done" else "failed")
+            finally:
+                with self._lock:
+                    self._running.pop(job.id, None)
+
+    def _execute(self, job: Job) -> Dict[str, Any]:
+        payload = job.payload or {}
+        parent = payload.get("trace")
+        with tracer.span("job", parent=tuple(parent) if parent else None, kind=job.kind, job_id=job.id,
+                         queued_ms=round((time.time() - job.created_at) * 1000, 1) if job.created_at else None):
+            return self._run_handler(job, payload)
+
+    def _run_handler(self, job: Job, payload: Dict[str, Any]) -> Dict[str, Any]:
+        spec = HANDLERS[job.kind]
+        context = ContextStore()
+        context.load(payload.get("context") or {})
+        agent = getattr(importlib.import_module(spec.module), spec.cls)(name=job.kind, context=context)
+        value = getattr(agent, spec.method)(*payload.get("args", []), **payload.get("kwargs", {}))
+        if spec.stream:
+            value = self._drain(job.id, value)
+        writes, _ = context.take_dirty()
+        if spec.result_key:
+            value = writes.get(spec.result_key, context.get(spec.result_key))
+        extras = {name: getattr(agent, name, None) for name in spec.extras}
+        return _jsonable({"value": value, "context": writes, "extras": extras})
+
+    def _drain(self, job_id: str, stream) -> Any:
+        """
+        Consume a streaming handler, writing what it has produced so far to
+        Job.progress: the text so far for text deltas, a JSON list for items.
+        Returns the joined text or the list of items.
+        """
+        parts: List[Any] = []
+        last = time.monotonic()
+
+        def snapshot() -> str:
+            if all(isinstance(p, str) for p in parts):
+                return "".join(parts)
+            return json.dumps(_jsonable(parts))
+
+        for part in stream:
+            parts.append(part)
+            if time.monotonic() - last >= PROGRESS_EVERY:
+                self._progress(job_id, snapshot())
+                last = time.monotonic()
+        if parts and all(isinstance(p, str) for p in parts):
+            return "".join(parts)
+        return parts
+
+    def _progress(self, job_id: str, text: str) -> None:
+        try:
+            with SessionLocal() as s:
+                s.execute(update(Job).where(Job.id == job_id).values(progress=text, heartbeat_at=time.time()))
+                s.commit()
+        except SQLAlchemyError:
+            pass    # progress is cosmetic; the final result is written by _finish
+
+    def _finish(self, job: Job, status: str, result: Any = None, error: Optional[str] = None) -> bool:
+        """
+        Record the outcome of our claim. Only applies while the claim is
+        still ours: a job requeued as stale (and maybe reclaimed) meanwhile
+        keeps its newer state. Database errors are retried, then logged;
+        the job is then left to the stale sweep.
+        """
+        for attempt in range(FINISH_RETRIES):
+            try:
+                with SessionLocal() as s:
+                    res = s.execute(update(Job).where(
+                        Job.id == job.id, Job.status == "running",
+                        Job.worker == self.worker_id, Job.attempts == job.attempts,
+                    ).values(status=status, result=result, error=error, finished_at=time.time()))
+                    s.commit()
+                if res.rowcount != 1:
+                    log.warning("job %s (%s) was requeued or cancelled; dropping its %s outcome",
+                                job.id, job.kind, status)
+                return res.rowcount == 1
+            except SQLAlchemyError:
+                log.exception("recording job %s outcome failed (attempt %d)", job.id, attempt + 1)
+                if self._stop.wait(min(2 ** attempt, 10)):
+                    break
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counters, "workers": sum(t.name.startswith("job-worker") for t in self._threads),
+                    "running": len(self._running)}
+
+
+# Process-wide queue; call job_queue.start() where jobs should execute
+job_queue = JobQueue()
+
+
+if __name__ == "__main__":
+    # Standalone worker process: python -m app.core.jobs
+    from app.core.db import init_db
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    job_queue.start()
+    log.info("job worker %s running %d thread(s)", job_queue.worker_id, job_queue.workers)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        job_queue.stop()
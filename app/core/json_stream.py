@@ -0,0 +1,139 @@
+# app/core/json_stream.py
+
+import re
+import json
+from typing import Any, List, Optional
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+_decoder = json.JSONDecoder()
+
+
+def extract_json(text: str, expect: Optional[type] = None) -> Any:
+    """
+    Parse model output that should be JSON but may be wrapped in markdown
+    fences or surrounded by prose. With `expect`, only values of that type
+    are accepted. Raises json.JSONDecodeError when nothing can be recovered,
+    so callers keep their existing fallback branch.
+    """
+    text = (text or "").strip()
+    try:
+        value = json.loads(text)
+        if expect is None or isinstance(value, expect):
+            return value
+    except json.JSONDecodeError:
+        pass
+
+    candidates = [m.group(1).strip() for m in _FENCE_RE.finditer(text)] + [text]
+    for cand in candidates:
+        for i, ch in enumerate(cand):
+            if ch not in "{[":
+                continue
+            try:
+                value, _ = _decoder.raw_decode(cand, i)
+            except json.JSONDecodeError:
+                continue
+            if expect is None or isinstance(value, expect):
+                return value
+    raise json.JSONDecodeError("No JSON value found in model output", text, 0)
+
+
+class ArrayItemStream:
+    """
+    Incrementally pulls complete elements out of a JSON array while the
+    document is still being streamed. Feed it text deltas; each call returns
+    the elements that closed since the previous call.
+
+        items = ArrayItemStream("resources")
+        for delta in chunks:
+            for resource in items.feed(delta):
+                ...
+
+    With key=None the first array in the stream is used. Fences and leading
+    prose are ignored because scanning only starts at the array itself.
+    """
+
+    def __init__(self, key: Optional[str] = None):
+        self.key = key
+        self._start_re = re.compile(
+            r'"%s"\s*:\s*\[' % re.escape(key) if key else r"\["
+        )
+        self._buf = ""
+        self._pos = 0            # next char to scan
+        self._in_array = False
+        self.done = False
+        self._depth = 0          # nesting inside the current element
+        self._in_str = False
+        self._esc = False
+        self._item_start: Optional[int] = None
+        self.count = 0
+
+    def feed(self, delta: str) -> List[Any]:
+        if self.done or not delta:
+            return []
+        self._buf += delta
+        out: List[Any] = []
+
+        if not self._in_array:
+            m = self._start_re.search(self._buf)
+            if not m:
+                return out
+            self._in_array = True
+            self._pos = m.end()
+
+        buf = self._buf
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+                    if self._depth == 0:
+                        # a scalar string element just closed
+                        self._emit(buf[self._item_start:i + 1], out)
+                i += 1
+                continue
+
+            if ch == '"':
+                self._in_str = True
+                if self._depth == 0:
+                    self._item_start = i
+            elif ch in "{[":
+                if self._depth == 0:
+                    self._item_start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    # closing bracket of the array itself
+                    self._emit_scalar(buf, i, out)
+                    self.done = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buf[self._item_start:i + 1], out)
+            elif ch == "," and self._depth == 0:
+                self._emit_scalar(buf, i, out)
+            elif self._depth == 0 and self._item_start is None and not ch.isspace():
+                self._item_start = i     # number / true / false / null
+            i += 1
+
+        self._pos = i
+        return out
+
+    def _emit_scalar(self, buf: str, end: int, out: List[Any]) -> None:
+        if self._item_start is not None:
+            self._emit(buf[self._item_start:end].strip(), out)
+
+    def _emit(self, raw: str, out: List[Any]) -> None:
+        self._item_start = None
+        if not raw:
+            return
+        try:
+            out.append(json.loads(raw))
+            self.count += 1
+        except json.JSONDecodeError:
+            pass
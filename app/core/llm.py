@@ -0,0 +1,77 @@
+# app/core/llm.py
+
+import os
+import threading
+from typing import Optional
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
+
+# Connection pool tuning (all optional)
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "16"))
+KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+USE_HTTP2 = os.getenv("LLM_HTTP2", "1").lower() not in ("0", "false", "no")
+
+_lock = threading.Lock()
+_client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
+
+
+def _http2_available() -> bool:
+    if not USE_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401  (installed via httpx[http2])
+        return True
+    except ImportError:
+        return False
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+
+def get_client() -> OpenAI:
+    """Process-wide OpenAI client over one pooled keep-alive connection pool, built on first use."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                http_client = httpx.Client(http2=_http2_available(), limits=_limits(), timeout=_timeout())
+                # retries are handled by app.core.rate_limit, not the SDK
+                _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client, max_retries=0)
+    return _client
+
+
+def get_async_client() -> AsyncOpenAI:
+    """Async counterpart of get_client(), sharing the same pool settings."""
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                http_client = httpx.AsyncClient(http2=_http2_available(), limits=_limits(), timeout=_timeout())
+                _async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client,
+                                            max_retries=0)
+    return _async_client
+
+
+def reset_clients() -> None:
+    """Close and forget the pooled clients (tests, key rotation)."""
+    global _client, _async_client
+    with _lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        # The async pool is closed by its event loop; dropping the reference is enough here.
+        _async_client = None
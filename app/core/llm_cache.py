@@ -0,0 +1,187 @@
+# app/core/llm_cache.py
+
+import os
+import json
+import time
+import hashlib
+import atexit
+import threading
+from typing import Optional, Dict, Any, List
+
+from sqlalchemy import select, delete, update, func, bindparam
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.db import SessionLocal, LLMCacheEntry
+
+DEFAULT_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))   # seconds
+DEFAULT_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+# Hit counts / access times are buffered and written in one batch this often (seconds)
+HIT_FLUSH_INTERVAL = float(os.getenv("LLM_CACHE_HIT_FLUSH_INTERVAL", "30"))
+HIT_FLUSH_MAX = 200          # ...or once this many distinct keys were hit
+# Expiry and the LRU cap are enforced every EVICT_EVERY puts or EVICT_INTERVAL seconds,
+# so the table can briefly exceed max_entries by up to EVICT_EVERY rows
+EVICT_EVERY = int(os.getenv("LLM_CACHE_EVICT_EVERY", "100"))
+EVICT_INTERVAL = float(os.getenv("LLM_CACHE_EVICT_INTERVAL", "300"))
+
+
+def make_key(model: str, messages: List[Dict[str, Any]], temperature: float) -> str:
+    """Content address for a chat completion request."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": round(float(temperature), 4)},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Persistent LLM response cache stored in the `llm_cache` table.
+    Entries expire after a TTL and the table is capped at `max_entries`
+    by evicting the least recently accessed rows. Lookups are read-only:
+    hit bookkeeping is batched (see flush_hits) and eviction runs
+    periodically rather than on every put.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, default_ttl: Optional[int] = DEFAULT_TTL,
+                 enabled: bool = CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._touched: Dict[str, List[float]] = {}   # key -> [hits, last access] not yet written
+        self._flushed_at = time.monotonic()
+        self._puts_since_evict = 0
+        self._evicted_at = time.monotonic()
+
+    # --- counters ---
+
+    def _count(self, agent: str, field: str) -> None:
+        with self._lock:
+            bucket = self._stats.setdefault(agent or "unknown", {"hits": 0, "misses": 0, "writes": 0})
+            bucket[field] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process, in total and per agent."""
+        with self._lock:
+            by_agent = {a: dict(b) for a, b in self._stats.items()}
+        hits = sum(b["hits"] for b in by_agent.values())
+        misses = sum(b["misses"] for b in by_agent.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "by_agent": by_agent,
+        }
+
+    # --- lookups ---
+
+    def get(self, key: str, agent: str = "") -> Optional[str]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        try:
+            with SessionLocal() as s:
+                row = s.execute(select(LLMCacheEntry.response, LLMCacheEntry.expires_at)
+                                .where(LLMCacheEntry.key == key)).first()
+        except SQLAlchemyError:
+            # The cache is best-effort; a broken table must never break an agent.
+            self._count(agent, "misses")
+            return None
+        if row is None or (row.expires_at is not None and row.expires_at < now):
+            self._count(agent, "misses")
+            return None
+        self._count(agent, "hits")
+        self._touch(key, now)
+        return row.response
+
+    def _touch(self, key: str, now: float) -> None:
+        with self._lock:
+            touched = self._touched.setdefault(key, [0, now])
+            touched[0] += 1
+            touched[1] = now
+            due = (len(self._touched) >= HIT_FLUSH_MAX
+                   or time.monotonic() - self._flushed_at >= HIT_FLUSH_INTERVAL)
+        if due:
+            self.flush_hits()
+
+    def flush_hits(self) -> int:
+        """Write buffered hit counts and access times in one batch; returns the rows touched."""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._flushed_at = time.monotonic()
+        if not touched:
+            return 0
+        t = LLMCacheEntry.__table__
+        try:
+            with SessionLocal() as s:
+                s.connection().execute(
+                    update(t).where(t.c.key == bindparam("k"))
+                    .values(hits=func.coalesce(t.c.hits, 0) + bindparam("n"), last_accessed=bindparam("at")),
+                    [{"k": k, "n": int(n), "at": at} for k, (n, at) in touched.items()],
+                )
+                s.commit()
+        except SQLAlchemyError:
+            return 0   # bookkeeping only; losing a batch just ages those rows a little
+        return len(touched)
+
+    def put(self, key: str, response: str, agent: str = "", model: str = "",
+            ttl: Optional[int] = None) -> None:
+        if not self.enabled or response is None:
+            return
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        try:
+            with SessionLocal() as s:
+                row = s.get(LLMCacheEntry, key)
+                if row is None:
+                    row = LLMCacheEntry(key=key, hits=0, created_at=now)
+                    s.add(row)
+                row.agent = agent
+                row.model = model
+                row.response = response
+                row.expires_at = now + ttl if ttl else None
+                row.last_accessed = now
+                s.commit()
+                self._count(agent, "writes")
+                if self._evict_due():
+                    self._evict(s)
+        except SQLAlchemyError:
+            pass
+
+    # --- maintenance ---
+
+    def _evict_due(self) -> bool:
+        with self._lock:
+            self._puts_since_evict += 1
+            if self._puts_since_evict < EVICT_EVERY and time.monotonic() - self._evicted_at < EVICT_INTERVAL:
+                return False
+            self._puts_since_evict = 0
+            self._evicted_at = time.monotonic()
+            return True
+
+    def _evict(self, s) -> None:
+        """Drop expired rows, then the least recently used ones above the cap."""
+        self.flush_hits()   # LRU order needs the buffered access times
+        now = time.time()
+        s.execute(delete(LLMCacheEntry).where(LLMCacheEntry.expires_at < now))
+        total = s.scalar(select(func.count()).select_from(LLMCacheEntry)) or 0
+        excess = total - self.max_entries
+        if excess > 0:
+            victims = select(LLMCacheEntry.key).order_by(LLMCacheEntry.last_accessed).limit(excess)
+            s.execute(delete(LLMCacheEntry).where(LLMCacheEntry.key.in_(victims.scalar_subquery())))
+        s.commit()
+
+    def clear(self, agent: Optional[str] = None) -> None:
+        with SessionLocal() as s:
+            stmt = delete(LLMCacheEntry)
+            if agent:
+                stmt = stmt.where(LLMCacheEntry.agent == agent)
+            s.execute(stmt)
+            s.commit()
+
+
+# Process-wide cache shared by all agents
+llm_cache = LLMCache()
+atexit.register(llm_cache.flush_hits)
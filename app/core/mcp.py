@@ -1,20 +1,287 @@
-
-
 # app/core/mcp.py
 
+import json
+import time
+import asyncio
+import functools
 from abc import ABC, abstractmethod
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+
+from app.core.llm import get_client, get_async_client
+from app.core.json_stream import extract_json
+from app.core.llm_cache import llm_cache, make_key
+from app.core.metrics import metrics
+from app.core.tracing import tracer
+from app.core.model_router import model_router
+from app.core.rate_limit import rate_limiter
+from app.core.singleflight import llm_flights
+
+
+def _timed_run(fn):
+    """
+    Wrap an agent's run/arun so every call is an 'agent.run' span and lands
+    in agent_run_seconds{agent=<route>}.
+    """
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def arun(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                with tracer.span("agent.run", agent=self.route, method=fn.__name__):
+                    return await fn(self, *args, **kwargs)
+            except Exception:
+                metrics.inc("agent_run_errors_total", agent=self.route, method=fn.__name__)
+                raise
+            finally:
+                metrics.observe("agent_run_seconds", time.perf_counter() - start,
+                                agent=self.route, method=fn.__name__)
+        return arun
+
+    @functools.wraps(fn)
+    def run(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with tracer.span("agent.run", agent=self.route, method=fn.__name__):
+                return fn(self, *args, **kwargs)
+        except Exception:
+            metrics.inc("agent_run_errors_total", agent=self.route, method=fn.__name__)
+            raise
+        finally:
+            metrics.observe("agent_run_seconds", time.perf_counter() - start, agent=self.route, method=fn.__name__)
+    return run
+
+
+def _trace_usage(span, usage) -> None:
+    if span is not None and usage is not None:
+        span.set(prompt_tokens=getattr(usage, "prompt_tokens", None),
+                 completion_tokens=getattr(usage, "completion_tokens", None))
+
 
 class BaseAgent(ABC):
-    def __init__(self, name, context):
+    # Response caching is opt-out: agents with creative (high temperature)
+    # output set this to False, callers can override per instance or per call.
+    cache_enabled = True
+    cache_ttl: Optional[int] = None   # seconds; None = LLMCache default
+
+    # Key into app.core.model_router.ROUTES; chat(task=...) refines it per call.
+    route = "default"
+
+    # Context keys consumed/produced by run_from_context(); the pipeline
+    # runner (app/core/pipeline.py) derives dependencies from these.
+    reads: Tuple[str, ...] = ()
+    writes: Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for method in ("run", "arun"):
+            fn = cls.__dict__.get(method)
+            if fn is not None and not getattr(fn, "__isabstractmethod__", False):
+                setattr(cls, method, _timed_run(fn))
+
+    def __init__(self, name, context, cache: Optional[bool] = None):
         self.name = name
         self.context = context  # ContextStore instance
+        if cache is not None:
+            self.cache_enabled = cache
 
     @abstractmethod
     def run(self, input_data):
         pass
 
+    async def arun(self, input_data):
+        """
+        Coroutine counterpart of run(). Agents override it with a native
+        implementation on the async client; this fallback runs run() on a
+        worker thread so the event loop is never blocked.
+        """
+        return await asyncio.to_thread(self.run, input_data)
+
+    def run_from_context(self):
+        """
+        Run with inputs taken from the `reads` context keys (headless
+        pipelines): a single key's value is passed to run() as is, several
+        as a {key: value} dict. Agents whose run() expects another shape
+        override this.
+        """
+        values = {k: self.get_context(k) for k in self.reads}
+        if len(values) == 1:
+            return self.run(next(iter(values.values())))
+        return self.run(values)
+
+    def run_stream(self, input_data) -> Iterator[str]:
+        """
+        Yield the agent's output as text deltas. Agents with long-form output
+        override this to stream tokens; the default yields run()'s result once.
+        """
+        result = self.run(input_data)
+        yield result if isinstance(result, str) else json.dumps(result, ensure_ascii=False)
+
     def update_context(self, key, value):
         self.context.set(key, value)
 
     def get_context(self, key, default=None):
         return self.context.get(key, default)
+
+    def parse_json(self, text: str, expect: Optional[type] = None) -> Any:
+        """extract_json() that also counts ok/fallback outcomes per agent; raises json.JSONDecodeError."""
+        try:
+            with tracer.span("json.parse", agent=self.route, chars=len(text or "")):
+                data = extract_json(text, expect=expect)
+        except json.JSONDecodeError:
+            metrics.inc("agent_json_parse_total", agent=self.route, outcome="fallback")
+            raise
+        metrics.inc("agent_json_parse_total", agent=self.route, outcome="ok")
+        return data
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        with tracer.span("llm.cache", agent=self.route) as span:
+            hit = llm_cache.get(key, agent=self.name)
+            if span is not None:
+                span.set(hit=hit is not None)
+        if llm_cache.enabled:
+            metrics.inc("llm_cache_requests_total", agent=self.route, result="miss" if hit is None else "hit")
+        return hit
+
+    def _route(self, model: Optional[str], task: Optional[str]) -> Tuple[str, Optional[str]]:
+        """(primary, fallback) for a call; an explicit model pins it and disables hedging."""
+        if model:
+            return model, None
+        return model_router.route(self.route, task)
+
+    @staticmethod
+    def _cache_key(primary: str, fallback: Optional[str], messages: List[Dict[str, Any]],
+                   temperature: float) -> str:
+        """Cache and in-flight key of a routed call: either model of the route may answer, so key on both."""
+        return make_key("|".join(sorted(m for m in (primary, fallback) if m)), messages, temperature)
+
+    def chat(self, messages: List[Dict[str, Any]], model: Optional[str] = None,
+             temperature: float = 0.2, cache: Optional[bool] = None, task: Optional[str] = None) -> str:
+        """
+        Run a chat completion through the shared response cache and return its
+        text. The model comes from the router (by agent route and task) unless
+        one is given. Identical requests already in flight in this process are
+        coalesced onto one API call.
+        """
+        primary, fallback = self._route(model, task)
+        use_cache = self.cache_enabled if cache is None else cache
+        flight_key = self._cache_key(primary, fallback, messages, temperature)
+        key = flight_key if use_cache else None
+        if key:
+            hit = self._cache_get(key)
+            if hit is not None:
+                return hit
+
+        def attempt(m: str) -> str:
+            with tracer.span("llm.request", agent=self.route, model=m) as span, \
+                    metrics.llm_call(self.route, m) as call:
+                resp = rate_limiter.call(
+                    lambda: model_router.observe(m, lambda: get_client().chat.completions.create(
+                        model=m,
+                        temperature=temperature,
+                        messages=messages,
+                    )),
+                    messages, m,
+                )
+                call.usage = getattr(resp, "usage", None)
+                _trace_usage(span, call.usage)
+            return resp.choices[0].message.content or ""
+
+        def fetch() -> str:
+            text, used = model_router.call(primary, fallback, attempt)
+            if key:
+                llm_cache.put(key, text, agent=self.name, model=used, ttl=self.cache_ttl)
+            return text
+
+        return llm_flights.do(flight_key, fetch)
+
+    def chat_stream(self, messages: List[Dict[str, Any]], model: Optional[str] = None,
+                    temperature: float = 0.2, cache: Optional[bool] = None,
+                    task: Optional[str] = None) -> Iterator[str]:
+        """Streaming variant of chat(): yields text deltas as the model produces them (never hedged)."""
+        model, fallback = self._route(model, task)
+        use_cache = self.cache_enabled if cache is None else cache
+        key = self._cache_key(model, fallback, messages, temperature) if use_cache else None
+        if key:
+            hit = self._cache_get(key)
+            if hit is not None:
+                yield hit
+                return
+
+        parts = []
+        # Not made current: the caller's code runs between our yields
+        span = tracer.start("llm.stream", agent=self.route, model=model)
+        call, status = metrics.llm_call(self.route, model), "error"
+        try:
+            with call:
+                stream = rate_limiter.stream(
+                    lambda: model_router.observe(model, lambda: get_client().chat.completions.create(
+                        model=model,
+                        temperature=temperature,
+                        messages=messages,
+                        stream=True,
+                        # the final chunk then carries token usage (and no choices)
+                        stream_options={"include_usage": True},
+                    ), latency=False),  # time to first byte would skew the hedge delay
+                    messages, model,
+                )
+                for chunk in stream:
+                    if getattr(chunk, "usage", None) is not None:
+                        call.usage = chunk.usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        call.token()
+                        parts.append(delta)
+                        yield delta
+            status = "ok"
+        except GeneratorExit:
+            status = "cancelled"
+            raise
+        finally:
+            if span is not None:
+                if call.first_token is not None:
+                    span.set(first_token_ms=round(call.first_token * 1000, 1))
+                _trace_usage(span, call.usage)
+                span.end(status)
+
+        # Only a fully consumed stream is cached
+        if key:
+            llm_cache.put(key, "".join(parts), agent=self.name, model=model, ttl=self.cache_ttl)
+
+    async def achat(self, messages: List[Dict[str, Any]], model: Optional[str] = None,
+                    temperature: float = 0.2, cache: Optional[bool] = None, task: Optional[str] = None) -> str:
+        """Async variant of chat() on the pooled AsyncOpenAI client."""
+        primary, fallback = self._route(model, task)
+        use_cache = self.cache_enabled if cache is None else cache
+        flight_key = self._cache_key(primary, fallback, messages, temperature)
+        key = flight_key if use_cache else None
+        if key:
+            # the cache is a synchronous SQL lookup; keep it off the event loop
+            hit = await asyncio.to_thread(self._cache_get, key)
+            if hit is not None:
+                return hit
+
+        async def attempt(m: str) -> str:
+            with tracer.span("llm.request", agent=self.route, model=m) as span, \
+                    metrics.llm_call(self.route, m) as call:
+                resp = await rate_limiter.acall(
+                    lambda: model_router.aobserve(m, get_async_client().chat.completions.create(
+                        model=m,
+                        temperature=temperature,
+                        messages=messages,
+                    )),
+                    messages, m,
+                )
+                call.usage = getattr(resp, "usage", None)
+                _trace_usage(span, call.usage)
+            return resp.choices[0].message.content or ""
+
+        async def fetch() -> str:
+            text, used = await model_router.acall(primary, fallback, attempt)
+            if key:
+                await asyncio.to_thread(llm_cache.put, key, text, self.name, used, self.cache_ttl)
+            return text
+
+        # shares in-flight calls with thread callers of chat() as well
+        return await llm_flights.ado(flight_key, fetch)
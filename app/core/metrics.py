@@ -0,0 +1,351 @@
+# app/core/metrics.py
+"""
+Process-wide metrics: agent run latency, LLM latency, token usage and
+estimated cost, JSON-fallback and response-cache rates, and database
+timings. Everything is an in-memory counter or fixed-bucket histogram
+keyed by (name, labels), so recording is a dict lookup and a bisect under
+one lock. by_agent() feeds the UI panel; prometheus() renders the text
+exposition format (served at GET /metrics by app/service.py).
+
+Values are per process: `python -m app.core.jobs` workers keep their own.
+"""
+
+import os
+import json
+import time
+import bisect
+import functools
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+
+# Upper bounds in seconds; LLM calls live in the 0.5-60 s range, DB statements well below 0.1 s
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+# USD per 1M (prompt, completion) tokens. LLM_PRICES='{"my-model": [0.2, 0.8]}' adds or overrides.
+PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("LLM_PRICES", "{}") or "{}").items()})
+
+HELP = {
+    "agent_run_seconds": ("histogram", "Wall time of BaseAgent.run/arun per agent route."),
+    "agent_run_errors_total": ("counter", "Agent runs that raised."),
+    "llm_request_seconds": ("histogram", "One chat completion attempt, including rate-limit waits and retries."),
+    "llm_first_token_seconds": ("histogram", "Time to the first streamed text delta."),
+    "llm_errors_total": ("counter", "Chat completion attempts that raised."),
+    "llm_tokens_total": ("counter", "Tokens reported in response usage, by kind (prompt/completion)."),
+    "llm_cost_usd_total": ("counter", "Estimated spend from response usage and PRICES."),
+    "llm_cache_requests_total": ("counter", "Response cache lookups by result (hit/miss)."),
+    "agent_json_parse_total": ("counter", "JSON extraction from model output by outcome (ok/fallback)."),
+    "db_query_seconds": ("histogram", "SQL statements by verb."),
+    "db_helper_seconds": ("histogram", "app.core.db helper calls."),
+    "db_helper_errors_total": ("counter", "app.core.db helper calls that raised."),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Estimated USD for one call, or None for a model without a price."""
+    price = PRICES.get(model)
+    if price is None:
+        # dated snapshots ("gpt-4o-mini-2024-07-18") bill like their base model
+        price = next((p for m, p in sorted(PRICES.items(), key=lambda kv: -len(kv[0]))
+                      if model.startswith(m + "-")), None)
+    if price is None:
+        return None
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1e6
+
+
+class Histogram:
+    """Cumulative-bucket histogram; counts[i] holds observations <= buckets[i] (last slot: +Inf)."""
+
+    __slots__ = ("buckets", "counts", "sum", "count", "max")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Linear interpolation inside the bucket holding the q-th observation
+        (as histogram_quantile does), capped at the largest value seen.
+        """
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / n)
+            seen += n
+        return self.max
+
+
+class LLMCall:
+    """Measures one chat completion attempt; see Metrics.llm_call()."""
+
+    __slots__ = ("metrics", "agent", "model", "start", "usage", "first_token")
+
+    def __init__(self, metrics: "Metrics", agent: str, model: str):
+        self.metrics, self.agent, self.model = metrics, agent, model
+        self.usage: Any = None
+        self.first_token: Optional[float] = None
+
+    def token(self) -> None:
+        """Mark the first streamed delta (later calls are ignored)."""
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self.start
+
+    def __enter__(self) -> "LLMCall":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        m = self.metrics
+        seconds = time.perf_counter() - self.start
+        if exc_type is not None and issubclass(exc_type, Exception):
+            m.inc("llm_errors_total", agent=self.agent, model=self.model)
+            return
+        # GeneratorExit: a stream the caller stopped reading still took this long
+        m.observe("llm_request_seconds", seconds, agent=self.agent, model=self.model)
+        if self.first_token is not None:
+            m.observe("llm_first_token_seconds", self.first_token, agent=self.agent, model=self.model)
+        if self.usage is not None:
+            m.usage(self.agent, self.model, self.usage)
+
+
+class Metrics:
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._lock = threading.Lock()
+
+    # --- recording ---
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(value)
+
+    def timed(self, name: str, errors: Optional[str] = None, **labels: Any) -> Callable:
+        """
+        Decorator recording each call's wall time into histogram `name`
+        (labelled fn=<function name> plus `labels`); raising calls also
+        bump counter `errors` when given.
+        """
+        def wrap(fn: Callable) -> Callable:
+            tags = {"fn": fn.__name__, **labels}
+
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    if errors:
+                        self.inc(errors, **tags)
+                    raise
+                finally:
+                    self.observe(name, time.perf_counter() - start, **tags)
+            return inner
+        return wrap
+
+    def llm_call(self, agent: str, model: str) -> LLMCall:
+        """Context manager timing one completion attempt; set `.usage` from the response inside it."""
+        return LLMCall(self, agent, model)
+
+    def usage(self, agent: str, model: str, usage: Any) -> None:
+        """Record token counts (and their estimated cost) from a response `usage` object."""
+        prompt = getattr(usage, "prompt_tokens", None) or 0
+        completion = getattr(usage, "completion_tokens", None) or 0
+        if not (prompt or completion):
+            return
+        self.inc("llm_tokens_total", prompt, agent=agent, model=model, kind="prompt")
+        self.inc("llm_tokens_total", completion, agent=agent, model=model, kind="completion")
+        cost = cost_usd(model, prompt, completion)
+        if cost is not None:
+            self.inc("llm_cost_usd_total", cost, agent=agent, model=model)
+
+    # --- reading ---
+
+    def _snapshot(self) -> Tuple[Dict[Tuple[str, Labels], float], Dict[Tuple[str, Labels], Histogram]]:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {}
+            for key, h in self._histograms.items():
+                histograms[key] = copy = Histogram(h.buckets)
+                copy.merge(h)
+        return counters, histograms
+
+    def by_agent(self) -> List[Dict[str, Any]]:
+        """One summary row per agent route: runs, latency, LLM usage, cost, fallback and cache-hit rates."""
+        counters, histograms = self._snapshot()
+        rows: Dict[str, Dict[str, Any]] = {}
+
+        def row(agent: str) -> Dict[str, Any]:
+            return rows.setdefault(agent, {
+                "agent": agent, "runs": 0, "run_p50_s": None, "run_p95_s": None, "run_errors": 0,
+                "llm_calls": 0, "llm_p95_s": None, "llm_errors": 0, "prompt_tokens": 0,
+                "completion_tokens": 0, "cost_usd": 0.0, "json_fallback_rate": None, "cache_hit_rate": None,
+            })
+
+        merged: Dict[Tuple[str, str], Histogram] = {}
+        for (name, labels), h in histograms.items():
+            tags = dict(labels)
+            if name in ("agent_run_seconds", "llm_request_seconds") and "agent" in tags:
+                merged.setdefault((name, tags["agent"]), Histogram(h.buckets)).merge(h)
+        for (name, agent), h in merged.items():
+            r = row(agent)
+            if name == "agent_run_seconds":
+                r["runs"] = h.count
+                r["run_p50_s"], r["run_p95_s"] = h.quantile(0.5), h.quantile(0.95)
+            else:
+                r["llm_calls"] = h.count
+                r["llm_p95_s"] = h.quantile(0.95)
+
+        parses: Dict[str, List[float]] = {}
+        cache: Dict[str, List[float]] = {}
+        for (name, labels), value in counters.items():
+            tags = dict(labels)
+            agent = tags.get("agent")
+            if agent is None:
+                continue
+            r = row(agent)
+            if name == "agent_run_errors_total":
+                r["run_errors"] += int(value)
+            elif name == "llm_errors_total":
+                r["llm_errors"] += int(value)
+            elif name == "llm_tokens_total":
+                r[f"{tags.get('kind')}_tokens"] = r.get(f"{tags.get('kind')}_tokens", 0) + int(value)
+            elif name == "llm_cost_usd_total":
+                r["cost_usd"] += value
+            elif name == "agent_json_parse_total":
+                pair = parses.setdefault(agent, [0.0, 0.0])
+                pair[tags.get("outcome") == "fallback"] += value
+            elif name == "llm_cache_requests_total":
+                pair = cache.setdefault(agent, [0.0, 0.0])
+                pair[tags.get("result") == "hit"] += value
+        for agent, (ok, fallback) in parses.items():
+            rows[agent]["json_fallback_rate"] = fallback / (ok + fallback)
+        for agent, (miss, hit) in cache.items():
+            rows[agent]["cache_hit_rate"] = hit / (miss + hit)
+
+        for r in rows.values():
+            r["cost_usd"] = round(r["cost_usd"], 6)
+            for k in ("run_p50_s", "run_p95_s", "llm_p95_s", "json_fallback_rate", "cache_hit_rate"):
+                if r[k] is not None:
+                    r[k] = round(r[k], 3)
+        return sorted(rows.values(), key=lambda r: r["agent"])
+
+    def db(self) -> List[Dict[str, Any]]:
+        """Count / mean / p95 per SQL verb and per db helper."""
+        _, histograms = self._snapshot()
+        out = []
+        for (name, labels), h in sorted(histograms.items()):
+            if name.startswith("db_"):
+                out.append({"metric": name, **dict(labels), "count": h.count,
+                            "mean_ms": round(h.sum / h.count * 1000, 2) if h.count else None,
+                            "p95_ms": round(h.quantile(0.95) * 1000, 2) if h.count else None})
+        return out
+
+    def prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        counters, histograms = self._snapshot()
+
+        def fmt(labels: Iterable[Tuple[str, str]]) -> str:
+            pairs = ",".join('%s="%s"' % (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                             for k, v in labels)
+            return "{" + pairs + "}" if pairs else ""
+
+        lines: List[str] = []
+        names = sorted({n for n, _ in counters} | {n for n, _ in histograms})
+        for name in names:
+            kind, text = HELP.get(name, ("counter" if any(n == name for n, _ in counters) else "histogram", ""))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{name}{fmt(labels)} {value:g}")
+            for (n, labels), h in sorted(histograms.items(), key=lambda kv: kv[0]):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(h.buckets + (float("inf"),), h.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{name}_bucket{fmt(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{fmt(labels)} {h.sum:.6f}")
+                lines.append(f"{name}_count{fmt(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# Process-wide registry shared by agents, the DB layer, the UI and the service
+metrics = Metrics()
+
+
+def instrument_engine(engine) -> None:
+    """Time every SQL statement on `engine` into db_query_seconds{op=<verb>}."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if starts:
+            metrics.observe("db_query_seconds", time.perf_counter() - starts.pop(),
+                            op=statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "?")
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("metrics_query_start") if conn is not None else None
+        if starts:
+            starts.pop()
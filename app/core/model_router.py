@@ -0,0 +1,292 @@
+# app/core/model_router.py
+
+import os
+import json
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from app.core.tracing import tracer
+
+# Model tiers; override the concrete model ids per deployment
+MODELS = {
+    "fast": os.getenv("LLM_MODEL_FAST", "gpt-4o-mini"),
+    "standard": os.getenv("LLM_MODEL_STANDARD", "gpt-3.5-turbo"),
+    "strong": os.getenv("LLM_MODEL_STRONG", "gpt-4o"),
+}
+
+# Where a slow call on a tier is hedged to
+FALLBACKS = {
+    "fast": "standard",
+    "standard": "fast",
+    "strong": "standard",
+}
+
+# "<agent route>" or "<agent route>.<task>" -> tier (or a literal model id).
+# LLM_ROUTES='{"coding": "standard", "mock.evaluate": "gpt-4o-mini"}' overrides entries.
+ROUTES = {
+    "default": "standard",
+    "planner": "standard",
+    "parser": "fast",
+    "research": "standard",
+    "coding": "strong",
+    "feedback": "standard",
+    "mock": "standard",
+    "mock.evaluate": "fast",
+}
+ROUTES.update(json.loads(os.getenv("LLM_ROUTES", "{}") or "{}"))
+
+HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "1").lower() not in ("0", "false", "no")
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0"))     # seconds
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WORKERS = int(os.getenv("LLM_HEDGE_WORKERS", "32"))            # concurrent hedge (fallback) calls
+STATS_WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "200"))            # samples per model
+STATS_MAX_AGE = float(os.getenv("LLM_ROUTER_MAX_AGE", "600"))        # seconds
+# Above this error rate a tier's calls go to its fallback until the samples age out
+MAX_ERROR_RATE = float(os.getenv("LLM_ROUTER_MAX_ERROR_RATE", "0.5"))
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    idx = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def _run_into(future: Future, fn: Callable[..., Any], *args) -> None:
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        future.set_result(fn(*args))
+    except BaseException as e:
+        future.set_exception(e)
+
+
+class ModelStats:
+    """Rolling window of (timestamp, latency, ok) samples for one model; latency may be None (outcome only)."""
+
+    def __init__(self, window: int = STATS_WINDOW, max_age: float = STATS_MAX_AGE):
+        self.samples: Deque[Tuple[float, Optional[float], bool]] = deque(maxlen=window)
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    def add(self, latency: Optional[float], ok: bool) -> None:
+        with self._lock:
+            self.samples.append((time.monotonic(), latency, ok))
+
+    def _live(self):
+        cutoff = time.monotonic() - self.max_age
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        return list(self.samples)
+
+    def latencies(self):
+        with self._lock:
+            return sorted(lat for _, lat, ok in self._live() if ok and lat is not None)
+
+    def percentile(self, pct: float, min_samples: int = 1) -> Optional[float]:
+        values = self.latencies()
+        if len(values) < min_samples:
+            return None
+        return _percentile(values, pct)
+
+    def error_rate(self, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            live = self._live()
+        if len(live) < min_samples:
+            return None
+        return sum(1 for _, _, ok in live if not ok) / len(live)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            live = self._live()
+        values = sorted(lat for _, lat, ok in live if ok and lat is not None)
+        return {
+            "samples": len(live),
+            "p50": round(_percentile(values, 50), 3) if values else None,
+            "p95": round(_percentile(values, 95), 3) if values else None,
+            "error_rate": round(sum(1 for _, _, ok in live if not ok) / len(live), 3) if live else None,
+        }
+
+
+class ModelRouter:
+    """
+    Picks a model per agent/task from ROUTES, tracks rolling p50/p95
+    latency and error rate per model, and hedges: when the primary call
+    outlives its model's HEDGE_PERCENTILE latency, a duplicate goes to the
+    tier's fallback and whichever answer lands first wins. Only the tail
+    is hedged, so the duplicate costs a few percent of calls.
+    """
+
+    def __init__(self, routes: Dict[str, str] = ROUTES, models: Dict[str, str] = MODELS,
+                 fallbacks: Dict[str, str] = FALLBACKS, hedge: bool = HEDGE_ENABLED):
+        self.routes = dict(routes)
+        self.models = dict(models)
+        self.fallbacks = dict(fallbacks)
+        self.hedge = hedge
+        self._stats: Dict[str, ModelStats] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.counters = {"calls": 0, "hedged": 0, "hedge_wins": 0, "rerouted": 0}
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self.counters[field] += 1
+
+    def stats_for(self, model: str) -> ModelStats:
+        with self._lock:
+            stats = self._stats.get(model)
+            if stats is None:
+                stats = self._stats[model] = ModelStats()
+            return stats
+
+    # --- routing ---
+
+    def _resolve(self, tier_or_model: str) -> Tuple[str, Optional[str]]:
+        """(model, fallback model) for a tier name; literal model ids get no fallback."""
+        if tier_or_model not in self.models:
+            return tier_or_model, None
+        fallback_tier = self.fallbacks.get(tier_or_model)
+        fallback = self.models.get(fallback_tier) if fallback_tier else None
+        model = self.models[tier_or_model]
+        return model, (fallback if fallback != model else None)
+
+    def route(self, agent: str, task: Optional[str] = None) -> Tuple[str, Optional[str]]:
+        """Return (primary, fallback) models for an agent route and optional task."""
+        target = (self.routes.get(f"{agent}.{task}") if task else None) \
+            or self.routes.get(agent) or self.routes.get("default", "standard")
+        primary, fallback = self._resolve(target)
+        if fallback is not None:
+            err = self.stats_for(primary).error_rate(HEDGE_MIN_SAMPLES)
+            if err is not None and err > MAX_ERROR_RATE:
+                alt = self.stats_for(fallback).error_rate(HEDGE_MIN_SAMPLES)
+                if alt is None or alt < err:
+                    self._count("rerouted")
+                    return fallback, primary
+        return primary, fallback
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds to wait on `model` before hedging; None until enough samples exist."""
+        if not self.hedge:
+            return None
+        p = self.stats_for(model).percentile(HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES)
+        return None if p is None else max(HEDGE_MIN_DELAY, p)
+
+    # --- measurement ---
+
+    def observe(self, model: str, fn: Callable[[], Any], latency: bool = True) -> Any:
+        """
+        Run one API attempt on `model`, recording its latency and outcome.
+        latency=False records the outcome only, for calls whose timing is not
+        comparable with a full completion (opening a stream).
+        """
+        start = time.monotonic()
+        try:
+            result = fn()
+        except Exception:
+            self.stats_for(model).add(time.monotonic() - start if latency else None, ok=False)
+            raise
+        self.stats_for(model).add(time.monotonic() - start if latency else None, ok=True)
+        return result
+
+    async def aobserve(self, model: str, coro: Awaitable[Any]) -> Any:
+        start = time.monotonic()
+        try:
+            result = await coro
+        except asyncio.CancelledError:
+            # a cancelled hedge loser has neither a latency nor an outcome
+            raise
+        except Exception:
+            self.stats_for(model).add(time.monotonic() - start, ok=False)
+            raise
+        self.stats_for(model).add(time.monotonic() - start, ok=True)
+        return result
+
+    # --- hedged calls ---
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+        return self._pool
+
+    def call(self, primary: str, fallback: Optional[str], fn: Callable[[str], Any]) -> Tuple[Any, str]:
+        """
+        Run fn(model) on the primary, hedging to the fallback past the
+        latency threshold. Returns (result, model that produced it). A
+        losing synchronous call cannot be aborted; it finishes in the
+        background and its result is dropped.
+
+        The primary gets a thread of its own rather than a pool slot, so
+        the HEDGE_WORKERS pool bounds only the duplicate calls and never
+        queues ordinary traffic; the caller's thread just waits, which lets
+        it return as soon as either model answers.
+        """
+        self._count("calls")
+        delay = self.hedge_delay(primary) if fallback else None
+        if delay is None:
+            return fn(primary), primary
+
+        first: Future = Future()
+        threading.Thread(target=_run_into, args=(first, tracer.bind(fn), primary),
+                         name="llm-primary", daemon=True).start()
+        futures = {first: primary}
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            self._count("hedged")
+            futures[self._executor().submit(tracer.bind(fn), fallback)] = fallback
+
+        pending, error = set(futures), None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is None:
+                    if futures[fut] != primary:
+                        self._count("hedge_wins")
+                    return fut.result(), futures[fut]
+                error = fut.exception()
+        raise error
+
+    async def acall(self, primary: str, fallback: Optional[str],
+                    fn: Callable[[str], Awaitable[Any]]) -> Tuple[Any, str]:
+        """Async variant of call(); the losing request is cancelled."""
+        self._count("calls")
+        delay = self.hedge_delay(primary) if fallback else None
+        if delay is None:
+            return await fn(primary), primary
+
+        tasks = {asyncio.ensure_future(fn(primary)): primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self._count("hedged")
+                tasks[asyncio.ensure_future(fn(fallback))] = fallback
+
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if tasks[task] != primary:
+                            self._count("hedge_wins")
+                        return task.result(), tasks[task]
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self.counters)
+            models = list(self._stats.items())
+        out["models"] = {m: s.summary() for m, s in models}
+        return out
+
+
+# Process-wide router shared by all agents
+model_router = ModelRouter()
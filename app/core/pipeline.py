@@ -0,0 +1,172 @@
+# app/core/pipeline.py
+
+import json
+import hashlib
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from app.core.tracing import tracer
+
+FINGERPRINTS_KEY = "pipeline::fingerprints"
+
+
+class Node:
+    """
+    One pipeline step. `fn(context)` does the work and writes its outputs to
+    the context; `reads`/`writes` are context keys (glob patterns allowed,
+    e.g. "resources::*") used to derive dependencies and change detection.
+    """
+
+    def __init__(self, name: str, fn: Callable, reads: Sequence[str] = (), writes: Sequence[str] = ()):
+        self.name = name
+        self.fn = fn
+        self.reads = tuple(reads)
+        self.writes = tuple(writes)
+
+    @classmethod
+    def from_agent(cls, agent) -> "Node":
+        return cls(agent.name, lambda ctx: agent.run_from_context(), agent.reads, agent.writes)
+
+
+def _matches(pattern: str, key: str) -> bool:
+    return fnmatch.fnmatchcase(key, pattern) if "*" in pattern else pattern == key
+
+
+class Pipeline:
+    """
+    Small DAG executor over a ContextStore. A node depends on every node
+    that writes a key it reads. Ready nodes run concurrently; a node is
+    skipped when the fingerprint of its inputs matches the one recorded on
+    its last successful run and its outputs are still present. Fingerprints
+    live in the context itself, so a persisted context resumes where it
+    stopped.
+    """
+
+    def __init__(self, nodes: Iterable[Node], max_workers: int = 4):
+        self.nodes: Dict[str, Node] = {}
+        for n in nodes:
+            if n.name in self.nodes:
+                raise ValueError(f"Duplicate pipeline node: {n.name}")
+            self.nodes[n.name] = n
+        self.max_workers = max_workers
+        self.deps = self._build_deps()
+
+    def _build_deps(self) -> Dict[str, List[str]]:
+        deps: Dict[str, List[str]] = {name: [] for name in self.nodes}
+        for name, node in self.nodes.items():
+            for other_name, other in self.nodes.items():
+                if other_name == name:
+                    continue
+                if any(_matches(w, r) or _matches(r, w) for r in node.reads for w in other.writes):
+                    deps[name].append(other_name)
+        self._check_acyclic(deps)
+        return deps
+
+    def _check_acyclic(self, deps: Dict[str, List[str]]) -> None:
+        state: Dict[str, int] = {}
+
+        def visit(n: str) -> None:
+            if state.get(n) == 1:
+                raise ValueError(f"Pipeline has a cycle through '{n}'")
+            if state.get(n) == 2:
+                return
+            state[n] = 1
+            for d in deps[n]:
+                visit(d)
+            state[n] = 2
+
+        for n in deps:
+            visit(n)
+
+    # --- change detection ---
+
+    def _read_values(self, node: Node, context) -> Dict:
+        keys = context.keys()
+        values = {}
+        for r in node.reads:
+            if "*" in r:
+                for k in sorted(keys):
+                    if _matches(r, k):
+                        values[k] = context.get(k)
+            else:
+                values[r] = context.get(r)
+        return values
+
+    def fingerprint(self, node: Node, context) -> str:
+        payload = json.dumps(self._read_values(node, context), sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _outputs_present(self, node: Node, context) -> bool:
+        keys = context.keys()
+        for w in node.writes:
+            if "*" in w:
+                if not any(_matches(w, k) for k in keys):
+                    return False
+            elif context.get(w) in (None, "", [], {}):
+                return False
+        return True
+
+    def is_fresh(self, node: Node, context) -> bool:
+        recorded = (context.get(FINGERPRINTS_KEY) or {}).get(node.name)
+        return recorded == self.fingerprint(node, context) and self._outputs_present(node, context)
+
+    # --- execution ---
+
+    def run(self, context, force: bool = False, on_event: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+        """
+        Execute the DAG. Returns {node: "ran" | "skipped" | "failed: ..." | "blocked"}.
+        `on_event(node, status)` is called as nodes finish (for progress output).
+        """
+        status: Dict[str, str] = {}
+        pending = set(self.nodes)
+
+        def emit(name: str, st: str) -> None:
+            status[name] = st
+            if on_event:
+                on_event(name, st)
+
+        def ok(name: str) -> bool:
+            return status.get(name) in ("ran", "skipped")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            running = {}
+            while pending or running:
+                for name in sorted(pending):
+                    deps = self.deps[name]
+                    if any(d in status and not ok(d) for d in deps):
+                        pending.discard(name)
+                        emit(name, "blocked")
+                        continue
+                    if not all(ok(d) for d in deps):
+                        continue
+                    pending.discard(name)
+                    node = self.nodes[name]
+                    # Upstream nodes that re-ran invalidate this node via its fingerprint
+                    if not force and self.is_fresh(node, context):
+                        emit(name, "skipped")
+                        continue
+                    fp = self.fingerprint(node, context)
+                    running[pool.submit(tracer.bind(node.fn), context)] = (name, fp)
+
+                if not running:
+                    if pending:
+                        # remaining nodes were unblocked by skips above; loop again
+                        continue
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name, fp = running.pop(fut)
+                    try:
+                        fut.result()
+                    except Exception as e:
+                        emit(name, f"failed: {e}")
+                        continue
+                    context.update(FINGERPRINTS_KEY, lambda cur, n=name, f=fp: {**(cur or {}), n: f})
+                    emit(name, "ran")
+        return status
+
+    @classmethod
+    def from_agents(cls, agents: Iterable, max_workers: int = 4) -> "Pipeline":
+        return cls([Node.from_agent(a) for a in agents], max_workers=max_workers)
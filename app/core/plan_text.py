@@ -0,0 +1,146 @@
+# app/core/plan_text.py
+
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+MAX_TOPICS_PER_WEEK = int(os.getenv("PLAN_MAX_TOPICS_PER_WEEK", "7"))
+MAX_TOPIC_WORDS = 6
+# Kept below the parser agent's default PLAN_PARSE_MIN_CONFIDENCE (0.6): a parse
+# that cut, split apart or lost topics is handed to the LLM rather than shown
+SUSPECT_CONFIDENCE = 0.5
+
+# "Week 1: ...", "**Week 1 - ...**", "### Week 1 (Days 1-7)", "WEEK 1"
+_WEEK_RE = re.compile(r"^\W*week\s*(\d{1,2})\b\W*?(?:\([^)]*\))?\s*[:\-–—.]?\s*(.*)$", re.IGNORECASE)
+_BULLET_RE = re.compile(r"^\s*(?:[-*•+]|\d{1,2}[.)]|[a-z][.)])\s+(.*)$", re.IGNORECASE)
+_DAY_RE = re.compile(r"^(?:days?\s*\d+(?:\s*[-–&,]\s*\d+)*|objectives?|goals?|focus|topics?|tasks?|"
+                     r"weekly objectives?|key topics|resources?)\s*[:\-–]\s*", re.IGNORECASE)
+_LIST_INTRO_RE = re.compile(r"\b(?:such as|including|like|e\.g\.?|i\.e\.?|covering)\s+", re.IGNORECASE)
+# "&" and "+" only separate topics when spaced out; "C++" and "R&D" are names
+_SPLIT_RE = re.compile(r"\s*(?:,|;|\band\b)\s*|\s+[&+]\s+", re.IGNORECASE)
+_MARKUP_RE = re.compile(r"[*_`>\[\]]")
+# "#" is markup only as a heading marker; "C#" and "F#" keep theirs
+_HEADING_RE = re.compile(r"^\s*#+\s*")
+
+# Leading phrasing that wraps a topic rather than naming one
+_VERBS = (
+    "review", "revise", "revisit", "study", "learn", "learn about", "practice", "practise", "understand",
+    "focus on", "master", "read about", "read", "brush up on", "explore", "cover", "solve", "complete",
+    "implement", "work on", "get familiar with", "familiarize yourself with", "dive into", "deep dive into",
+    "strengthen", "build", "prepare for", "refresh", "go over", "do", "begin with", "start with",
+)
+_FILLERS = (
+    "your understanding of", "your knowledge of", "understanding of", "knowledge of", "the basics of",
+    "basics of", "fundamentals of", "concepts of", "concepts in", "an overview of", "overview of",
+    "the", "a", "an", "key", "core", "common", "important", "essential", "basic",
+)
+# A prefix must be followed by whitespace (or end the chunk): with \b the filler
+# "a" would also match before "/" and turn "A/B testing" into "/b testing"
+_VERB_RE = re.compile(r"^(?:%s)(?:\s+|$)" % "|".join(sorted(map(re.escape, _VERBS), key=len, reverse=True)),
+                      re.IGNORECASE)
+_FILLER_RE = re.compile(r"^(?:%s)(?:\s+|$)" % "|".join(sorted(map(re.escape, _FILLERS), key=len, reverse=True)),
+                        re.IGNORECASE)
+# "15 LeetCode problems on two pointers" names its topic after the count
+_PROBLEMS_ON_RE = re.compile(r"^\d+\s+(?:[a-z]+\s+){0,2}(?:problems?|questions?|exercises?)\s+"
+                             r"(?:on|for|about|covering|in|using)(?:\s+|$)", re.IGNORECASE)
+# Bullets that describe activity rather than content
+_NON_TOPIC_RE = re.compile(r"^(?:.*\bmock (?:interviews?|sessions?)\b.*|rest\b.*|recap\b.*|review(?: week)?|"
+                           r"take breaks?.*|(?:practice )?(?:problems?|questions?|exercises?)|(?:review )?weak (?:areas?|spots?|topics?)|"
+                           r"\d+\s+.*\b(?:problems?|questions?|exercises?)\b.*|.*\bper (?:day|week)\b.*|"
+                           r"design (?:a|an)\s.*)$",
+                           re.IGNORECASE)
+
+
+def normalize_topic(topic: str) -> str:
+    """Canonical form used for topics_flat: lowercase, no markup, single spaces, no trailing punctuation."""
+    t = _HEADING_RE.sub("", _MARKUP_RE.sub("", str(topic or ""))).lower()
+    t = re.sub(r"\s+", " ", t).strip(" .,:;!?-–—\"'")
+    return t
+
+
+def dedupe_topics(topics: List[str]) -> List[str]:
+    """Normalise and drop empty/duplicate topics, keeping first-seen order."""
+    return list(dict.fromkeys(t for t in map(normalize_topic, topics) if t))
+
+
+def _strip_wrappers(chunk: str) -> str:
+    prev = None
+    while prev != chunk:
+        prev = chunk
+        chunk = _VERB_RE.sub("", chunk)
+        chunk = _FILLER_RE.sub("", chunk)
+        chunk = _PROBLEMS_ON_RE.sub("", chunk)
+    return chunk
+
+
+def _topics_from_line(line: str) -> List[str]:
+    line = _HEADING_RE.sub("", _MARKUP_RE.sub("", line)).strip()
+    line = _DAY_RE.sub("", line)
+    # "Graphs: BFS, DFS" names a topic, then its subtopics after the colon
+    head, sep, tail = line.partition(":")
+    if sep and tail.strip() and len(head.split()) <= 4:
+        line = f"{head}, {tail}"
+    # "Dynamic programming such as knapsack" keeps the topic and its examples
+    intro = _LIST_INTRO_RE.search(line)
+    if intro:
+        line = f"{line[:intro.start()]}, {line[intro.end():]}"
+    line = re.sub(r"\([^)]*\)", "", line).rstrip(" .")
+    out = []
+    for chunk in _SPLIT_RE.split(line):
+        t = normalize_topic(_strip_wrappers(chunk.strip()))
+        if t and not _NON_TOPIC_RE.match(t):
+            out.append(t)
+    return out
+
+
+def parse_plan(text: str) -> Tuple[Dict[str, Any], float]:
+    """
+    Parse the planner's "Week N: ..." layout into {"weeks": [{"week", "topics"}]}
+    without a model call. Returns (data, confidence in [0, 1]); low confidence
+    means the text did not look like the expected layout and an LLM parse is
+    the safer bet.
+    """
+    weeks: List[Dict[str, Any]] = []
+    current = None
+    for raw in (text or "").splitlines():
+        if not raw.strip():
+            continue
+        m = _WEEK_RE.match(raw.strip())
+        if m:
+            current = {"week": int(m.group(1)), "title": m.group(2), "bullets": []}
+            weeks.append(current)
+            continue
+        if current is None:
+            continue
+        b = _BULLET_RE.match(raw)
+        current["bullets"].append(b.group(1) if b else raw.strip())
+
+    out, long_topics, total, empty, dropped, stubs = [], 0, 0, 0, 0, 0
+    for w in weeks:
+        lines = w["bullets"] or [w["title"]]
+        topics = dedupe_topics([t for line in lines for t in _topics_from_line(line)])
+        if not topics and w["bullets"]:
+            topics = dedupe_topics(_topics_from_line(w["title"]))
+        dropped += max(0, len(topics) - MAX_TOPICS_PER_WEEK)
+        topics = topics[:MAX_TOPICS_PER_WEEK]
+        empty += not topics
+        total += len(topics)
+        long_topics += sum(1 for t in topics if len(t.split()) > MAX_TOPIC_WORDS)
+        stubs += sum(1 for t in topics if len(t) < 2)   # "c" left over from a split name
+        out.append({"week": w["week"], "topics": topics})
+
+    if not out or total == 0:
+        return {"weeks": []}, 0.0
+    numbers = [w["week"] for w in out]
+    confidence = 1.0
+    if numbers != list(range(numbers[0], numbers[0] + len(numbers))):
+        confidence *= 0.5           # repeated or skipped week headers
+    confidence *= 1 - empty / len(out)
+    confidence *= 1 - long_topics / total   # sentence fragments rather than topics
+    # more topics than a week holds: the extra ones are cut, so say how much was lost
+    confidence *= total / (total + dropped)
+    if total / len(out) < 2:
+        confidence *= 0.7           # too thin to trust
+    if dropped or stubs or empty:
+        confidence = min(confidence, SUSPECT_CONFIDENCE)
+    return {"weeks": out}, round(confidence, 3)
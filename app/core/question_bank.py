@@ -0,0 +1,190 @@
+# app/core/question_bank.py
+
+import os
+import re
+import time
+import hashlib
+import threading
+from typing import Optional, Dict, Any, List, Iterable
+
+from sqlalchemy import select, update, func, case
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.db import SessionLocal, QuestionBankEntry, MockQA, KV
+from app.core.topic_index import canonical_topic
+
+BANK_ENABLED = os.getenv("QUESTION_BANK_ENABLED", "1").lower() not in ("0", "false", "no")
+STATS_PAGE = 500
+# take() ranks by times_served plus these penalties, so they trade off in "servings":
+# a question everyone aces (mean score 5) counts as EASY_WEIGHT * 2 extra servings
+# over an average one (3), and each day of age adds AGE_WEIGHT up to MAX_AGE_DAYS
+EASY_WEIGHT = float(os.getenv("QUESTION_BANK_EASY_WEIGHT", "1.0"))
+AGE_WEIGHT = float(os.getenv("QUESTION_BANK_AGE_WEIGHT", "0.05"))
+MAX_AGE_DAYS = float(os.getenv("QUESTION_BANK_MAX_AGE_DAYS", "60"))
+NEUTRAL_SCORE = 3.0         # assumed mean for questions nobody has answered yet
+_WATERMARK_KEY = "question_bank::stats_watermark"
+
+
+def question_hash(question: str) -> str:
+    norm = re.sub(r"\s+", " ", str(question or "")).strip().lower()
+    return hashlib.sha1(norm.encode("utf-8")).hexdigest()
+
+
+def bank_key(role: str, focus: str):
+    return canonical_topic(role)[:128], canonical_topic(focus)[:128]
+
+
+class QuestionBank:
+    """
+    Generated questions keyed by canonical (role, focus). take() serves the
+    questions this user has not answered yet, preferring ones served less
+    often, added more recently and that candidates do not all ace; add()
+    stores freshly generated ones; sync_stats() folds new mock_qa_history
+    rows into the per-question answer counts and mean scores take() uses.
+    """
+
+    def __init__(self, enabled: bool = BANK_ENABLED):
+        self.enabled = enabled
+        self._sync_lock = threading.Lock()
+
+    def take(self, role: str, focus: str, n: int, user: Optional[str] = None,
+             exclude: Iterable[str] = ()) -> List[str]:
+        """Up to n bank questions for (role, focus) that `user` has not answered and not in `exclude`."""
+        if not self.enabled or n <= 0:
+            return []
+        role_key, focus_key = bank_key(role, focus)
+        skip = {question_hash(q) for q in exclude}
+        mean = func.coalesce(QuestionBankEntry.score_sum / func.nullif(QuestionBankEntry.score_count, 0),
+                             NEUTRAL_SCORE)
+        age = (time.time() - func.coalesce(QuestionBankEntry.created_at, time.time())) / 86400.0
+        rank = (QuestionBankEntry.times_served
+                + EASY_WEIGHT * (mean - NEUTRAL_SCORE)
+                + AGE_WEIGHT * case((age > MAX_AGE_DAYS, MAX_AGE_DAYS), else_=age))
+        stmt = (
+            select(QuestionBankEntry.question)
+            .where(QuestionBankEntry.role_key == role_key, QuestionBankEntry.focus_key == focus_key)
+            .order_by(rank, QuestionBankEntry.id)
+            .limit(n)
+        )
+        try:
+            with SessionLocal() as s:
+                if user:
+                    # history rows keep the question as asked; compare normalised hashes
+                    skip.update(question_hash(q) for q in s.scalars(
+                        select(MockQA.question).where(MockQA.session_id == user)))
+                if skip:
+                    stmt = stmt.where(QuestionBankEntry.question_hash.not_in(list(skip)))
+                return list(s.scalars(stmt))
+        except SQLAlchemyError:
+            return []
+
+    def add(self, role: str, focus: str, questions: Iterable[str]) -> int:
+        """Store generated questions; duplicates for the same (role, focus) are skipped."""
+        if not self.enabled:
+            return 0
+        role_key, focus_key = bank_key(role, focus)
+        fresh = {question_hash(q): q.strip() for q in questions if isinstance(q, str) and q.strip()}
+        if not fresh:
+            return 0
+        now = time.time()
+        try:
+            with SessionLocal() as s:
+                have = set(s.scalars(
+                    select(QuestionBankEntry.question_hash).where(
+                        QuestionBankEntry.role_key == role_key, QuestionBankEntry.focus_key == focus_key,
+                        QuestionBankEntry.question_hash.in_(list(fresh)),
+                    )
+                ))
+                new = [h for h in fresh if h not in have]
+                for h in new:
+                    s.add(QuestionBankEntry(role_key=role_key, focus_key=focus_key, question=fresh[h],
+                                            question_hash=h, times_served=0, answers=0, score_sum=0.0,
+                                            score_count=0, created_at=now))
+                s.commit()
+                return len(new)
+        except SQLAlchemyError:
+            return 0
+
+    def mark_served(self, role: str, focus: str, questions: Iterable[str]) -> None:
+        role_key, focus_key = bank_key(role, focus)
+        hashes = [question_hash(q) for q in questions]
+        if not self.enabled or not hashes:
+            return
+        try:
+            with SessionLocal() as s:
+                s.execute(
+                    update(QuestionBankEntry)
+                    .where(QuestionBankEntry.role_key == role_key, QuestionBankEntry.focus_key == focus_key,
+                           QuestionBankEntry.question_hash.in_(hashes))
+                    .values(times_served=QuestionBankEntry.times_served + 1)
+                )
+                s.commit()
+        except SQLAlchemyError:
+            pass
+
+    def sync_stats(self) -> int:
+        """
+        Fold mock_qa_history rows newer than the stored watermark into the
+        bank's answer/score counters. Incremental and keyset-paged, so it
+        can run after every session. Returns the number of rows consumed.
+        """
+        if not self.enabled or not self._sync_lock.acquire(blocking=False):
+            return 0
+        consumed = 0
+        try:
+            with SessionLocal() as s:
+                mark = s.get(KV, _WATERMARK_KEY)
+                last_id = int(mark.value) if mark is not None and mark.value is not None else 0
+                while True:
+                    rows = s.execute(
+                        select(MockQA.id, MockQA.question, MockQA.evaluation)
+                        .where(MockQA.id > last_id).order_by(MockQA.id).limit(STATS_PAGE)
+                    ).all()
+                    if not rows:
+                        break
+                    agg: Dict[str, List[float]] = {}
+                    for _, question, evaluation in rows:
+                        bucket = agg.setdefault(question_hash(question), [0, 0.0, 0])
+                        bucket[0] += 1
+                        score = (evaluation or {}).get("score") if isinstance(evaluation, dict) else None
+                        if isinstance(score, (int, float)):
+                            bucket[1] += float(score)
+                            bucket[2] += 1
+                    for h, (answers, score_sum, score_count) in agg.items():
+                        s.execute(
+                            update(QuestionBankEntry).where(QuestionBankEntry.question_hash == h).values(
+                                answers=QuestionBankEntry.answers + answers,
+                                score_sum=QuestionBankEntry.score_sum + score_sum,
+                                score_count=QuestionBankEntry.score_count + score_count,
+                            )
+                        )
+                    last_id = rows[-1][0]
+                    consumed += len(rows)
+                    if mark is None:
+                        mark = KV(key=_WATERMARK_KEY)
+                        s.add(mark)
+                    mark.value = last_id
+                    s.commit()
+        except SQLAlchemyError:
+            pass
+        finally:
+            self._sync_lock.release()
+        return consumed
+
+    def stats(self, role: str, focus: str) -> Dict[str, Any]:
+        role_key, focus_key = bank_key(role, focus)
+        with SessionLocal() as s:
+            total, answers, score_sum, score_count = s.execute(
+                select(func.count(QuestionBankEntry.id), func.sum(QuestionBankEntry.answers),
+                       func.sum(QuestionBankEntry.score_sum), func.sum(QuestionBankEntry.score_count))
+                .where(QuestionBankEntry.role_key == role_key, QuestionBankEntry.focus_key == focus_key)
+            ).one()
+        return {
+            "questions": total or 0,
+            "answers": answers or 0,
+            "avg_score": round(score_sum / score_count, 2) if score_count else None,
+        }
+
+
+# Process-wide bank shared by mock interview agents
+question_bank = QuestionBank()
@@ -0,0 +1,297 @@
+# app/core/rate_limit.py
+
+import os
+import time
+import random
+import asyncio
+import threading
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import openai
+
+RPM = float(os.getenv("LLM_RPM", "3500"))
+TPM = float(os.getenv("LLM_TPM", "90000"))
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+TARGET_LATENCY = float(os.getenv("LLM_TARGET_LATENCY", "20"))    # seconds
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_CAP = float(os.getenv("LLM_BACKOFF_CAP", "30"))
+# Completion tokens reserved per call when the request sets no max_tokens
+EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "600"))
+
+RETRYABLE = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+@lru_cache(maxsize=16)
+def _encoding(model: str):
+    """tiktoken encoding for a model, or None if unavailable (cached either way)."""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # tiktoken missing or its vocab cannot be fetched; don't retry the download per call
+        return None
+
+
+def count_tokens(messages: List[Dict[str, Any]], model: str = "gpt-3.5-turbo") -> int:
+    """Prompt tokens for a chat request (tiktoken, plus per-message framing)."""
+    enc = _encoding(model)
+    if enc is None:
+        # ~4 chars per token
+        return sum(len(str(m.get("content", ""))) // 4 + 4 for m in messages) + 3
+    total = 3
+    for m in messages:
+        total += 4 + len(enc.encode(str(m.get("content", ""))))
+    return total
+
+
+class TokenBucket:
+    """Continuous-refill bucket holding up to one minute of budget."""
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.clock = clock
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, n: float) -> float:
+        """Take n units now and return how long the caller must wait before using them."""
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(n, self.capacity)  # a single oversize call may not deadlock
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, n: float) -> None:
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + n)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: grows by ~1 per `limit` fast successes, halves
+    on throttling, and shrinks gently when latency exceeds the target.
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = MIN_CONCURRENCY, max_limit: int = MAX_CONCURRENCY,
+                 target_latency: float = TARGET_LATENCY):
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Future"]] = []
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def acquire(self) -> None:
+        with self._cond:
+            while not self._has_slot():
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._has_slot():
+                    self.in_flight += 1
+                    return
+                woken = loop.create_future()
+                self._waiters.append((loop, woken))
+            try:
+                await woken
+            finally:
+                with self._cond:
+                    if (loop, woken) in self._waiters:
+                        self._waiters.remove((loop, woken))
+
+    def release(self, latency: Optional[float] = None, throttled: bool = False) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit / 2)
+            elif latency is not None:
+                if latency > self.target_latency:
+                    self.limit = max(self.min_limit, self.limit * 0.9)
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+            waiters, self._waiters = self._waiters, []
+        for loop, woken in waiters:
+            # async waiters may sit on other threads' loops; each re-checks for a slot
+            try:
+                loop.call_soon_threadsafe(_wake, woken)
+            except RuntimeError:
+                pass  # loop closed
+
+
+def _wake(woken: "asyncio.Future") -> None:
+    if not woken.done():
+        woken.set_result(None)
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    resp = getattr(exc, "response", None)
+    try:
+        value = resp.headers.get("retry-after") if resp is not None else None
+        return float(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Shared limiter for every LLM call: budgets requests/minute and
+    tokens/minute (prompt tokens counted with tiktoken before sending),
+    adapts concurrency to latency and 429s, and retries retryable errors
+    with full-jitter exponential backoff (honouring Retry-After).
+    """
+
+    def __init__(self, rpm: float = RPM, tpm: float = TPM, max_retries: int = MAX_RETRIES):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AdaptiveConcurrency()
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "retries": 0, "throttled": 0, "failures": 0, "waited_s": 0.0}
+
+    def _count(self, field: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[field] += n
+
+    def _estimate(self, messages, model: str, max_tokens: Optional[int]) -> int:
+        return count_tokens(messages, model) + (max_tokens or EXPECTED_COMPLETION_TOKENS)
+
+    def _budget(self, attempt: int, estimate: int) -> float:
+        """Reserve one request per attempt, but the token estimate only once per logical call."""
+        wait = self.requests.reserve(1)
+        if attempt == 0:
+            wait = max(wait, self.tokens.reserve(estimate))
+        if wait > 0:
+            self._count("waited_s", wait)
+        return wait
+
+    def _settle(self, estimate: int, usage: Any) -> None:
+        """Correct the token budget to the reported usage, in either direction."""
+        actual = getattr(usage, "total_tokens", None)
+        if actual is None:
+            return
+        if actual < estimate:
+            self.tokens.refund(estimate - actual)
+        elif actual > estimate:
+            # already spent: the next reservations wait for it instead of this call
+            self.tokens.reserve(actual - estimate)
+
+    def _failed(self, attempt: int, exc: BaseException, estimate: int) -> Optional[float]:
+        """Book a failed attempt; returns the backoff before retrying, or None to give up."""
+        throttled = isinstance(exc, openai.RateLimitError)
+        self.concurrency.release(throttled=throttled)
+        if not isinstance(exc, RETRYABLE):
+            self.tokens.refund(estimate)   # nothing was generated
+            return None
+        self._count("throttled" if throttled else "retries")
+        if attempt == self.max_retries:
+            self._count("failures")
+            self.tokens.refund(estimate)
+            return None
+        return self._backoff(attempt, exc)
+
+    def _backoff(self, attempt: int, exc: Exception) -> float:
+        hinted = _retry_after(exc)
+        if hinted is not None:
+            return hinted + random.uniform(0, BACKOFF_BASE)
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+    def _open(self, fn: Callable[[], Any], estimate: int) -> Tuple[Any, float]:
+        """fn() with budgeting and retries; returns (result, start) with a concurrency slot held."""
+        for attempt in range(self.max_retries + 1):
+            wait = self._budget(attempt, estimate)
+            if wait > 0:
+                time.sleep(wait)
+            self.concurrency.acquire()
+            start = time.monotonic()
+            try:
+                return fn(), start
+            except BaseException as e:
+                backoff = self._failed(attempt, e, estimate)
+                if backoff is None:
+                    raise
+                time.sleep(backoff)
+
+    def call(self, fn: Callable[[], Any], messages: List[Dict[str, Any]], model: str,
+             max_tokens: Optional[int] = None) -> Any:
+        self._count("calls")
+        estimate = self._estimate(messages, model, max_tokens)
+        resp, start = self._open(fn, estimate)
+        self.concurrency.release(latency=time.monotonic() - start)
+        self._settle(estimate, getattr(resp, "usage", None))
+        return resp
+
+    def stream(self, fn: Callable[[], Iterable[Any]], messages: List[Dict[str, Any]], model: str,
+               max_tokens: Optional[int] = None) -> Iterator[Any]:
+        """
+        call() for streaming requests: yields the chunks, holding the
+        concurrency slot until the stream is consumed or closed. Only opening
+        the stream is retried; the estimate is settled from the usage chunk.
+        """
+        self._count("calls")
+        estimate = self._estimate(messages, model, max_tokens)
+        stream, _ = self._open(fn, estimate)
+        usage = None
+        try:
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                yield chunk
+        finally:
+            # generation time says little about load, so no latency signal here
+            self.concurrency.release()
+            self._settle(estimate, usage)
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], messages: List[Dict[str, Any]], model: str,
+                    max_tokens: Optional[int] = None) -> Any:
+        self._count("calls")
+        estimate = self._estimate(messages, model, max_tokens)
+        for attempt in range(self.max_retries + 1):
+            wait = self._budget(attempt, estimate)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.concurrency.aacquire()
+            start = time.monotonic()
+            try:
+                resp = await fn()
+            except BaseException as e:
+                backoff = self._failed(attempt, e, estimate)
+                if backoff is None:
+                    raise
+                await asyncio.sleep(backoff)
+                continue
+            self.concurrency.release(latency=time.monotonic() - start)
+            self._settle(estimate, getattr(resp, "usage", None))
+            return resp
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self.counters)
+        out["concurrency_limit"] = round(self.concurrency.limit, 2)
+        out["in_flight"] = self.concurrency.in_flight
+        return out
+
+
+# Process-wide limiter shared by all agents
+rate_limiter = RateLimiter()
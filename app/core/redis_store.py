@@ -0,0 +1,246 @@
+# app/core/redis_store.py
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.core.context_store import ContextStore
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+KEY_PREFIX = os.getenv("REDIS_CONTEXT_PREFIX", "agentweb")
+# How often a replica re-checks the namespace version before trusting its local cache
+VALIDATE_INTERVAL = float(os.getenv("REDIS_CONTEXT_VALIDATE_SECONDS", "0.25"))
+MAX_LOCAL_KEYS = int(os.getenv("REDIS_CONTEXT_LOCAL_KEYS", "256"))
+
+_NS_FIELD = "__ns__"   # namespace-wide version counter in the versions hash
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+class RedisContextStore(ContextStore):
+    """
+    ContextStore backed by two Redis hashes per namespace:
+
+        <prefix>:ctx:<ns>     field -> JSON value
+        <prefix>:ctxver:<ns>  field -> write counter, plus __ns__ for the namespace
+
+    Writes go straight to Redis in one pipeline (value + version bumps), so
+    every replica sees them. Reads are served from a small local LRU cache
+    that is revalidated against the namespace version at most every
+    VALIDATE_INTERVAL seconds; when it moved, only keys whose own version
+    changed are dropped. Dirty tracking from ContextStore is kept so the SQL
+    save path still works on top of it.
+    """
+
+    def __init__(self, namespace: str = "context", client=None, url: str = REDIS_URL,
+                 validate_interval: float = VALIDATE_INTERVAL, max_local_keys: int = MAX_LOCAL_KEYS):
+        super().__init__(namespace=namespace)
+        if client is None:
+            import redis  # optional dependency; only needed for a real server
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.r = client
+        self.data_key = f"{KEY_PREFIX}:ctx:{namespace}"
+        self.ver_key = f"{KEY_PREFIX}:ctxver:{namespace}"
+        self.validate_interval = validate_interval
+        self.max_local_keys = max_local_keys
+        self._local: "OrderedDict[str, Any]" = OrderedDict()
+        self._local_ver: Dict[str, int] = {}
+        self._ns_version: Optional[int] = None
+        self._validated_at = 0.0
+        self.stats = {"local_hits": 0, "remote_reads": 0, "writes": 0, "invalidations": 0}
+
+    # --- local cache ---
+
+    def _remember(self, key: str, value: Any, version: int) -> None:
+        self._local[key] = value
+        self._local.move_to_end(key)
+        self._local_ver[key] = version
+        while len(self._local) > self.max_local_keys:
+            old, _ = self._local.popitem(last=False)
+            self._local_ver.pop(old, None)
+
+    def _forget(self, key: str) -> None:
+        self._local.pop(key, None)
+        self._local_ver.pop(key, None)
+
+    def _validate(self) -> None:
+        """Drop locally cached keys that another replica has changed."""
+        now = time.monotonic()
+        if now - self._validated_at < self.validate_interval:
+            return
+        self._validated_at = now
+        ns_version = int(self.r.hget(self.ver_key, _NS_FIELD) or 0)
+        if ns_version == self._ns_version:
+            return
+        cached = list(self._local)
+        if cached:
+            remote = self.r.hmget(self.ver_key, cached)
+            for key, ver in zip(cached, remote):
+                if int(ver or 0) != self._local_ver.get(key):
+                    self._forget(key)
+                    self.stats["invalidations"] += 1
+        self._ns_version = ns_version
+
+    # --- ContextStore API ---
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        """Write several keys in one round trip."""
+        if not items:
+            return
+        pipe = self.r.pipeline()
+        for k, v in items.items():
+            pipe.hset(self.data_key, k, _dumps(v))
+            pipe.hincrby(self.ver_key, k, 1)
+        pipe.hincrby(self.ver_key, _NS_FIELD, 1)
+        results = pipe.execute()
+        with self._lock:
+            for i, (k, v) in enumerate(items.items()):
+                self._remember(k, v, int(results[2 * i + 1]))
+                self._touch(k)
+            # our own write moved the namespace version; no need to revalidate for it
+            if self._ns_version is not None and int(results[-1]) == self._ns_version + 1:
+                self._ns_version = int(results[-1])
+        self.stats["writes"] += len(items)
+
+    def get(self, key, default=None):
+        self._validate()
+        with self._lock:
+            if key in self._local:
+                self._local.move_to_end(key)
+                self.stats["local_hits"] += 1
+                return self._local[key]
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Fetch several keys (value and version) in one pipelined round trip."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        pipe = self.r.pipeline()
+        pipe.hmget(self.data_key, keys)
+        pipe.hmget(self.ver_key, keys)
+        raw, vers = pipe.execute()
+        self.stats["remote_reads"] += len(keys)
+        out = {}
+        with self._lock:
+            for k, v, ver in zip(keys, raw, vers):
+                if v is None:
+                    continue
+                out[k] = json.loads(v)
+                self._remember(k, out[k], int(ver or 0))
+        return out
+
+    def keys(self) -> Set[str]:
+        return {k for k in self.r.hkeys(self.data_key)}
+
+    def get_all(self):
+        raw = self.r.hgetall(self.data_key)
+        return {k: json.loads(v) for k, v in raw.items()}
+
+    def update(self, key, func):
+        # read-modify-write; concurrent writers on other replicas are last-write-wins
+        self.set(key, func(self.get(key)))
+
+    def delete(self, key):
+        # the key's version keeps counting: resetting it would let a later
+        # re-set land on a version some replica still has cached
+        pipe = self.r.pipeline()
+        pipe.hdel(self.data_key, key)
+        pipe.hincrby(self.ver_key, key, 1)
+        pipe.hincrby(self.ver_key, _NS_FIELD, 1)
+        pipe.execute()
+        with self._lock:
+            self._forget(key)
+            self._mark_deleted(key)
+
+    def load(self, data: Dict[str, Any]):
+        """Seed Redis from persisted data (e.g. the SQL session) without marking it dirty."""
+        if not data:
+            return
+        self.set_many(data)
+        with self._lock:
+            for k in data:
+                self._mark_loaded(k)
+
+    def take_dirty(self, sink: str = "default"):
+        dirty, deleted = self._dirty_since(sink)
+        return self.get_many(dirty), deleted
+
+    def mark_dirty(self, keys: Iterable[str] = None, deleted: Iterable[str] = (), sink: str = "default"):
+        with self._lock:
+            state = self._sinks.setdefault(sink, {"seen": 0, "keys": set(), "deleted": set()})
+            state["keys"].update(self.keys() if keys is None else keys)
+            state["deleted"].update(deleted)
+
+
+class InMemoryRedis:
+    """
+    Minimal in-process stand-in for the redis-py hash commands used by
+    RedisContextStore (tests and single-process runs without a server).
+    Instances created with the same `shared` dict behave like replicas
+    talking to one server.
+    """
+
+    def __init__(self, shared: Optional[Dict[str, Dict[str, str]]] = None):
+        self._h = shared if shared is not None else {}
+        self._lock = threading.Lock()
+
+    def hset(self, name, key, value):
+        with self._lock:
+            h = self._h.setdefault(name, {})
+            new = key not in h
+            h[key] = str(value)
+            return int(new)
+
+    def hget(self, name, key):
+        return self._h.get(name, {}).get(key)
+
+    def hmget(self, name, keys):
+        h = self._h.get(name, {})
+        return [h.get(k) for k in keys]
+
+    def hgetall(self, name):
+        return dict(self._h.get(name, {}))
+
+    def hkeys(self, name):
+        return list(self._h.get(name, {}))
+
+    def hdel(self, name, *keys):
+        with self._lock:
+            h = self._h.get(name, {})
+            return sum(1 for k in keys if h.pop(k, None) is not None)
+
+    def hincrby(self, name, key, amount=1):
+        with self._lock:
+            h = self._h.setdefault(name, {})
+            h[key] = str(int(h.get(key, 0)) + amount)
+            return int(h[key])
+
+    def pipeline(self):
+        return _InMemoryPipeline(self)
+
+
+class _InMemoryPipeline:
+    def __init__(self, r: InMemoryRedis):
+        self._r = r
+        self._ops: List = []
+
+    def __getattr__(self, name):
+        fn = getattr(self._r, name)
+
+        def queue(*args, **kwargs):
+            self._ops.append((fn, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        ops, self._ops = self._ops, []
+        return [fn(*a, **kw) for fn, a, kw in ops]
@@ -0,0 +1,105 @@
+# app/core/rerun_profiler.py
+
+import time
+import cProfile
+import pstats
+import contextlib
+from collections import deque
+from typing import Optional, Dict, Any, List, Deque
+
+from app.core.tracing import tracer
+
+HISTORY = 50        # reruns kept per browser session
+TOP_FUNCTIONS = 15
+
+
+class RerunProfiler:
+    """
+    Wall-clock breakdown of one Streamlit rerun. The script wraps its parts
+    in section(name); finish() records the rerun into a rolling history
+    (kept in st.session_state by the caller). With deep=True the whole
+    rerun also runs under cProfile and the top functions are kept.
+
+    Each rerun is also the root span of a trace (app/core/tracing.py) and
+    each section a child span, so agent, LLM and DB spans started by the
+    script nest under the part of the page that caused them.
+    """
+
+    def __init__(self, deep: bool = False):
+        self.started = time.perf_counter()
+        self.sections: Dict[str, float] = {}
+        self._stack: List[str] = []
+        self._profile: Optional[cProfile.Profile] = None
+        # a rerun cut short by st.rerun()/st.stop() never reached finish()
+        tracer.detach()
+        self.span = tracer.start("ui.rerun", root=True, activate=True, deep=deep)
+        if deep:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    @contextlib.contextmanager
+    def section(self, name: str):
+        """Time a block; a section opened inside another is recorded as 'outer › inner'."""
+        key = " › ".join(self._stack + [name])
+        self._stack.append(name)
+        t0 = time.perf_counter()
+        try:
+            with tracer.span(name):
+                yield
+        finally:
+            self._stack.pop()
+            self.sections[key] = self.sections.get(key, 0.0) + time.perf_counter() - t0
+
+    def _top_functions(self) -> List[Dict[str, Any]]:
+        self._profile.disable()
+        stats = pstats.Stats(self._profile)
+        rows = [
+            {"function": f"{func} ({filename.rsplit('/', 1)[-1]}:{line})", "calls": nc,
+             "tottime_ms": round(tt * 1000, 2), "cumtime_ms": round(ct * 1000, 2)}
+            for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items()
+        ]
+        rows.sort(key=lambda r: r["cumtime_ms"], reverse=True)
+        return rows[:TOP_FUNCTIONS]
+
+    def finish(self, history: Deque[Dict[str, Any]]) -> Dict[str, Any]:
+        """Close this rerun and append it to `history`; returns the record."""
+        total = time.perf_counter() - self.started
+        record = {
+            "at": time.time(),
+            "total_ms": round(total * 1000, 1),
+            "sections_ms": {k: round(v * 1000, 1) for k, v in
+                            sorted(self.sections.items(), key=lambda kv: kv[1], reverse=True)},
+        }
+        top_level = sum(v for k, v in record["sections_ms"].items() if " › " not in k)
+        record["other_ms"] = round(max(0.0, record["total_ms"] - top_level), 1)
+        if self._profile is not None:
+            record["top_functions"] = self._top_functions()
+        if self.span is not None:
+            record["trace_id"] = self.span.trace_id
+            self.span.end()
+            tracer.detach()
+        history.append(record)
+        return record
+
+
+def new_history() -> Deque[Dict[str, Any]]:
+    return deque(maxlen=HISTORY)
+
+
+def summarize(history: Deque[Dict[str, Any]]) -> Dict[str, Any]:
+    """Mean / p95 / max rerun time and mean time per section over the history."""
+    totals = sorted(r["total_ms"] for r in history)
+    if not totals:
+        return {"reruns": 0}
+    per_section: Dict[str, List[float]] = {}
+    for r in history:
+        for name, ms in r["sections_ms"].items():
+            per_section.setdefault(name, []).append(ms)
+    return {
+        "reruns": len(totals),
+        "mean_ms": round(sum(totals) / len(totals), 1),
+        "p95_ms": totals[min(len(totals) - 1, int(0.95 * len(totals)))],
+        "max_ms": totals[-1],
+        "sections_mean_ms": {k: round(sum(v) / len(v), 1) for k, v in
+                             sorted(per_section.items(), key=lambda kv: -sum(kv[1]) / len(kv[1]))},
+    }
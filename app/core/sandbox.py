@@ -0,0 +1,204 @@
+# app/core/sandbox.py
+#
+# Local execution engine for Python submissions. Stdlib only: each job runs
+# app/core/sandbox_child.py as a script in a fresh isolated interpreter,
+# with its own temporary working directory and a minimal environment. The
+# child applies rlimits and an audit hook that refuses writes, sockets,
+# process creation and reads outside that directory and the Python
+# installation.
+
+import os
+import sys
+import json
+import math
+import asyncio
+import threading
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional, Dict, Any, List, Callable, Tuple
+
+from app.core import sandbox_child
+from app.core.sandbox_child import CHECK_SIZES, RESULT_MARK
+
+SANDBOX_ENABLED = os.getenv("SANDBOX_ENABLED", "1").lower() not in ("0", "false", "no")
+WORKERS = int(os.getenv("SANDBOX_WORKERS", str(max(2, (os.cpu_count() or 2)))))
+WALL_SECONDS = float(os.getenv("SANDBOX_WALL_SECONDS", "20"))
+MIN_FIT_SECONDS = 2e-5      # shorter timings are mostly call overhead
+
+_COMPLEXITY_MODELS: List[Tuple[str, Callable[[float], float]]] = [
+    ("O(1)", lambda n: 1.0),
+    ("O(log n)", lambda n: math.log2(n)),
+    ("O(n)", lambda n: n),
+    ("O(n log n)", lambda n: n * math.log2(n)),
+    ("O(n^2)", lambda n: n ** 2),
+    ("O(n^3)", lambda n: n ** 3),
+    ("O(2^n)", lambda n: 2.0 ** n),
+]
+
+
+def _child_env() -> Dict[str, str]:
+    """
+    The whole environment of a sandbox child: PATH plus the SANDBOX_* knobs
+    it reads at import. Submitted code must never see the server's
+    OPENAI_API_KEY, DATABASE_URL and the like (`-I` does not strip them).
+    """
+    env = {"PATH": os.environ.get("PATH", "/usr/bin:/bin")}
+    env.update({k: v for k, v in os.environ.items() if k.startswith("SANDBOX_")})
+    return env
+
+
+def fit_complexity(sizes: List[int], timings: List[float]) -> Dict[str, Any]:
+    """
+    Pick the growth model that best explains the timings (least squares on
+    log t - log f(n)) and the empirical log-log slope.
+    """
+    pts = [(n, t) for n, t in zip(sizes, timings) if t >= MIN_FIT_SECONDS and n > 1]
+    if len(pts) < 3:
+        pts = [(n, t) for n, t in zip(sizes, timings) if t > 0 and n > 1]
+    if len(pts) < 3:
+        return {"best": None, "reason": "not enough measurable sizes"}
+    fits = {}
+    for name, f in _COMPLEXITY_MODELS:
+        try:
+            r = [math.log(t) - math.log(f(n)) for n, t in pts]
+        except (OverflowError, ValueError):
+            continue
+        c = sum(r) / len(r)
+        fits[name] = sum((x - c) ** 2 for x in r) / len(r)
+    xs = [math.log(n) for n, _ in pts]
+    ys = [math.log(t) for _, t in pts]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    var = sum((x - mx) ** 2 for x in xs)
+    slope = sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / var if var else 0.0
+    best = min(fits, key=fits.get) if fits else None
+    if best:
+        # timing noise: prefer the simplest model that fits about as well as the best one
+        tolerance = fits[best] * 1.5 + 0.002
+        best = next(name for name, _ in _COMPLEXITY_MODELS if name in fits and fits[name] <= tolerance)
+    return {"best": best, "exponent": round(slope, 2),
+            "residuals": {k: round(v, 4) for k, v in sorted(fits.items(), key=lambda kv: kv[1])}}
+
+
+class Sandbox:
+    """
+    Runs measurement jobs in fresh `python -I` child processes, at most
+    `workers` at a time. Each job gets its own process (killed on timeout),
+    so one runaway submission never poisons a shared worker and many users
+    can be graded concurrently.
+    """
+
+    def __init__(self, workers: int = WORKERS):
+        self.workers = workers
+        self._runners: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.counters = {"jobs": 0, "timeouts": 0, "killed": 0}
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._runners is None:
+            with self._lock:
+                if self._runners is None:
+                    self._runners = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sandbox")
+        return self._runners
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self.counters[field] += 1
+
+    def _run(self, job: Dict[str, Any], wall: float) -> Dict[str, Any]:
+        self._count("jobs")
+        # the job's working directory is the only place outside the Python
+        # installation its code may read from
+        with tempfile.TemporaryDirectory(prefix="sandbox-") as workdir:
+            return self._run_in(job, wall, workdir)
+
+    def _run_in(self, job: Dict[str, Any], wall: float, workdir: str) -> Dict[str, Any]:
+        try:
+            proc = subprocess.Popen(
+                [sys.executable, "-I", "-B", os.path.abspath(sandbox_child.__file__)],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                cwd=workdir, text=True, env=_child_env(),
+            )
+        except OSError as e:
+            return {"ok": False, "error": f"could not start sandbox: {e}"}
+        try:
+            stdout, _ = proc.communicate(json.dumps(job), timeout=wall)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            self._count("timeouts")
+            return {"ok": False, "error": f"timed out after {wall:.0f}s"}
+        mark = stdout.rfind(RESULT_MARK)
+        if mark >= 0:
+            try:
+                return json.loads(stdout[mark + len(RESULT_MARK):])
+            except json.JSONDecodeError:
+                pass
+        self._count("killed")
+        return {"ok": False, "error": f"killed (exit code {proc.returncode}): CPU or memory limit exceeded"}
+
+    def submit(self, code: str, entry: Optional[str] = None, arg_types: Optional[List[str]] = None,
+               wall: float = WALL_SECONDS) -> Future:
+        job = {"code": code, "entry": entry, "arg_types": arg_types}
+        return self._pool().submit(self._run, job, wall)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+
+def _summarise(raw: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: v for k, v in raw.items() if k not in ("checks",)}
+    if raw.get("ok") and raw.get("sizes"):
+        out["complexity"] = fit_complexity(raw["sizes"], raw["timings_s"])
+    return out
+
+
+def _compare(cand: Dict[str, Any], ref: Dict[str, Any]) -> Dict[str, Any]:
+    if cand.get("arg_types") != ref.get("arg_types"):
+        return {"checked": 0, "mismatches": 0, "examples": [], "skipped": "signatures differ"}
+    a, b = cand.get("checks") or [], ref.get("checks") or []
+    mismatches = []
+    for n, x, y in zip(CHECK_SIZES, a, b):
+        if x[0] != y[0] and x[1] != y[1]:
+            mismatches.append({"n": n, "candidate": x[2], "reference": y[2]})
+    return {"checked": min(len(a), len(b)), "mismatches": len(mismatches), "examples": mismatches[:3]}
+
+
+def submit_profile(code: str, reference: Optional[str] = None, entry: Optional[str] = None,
+                   arg_types: Optional[List[str]] = None) -> Dict[str, Future]:
+    """Start measuring a submission (and the reference, in parallel); collect with collect_profile()."""
+    futures = {"candidate": sandbox.submit(code, entry, arg_types)}
+    if reference:
+        futures["reference"] = sandbox.submit(reference, entry, arg_types)
+    return futures
+
+
+def _assemble(raw: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    out = {k: _summarise(v) for k, v in raw.items()}
+    if "reference" in raw and raw["candidate"].get("ok") and raw["reference"].get("ok"):
+        out["agreement"] = _compare(raw["candidate"], raw["reference"])
+    return out
+
+
+def collect_profile(futures: Dict[str, Future]) -> Dict[str, Any]:
+    """
+    {"candidate": {...}, "reference": {...}?, "agreement": {...}?} where each
+    side carries sizes, timings, the fitted complexity, cProfile hot spots
+    and tracemalloc peak memory, or an error.
+    """
+    return _assemble({k: f.result() for k, f in futures.items()})
+
+
+async def acollect_profile(futures: Dict[str, Future]) -> Dict[str, Any]:
+    return _assemble({k: await asyncio.wrap_future(f) for k, f in futures.items()})
+
+
+def profile_code(code: str, reference: Optional[str] = None, entry: Optional[str] = None,
+                 arg_types: Optional[List[str]] = None) -> Dict[str, Any]:
+    return collect_profile(submit_profile(code, reference, entry, arg_types))
+
+
+# Process-wide sandbox pool
+sandbox = Sandbox()
+
@@ -0,0 +1,355 @@
+# app/core/sandbox_child.py
+#
+# Child side of the sandbox: app/core/sandbox.py runs this file as a script
+# in a fresh `python -I` interpreter, one job per process. It imports only
+# the stdlib modules it needs, so subprocess/_posixsubprocess are never
+# loaded where submitted code runs, and installs an audit hook that refuses
+# writes, sockets, process creation and reads outside the job's temporary
+# directory and the Python installation.
+
+import io
+import os
+import sys
+import ast
+import json
+import copy
+import math
+import time
+import random
+import string
+import signal
+import hashlib
+import sysconfig
+import contextlib
+from typing import Optional, Dict, Any, List, Callable, Tuple
+
+MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "512"))
+CPU_SECONDS = int(os.getenv("SANDBOX_CPU_SECONDS", "15"))
+TIME_BUDGET = float(os.getenv("SANDBOX_TIME_BUDGET", "4"))       # seconds of measuring per submission
+CALL_LIMIT = float(os.getenv("SANDBOX_CALL_LIMIT", "2"))         # seconds for any single call
+SIZE_STOP = 0.25            # stop growing once one call takes this long
+PROFILE_MAX_CALL = 0.1      # profile at the largest size whose call took at most this long
+SIZES = [8 * 2 ** k for k in range(14)]                          # 8 .. 65536
+INT_SIZES = list(range(2, 33, 2)) + [48, 64, 128, 256, 512, 1024, 4096, 16384, 65536]   # f(n) may be exponential
+CHECK_SIZES = [0, 1, 2, 5, 16, 64, 256]                           # inputs compared against the reference
+RESULT_MARK = "\x00sandbox-result:"
+
+
+class _CallTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise _CallTimeout()
+
+
+@contextlib.contextmanager
+def _time_limit(seconds: float):
+    signal.setitimer(signal.ITIMER_REAL, max(0.001, seconds))
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+_BLOCKED_EVENTS = (
+    "socket.", "subprocess.", "os.system", "os.exec", "os.spawn", "os.posix_spawn", "os.fork", "pty.",
+    "os.kill", "os.remove", "os.rename", "os.rmdir", "os.unlink", "os.chmod", "shutil.", "ctypes.",
+)
+# Modules that start processes or call into C without going through the events above
+_BLOCKED_IMPORTS = ("ctypes", "_ctypes", "multiprocessing", "_multiprocessing", "subprocess",
+                    "_posixsubprocess", "pty")
+
+# Where submitted code may read: the job's working directory and the Python
+# installation (stdlib, site-packages). Set by _allow_reads() before the
+# audit hook goes in; everything else (the app's SQLite file, .env, other
+# processes' /proc entries, ...) is refused.
+_read_roots: Tuple[str, ...] = ()
+
+
+def _allow_reads(workdir: str) -> None:
+    global _read_roots
+    paths = sysconfig.get_paths()
+    roots = [workdir] + [paths[k] for k in ("stdlib", "platstdlib", "purelib", "platlib") if paths.get(k)]
+    _read_roots = tuple(dict.fromkeys(os.path.realpath(r) for r in roots))
+
+
+def _readable(path) -> bool:
+    if isinstance(path, int):       # a descriptor that is already open
+        return True
+    try:
+        real = os.path.realpath(os.fsdecode(path))
+    except (TypeError, ValueError):
+        return False
+    return any(real == root or real.startswith(root + os.sep) for root in _read_roots)
+
+
+def _audit(event: str, args) -> None:
+    if event.startswith(_BLOCKED_EVENTS):
+        raise PermissionError(f"'{event}' is not allowed in the sandbox")
+    if event == "open" and len(args) > 2:
+        mode, flags = args[1], args[2]
+        if (isinstance(mode, str) and any(c in mode for c in "wax+")) or \
+                (isinstance(flags, int) and flags & (os.O_WRONLY | os.O_RDWR | os.O_CREAT)):
+            raise PermissionError("writing files is not allowed in the sandbox")
+    if event == "open" and args and not _readable(args[0]):
+        raise PermissionError("reading files outside the sandbox is not allowed")
+    if event == "import" and args and str(args[0]).split(".")[0] in _BLOCKED_IMPORTS:
+        raise PermissionError(f"importing '{args[0]}' is not allowed in the sandbox")
+
+
+def _apply_limits() -> None:
+    try:
+        import resource
+        mem = MEMORY_MB * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
+        resource.setrlimit(resource.RLIMIT_CPU, (CPU_SECONDS, CPU_SECONDS + 1))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    except (ImportError, ValueError, OSError):
+        pass    # non-POSIX: only the wall-clock limit applies
+
+
+def _find_entry(code: str, ns: Dict[str, Any], entry: Optional[str]) -> Callable:
+    if entry:
+        if entry in ns and callable(ns[entry]):
+            return ns[entry]
+        if "Solution" in ns and hasattr(ns["Solution"], entry):
+            return getattr(ns["Solution"](), entry)
+        raise ValueError(f"entry point '{entry}' not found")
+    tree = ast.parse(code)
+    funcs = [n.name for n in tree.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    for preferred in ("solve", "solution", "main"):
+        if preferred in funcs:
+            return ns[preferred]
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == "Solution":
+            methods = [m.name for m in node.body if isinstance(m, ast.FunctionDef) and not m.name.startswith("_")]
+            if methods:
+                return getattr(ns["Solution"](), methods[0])
+    public = [f for f in funcs if not f.startswith("_")]
+    if public:
+        return ns[public[0]]
+    raise ValueError("no function to run; define solve(...) or pass an entry point")
+
+
+_LIST_NAMES = {"nums", "arr", "array", "a", "b", "values", "vals", "lst", "list", "heights", "prices", "data", "xs",
+               "items", "numbers", "costs", "weights", "intervals"}
+_STR_NAMES = {"s", "t", "text", "word", "string", "str", "p", "pattern", "sentence"}
+_MATRIX_NAMES = {"grid", "matrix", "board", "mat"}
+_STR_LIST_NAMES = {"words", "strs", "strings", "tokens"}
+_SIZE_NAMES = {"n", "num", "size", "length"}
+
+
+def _arg_kinds(fn: Callable, explicit: Optional[List[str]]) -> List[str]:
+    if explicit:
+        return list(explicit)
+    import inspect
+    kinds = []
+    for p in inspect.signature(fn).parameters.values():
+        if p.kind in (p.VAR_POSITIONAL, p.VAR_KEYWORD):
+            continue
+        ann = str(p.annotation).lower() if p.annotation is not p.empty else ""
+        name = p.name.lower()
+        if "list[list" in ann or name in _MATRIX_NAMES:
+            kinds.append("matrix")
+        elif "list[str" in ann or name in _STR_LIST_NAMES:
+            kinds.append("str_list")
+        elif "list" in ann or name in _LIST_NAMES:
+            kinds.append("list")
+        elif ann in ("str", "<class 'str'>") or name in _STR_NAMES:
+            kinds.append("str")
+        elif ann in ("int", "<class 'int'>") or name in _SIZE_NAMES or name in ("k", "target", "x", "m"):
+            kinds.append("int" if name in _SIZE_NAMES else "small_int")
+        else:
+            kinds.append("list")
+    if kinds and all(k == "small_int" for k in kinds):
+        kinds[0] = "int"    # f(k) alone: the int is the input size
+    return kinds
+
+
+def _make_args(kinds: List[str], n: int, rng: random.Random) -> List[Any]:
+    # values spread with n so chance hits (a pair summing to target, a
+    # duplicate) stay rare and early exits don't hide the growth curve
+    bound = 10 ** 6 * max(1, n)
+    out = []
+    for kind in kinds:
+        if kind == "list":
+            out.append([rng.randint(-bound, bound) for _ in range(n)])
+        elif kind == "sorted_list":
+            out.append(sorted(rng.randint(-bound, bound) for _ in range(n)))
+        elif kind == "str":
+            out.append("".join(rng.choice(string.ascii_lowercase) for _ in range(n)))
+        elif kind == "str_list":
+            out.append(["".join(rng.choice("abcde") for _ in range(rng.randint(1, 6))) for _ in range(n)])
+        elif kind == "matrix":
+            side = max(1, int(math.isqrt(n)))
+            out.append([[rng.randint(0, 9) for _ in range(side)] for _ in range(side)])
+        elif kind == "int":
+            out.append(n)
+        else:   # small_int
+            out.append(rng.randint(0, max(1, n)))
+    return out
+
+
+def _digest(value: Any) -> Tuple[str, str, str]:
+    """(exact hash, order-insensitive hash, short preview) of a return value."""
+    text = repr(value)
+    exact = hashlib.sha1(text.encode("utf-8", "replace")).hexdigest()
+    loose = exact
+    if isinstance(value, (list, tuple)):
+        try:
+            loose = hashlib.sha1(repr(sorted(value)).encode("utf-8", "replace")).hexdigest()
+        except TypeError:
+            pass
+    return exact, loose, text[:200]
+
+
+def _copy_args(kinds: List[str], args: List[Any]) -> List[Any]:
+    """Fresh copies so in-place algorithms see the same input every run."""
+    out = []
+    for kind, a in zip(kinds, args):
+        if kind == "matrix":
+            out.append([row[:] for row in a])
+        elif isinstance(a, list):
+            out.append(a[:])
+        else:
+            out.append(copy.deepcopy(a))
+    return out
+
+
+def _timed_call(fn: Callable, kinds: List[str], args: List[Any], limit: float) -> float:
+    """Best-of timing of fn(*args): at least 3 runs, more while runs are very short."""
+    best, spent, reps = float("inf"), 0.0, 0
+    while reps < 50 and (reps < 3 or spent < 0.005):
+        call_args = _copy_args(kinds, args)
+        with _time_limit(limit):
+            t0 = time.perf_counter()
+            fn(*call_args)
+            dt = time.perf_counter() - t0
+        best, spent, reps = min(best, dt), spent + dt, reps + 1
+        if dt > SIZE_STOP:
+            break
+    return best
+
+
+def _hotspots(profile, limit: int = 8) -> List[Dict[str, Any]]:
+    import pstats
+    stats = pstats.Stats(profile)
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items():
+        if filename == __file__ or func in ("<method 'disable' of '_lsprof.Profiler' objects>",):
+            continue
+        label = f"{func} (line {line})" if filename == "<candidate>" else func
+        rows.append({"function": label, "calls": nc, "tottime_ms": round(tt * 1000, 3),
+                     "cumtime_ms": round(ct * 1000, 3)})
+    rows.sort(key=lambda r: r["tottime_ms"], reverse=True)
+    return rows[:limit]
+
+
+def _measure(job: Dict[str, Any]) -> Dict[str, Any]:
+    import cProfile
+    import tracemalloc
+
+    signal.signal(signal.SIGALRM, _on_alarm)
+    code = job["code"]
+    ns: Dict[str, Any] = {"__name__": "__candidate__"}
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink):
+        with _time_limit(CALL_LIMIT):
+            exec(compile(code, "<candidate>", "exec"), ns)
+    fn = _find_entry(code, ns, job.get("entry"))
+    kinds = _arg_kinds(fn, job.get("arg_types"))
+    result: Dict[str, Any] = {"ok": True, "entry": getattr(fn, "__name__", "?"), "arg_types": kinds}
+
+    # Outputs on small fixed inputs, compared with the reference by the parent
+    checks = []
+    int_only = set(kinds) <= {"int", "small_int"}
+    deadline = time.monotonic() + CALL_LIMIT
+    with contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink):
+        for n in CHECK_SIZES:
+            args = _make_args(kinds, min(n, 16) if int_only else n, random.Random(1000 + n))
+            try:
+                with _time_limit(deadline - time.monotonic()):
+                    checks.append(_digest(fn(*args)))
+            except _CallTimeout:
+                checks.append(("timeout", "timeout", "timed out"))
+                result["timed_out_at"] = n
+                break
+            except Exception as e:
+                tag = f"raise {type(e).__name__}"
+                checks.append((tag, tag, f"{type(e).__name__}: {e}"[:200]))
+    result["checks"] = checks
+    if not kinds or "timed_out_at" in result:
+        return result
+
+    sizes, timings = [], []
+    deadline = time.monotonic() + TIME_BUDGET
+    with contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink):
+        for n in (INT_SIZES if int_only else SIZES):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            args = _make_args(kinds, n, random.Random(n))
+            try:
+                t = _timed_call(fn, kinds, args, min(CALL_LIMIT, remaining))
+            except _CallTimeout:
+                result["timed_out_at"] = n
+                break
+            except MemoryError:
+                result["memory_error_at"] = n
+                break
+            except Exception as e:
+                result["error_at"] = {"n": n, "error": f"{type(e).__name__}: {e}"[:300]}
+                break
+            sizes.append(n)
+            timings.append(t)
+            if t > SIZE_STOP:
+                break
+    result["sizes"], result["timings_s"] = sizes, [round(t, 7) for t in timings]
+    if not sizes:
+        return result
+
+    # Profile and trace allocations at the largest size that stays cheap under instrumentation
+    n = max([m for m, t in zip(sizes, timings) if t <= PROFILE_MAX_CALL] or sizes[:1])
+    args = _make_args(kinds, n, random.Random(n))
+    with contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink):
+        try:
+            prof = cProfile.Profile()
+            with _time_limit(CALL_LIMIT):
+                prof.runcall(fn, *_copy_args(kinds, args))
+            result["hotspots"] = _hotspots(prof)
+        except (_CallTimeout, Exception):
+            result["hotspots"] = []
+        try:
+            call_args = _copy_args(kinds, args)
+            tracemalloc.start()
+            with _time_limit(CALL_LIMIT):
+                fn(*call_args)
+            result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        except (_CallTimeout, Exception):
+            result["peak_memory_bytes"] = None
+        finally:
+            tracemalloc.stop()
+    result["profiled_n"] = n
+    result["stdout"] = sink.getvalue()[:2000]
+    return result
+
+
+def _child_main() -> None:
+    """Script entry: one JSON job on stdin, one JSON result line on stdout."""
+    out = sys.stdout
+    _apply_limits()
+    try:
+        job = json.loads(sys.stdin.read())
+        _allow_reads(os.getcwd())
+        sys.addaudithook(_audit)
+        result = _measure(job)
+    except BaseException as e:
+        result = {"ok": False, "error": f"{type(e).__name__}: {e}"[:500]}
+    out.write(RESULT_MARK + json.dumps(result) + "\n")
+    out.flush()
+
+
+if __name__ == "__main__":
+    _child_main()
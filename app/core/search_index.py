@@ -0,0 +1,189 @@
+# app/core/search_index.py
+
+import os
+import re
+import math
+import time
+import hashlib
+import threading
+from collections import Counter
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+from sqlalchemy import select, delete, func, insert, case
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+
+from app.core.db import SessionLocal, SearchDoc, SearchPosting
+from app.core.topic_index import stem
+
+SEARCH_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "1").lower() not in ("0", "false", "no")
+K1, B = 1.2, 0.75
+# Field boosts: a term in the title or topic counts this many times
+TITLE_WEIGHT, TOPIC_WEIGHT = 3, 2
+# Corpus size and average length are cached this long; other processes' adds show up after it
+CORPUS_TTL = float(os.getenv("SEARCH_CORPUS_TTL", "30"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+_STOPWORDS = {
+    "a", "an", "the", "of", "and", "or", "in", "for", "to", "with", "on", "is", "are", "it", "this",
+    "that", "by", "as", "at", "be", "from", "you", "your", "how", "what", "s",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem(t)[:64] for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def _doc_key(resource: Dict[str, Any]) -> str:
+    ident = (resource.get("url") or "").strip().lower().rstrip("/") \
+        or (resource.get("title") or "").strip().lower()
+    return hashlib.sha1(ident.encode("utf-8")).hexdigest()
+
+
+def _terms(topics: str, r: Dict[str, Any]) -> Counter:
+    tf = Counter(tokenize(r.get("why", "")))
+    tf.update(tokenize(r.get("type", "")))
+    for _ in range(TITLE_WEIGHT):
+        tf.update(tokenize(r.get("title", "")))
+    for _ in range(TOPIC_WEIGHT):
+        tf.update(tokenize(topics))
+    return tf
+
+
+class SearchIndex:
+    """
+    Persistent BM25 inverted index over curated resources. Each resource is
+    one row in `search_docs`; `search_postings` holds (term, doc_id, tf)
+    keyed by term, so a query reads only the postings of its own terms.
+    Documents are (re)indexed one resource at a time as research results
+    are stored; a resource curated again for another topic gains that
+    topic instead of becoming a duplicate.
+    """
+
+    def __init__(self, enabled: bool = SEARCH_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._corpus: Optional[Tuple[int, float, float]] = None   # (N, avgdl, fetched at), dropped on writes
+
+    # --- writes ---
+
+    def add(self, topic: str, resources: Iterable[Dict[str, Any]]) -> int:
+        """Index the resources curated for `topic`; returns how many docs changed."""
+        if not self.enabled:
+            return 0
+        changed = 0
+        try:
+            with SessionLocal() as s:
+                for r in resources:
+                    if not isinstance(r, dict) or not (r.get("url") or r.get("title")) or r.get("type") == "note":
+                        continue
+                    # one transaction per doc: a concurrent insert of the same
+                    # resource loses the doc_key race, so merge into the winner
+                    try:
+                        changed += self._upsert(s, topic, r)
+                        s.commit()
+                    except IntegrityError:
+                        s.rollback()
+                        changed += self._upsert(s, topic, r)
+                        s.commit()
+        except SQLAlchemyError:
+            pass
+        if changed:
+            with self._lock:
+                self._corpus = None
+        return changed
+
+    def _upsert(self, s, topic: str, r: Dict[str, Any]) -> int:
+        key = _doc_key(r)
+        topic = (topic or "").strip().lower()
+        doc = s.scalar(select(SearchDoc).where(SearchDoc.doc_key == key))
+        if doc is not None:
+            topics = [t for t in (doc.topics or "").split(", ") if t]
+            if topic in topics or not topic:
+                return 0
+            topics.append(topic)
+        else:
+            topics = [topic] if topic else []
+            doc = SearchDoc(doc_key=key)
+            s.add(doc)
+        doc.topics = ", ".join(topics)
+        doc.title = str(r.get("title", ""))
+        doc.url = str(r.get("url", ""))
+        doc.type = str(r.get("type", ""))[:32]
+        doc.why = str(r.get("why", ""))
+        doc.updated_at = time.time()
+        tf = _terms(doc.topics, r)
+        doc.length = sum(tf.values())
+        s.flush()   # assigns doc.id
+        s.execute(delete(SearchPosting).where(SearchPosting.doc_id == doc.id))
+        if tf:
+            s.execute(insert(SearchPosting), [{"term": t, "doc_id": doc.id, "tf": n} for t, n in tf.items()])
+        return 1
+
+    def add_context(self, context) -> int:
+        """Index every resources::<topic> entry of a context store (backfill)."""
+        n = 0
+        for key in context.keys():
+            if key.startswith("resources::"):
+                n += self.add(key[len("resources::"):], context.get(key) or [])
+        return n
+
+    # --- queries ---
+
+    def _corpus_stats(self, s) -> Tuple[int, float]:
+        with self._lock:
+            if self._corpus is not None and time.monotonic() - self._corpus[2] < CORPUS_TTL:
+                return self._corpus[:2]
+        n, avgdl = s.execute(select(func.count(SearchDoc.id), func.avg(SearchDoc.length))).one()
+        corpus = (int(n or 0), float(avgdl or 0.0))
+        with self._lock:
+            self._corpus = (*corpus, time.monotonic())
+        return corpus
+
+    def search(self, query: str, limit: int = 20, type_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+        """BM25-ranked resources for a free-text query; no model call."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not self.enabled or not terms:
+            return []
+        with SessionLocal() as s:
+            n_docs, avgdl = self._corpus_stats(s)
+            if not n_docs:
+                return []
+            df = dict(s.execute(
+                select(SearchPosting.term, func.count()).where(SearchPosting.term.in_(terms))
+                .group_by(SearchPosting.term)
+            ).all())
+            if not df:
+                return []
+            # terms in over half the corpus barely move the ranking but dominate the scan
+            rare = {t: d for t, d in df.items() if d <= n_docs / 2}
+            if rare:
+                df = rare
+            idf = {t: math.log(1 + (n_docs - d + 0.5) / (d + 0.5)) for t, d in df.items()}
+            # BM25 summed and ranked in the database; only the top rows come back
+            weight = case(*((SearchPosting.term == t, w) for t, w in idf.items()), else_=0.0)
+            norm = K1 * (1 - B + B * SearchDoc.length / (avgdl or 1))
+            score = func.sum(weight * SearchPosting.tf * (K1 + 1) / (SearchPosting.tf + norm)).label("score")
+            stmt = (
+                select(SearchDoc, score)
+                .join(SearchPosting, SearchPosting.doc_id == SearchDoc.id)
+                .where(SearchPosting.term.in_(list(idf)))
+                .group_by(SearchDoc.id)
+                .order_by(score.desc())
+                .limit(limit)
+            )
+            if type_filter:
+                stmt = stmt.where(SearchDoc.type == type_filter)
+            ranked = s.execute(stmt).all()
+
+        return [{"title": d.title, "url": d.url, "type": d.type, "why": d.why,
+                 "topics": d.topics, "score": round(float(sc), 3)} for d, sc in ranked]
+
+    def stats(self) -> Dict[str, Any]:
+        with SessionLocal() as s:
+            n_docs, avgdl = self._corpus_stats(s)
+            terms = s.scalar(select(func.count(func.distinct(SearchPosting.term)))) or 0
+        return {"docs": n_docs, "avg_length": round(avgdl, 1), "terms": terms}
+
+
+# Process-wide index shared by research agents and the Search tab
+search_index = SearchIndex()
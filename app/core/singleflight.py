@@ -0,0 +1,101 @@
+# app/core/singleflight.py
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one. The first caller for a
+    key (the leader) runs the work; everyone arriving while it is in flight
+    waits for the leader's result or exception. Thread callers (do) and
+    asyncio callers (ado) share one table of concurrent.futures.Future, so
+    a coroutine can wait on a thread's call and vice versa.
+
+    The exception is a blocking do() on an event loop's thread while the
+    leader is an ado() on that same loop: waiting would stop the loop the
+    leader needs, so that caller runs fn itself (counted as "bypassed").
+    """
+
+    def __init__(self):
+        # key -> (future, event loop of an ado() leader, or None for a do() leader)
+        self._calls: Dict[str, Tuple[Future, Optional[asyncio.AbstractEventLoop]]] = {}
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "executed": 0, "coalesced": 0, "bypassed": 0}
+
+    def _join(self, key: str, leader_loop: Optional[asyncio.AbstractEventLoop] = None,
+              blocking_loop: Optional[asyncio.AbstractEventLoop] = None):
+        """
+        Return (future, is_leader). `leader_loop` is recorded if this caller
+        leads; a blocking caller passes the loop running on its thread and
+        gets (None, False) when waiting would deadlock that loop.
+        """
+        with self._lock:
+            self.counters["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                fut, loop = call
+                if blocking_loop is not None and loop is blocking_loop:
+                    self.counters["bypassed"] += 1
+                    return None, False
+                self.counters["coalesced"] += 1
+                return fut, False
+            fut = Future()
+            self._calls[key] = (fut, leader_loop)
+            self.counters["executed"] += 1
+            return fut, True
+
+    def _finish(self, key: str, fut: Future) -> None:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call[0] is fut:
+                del self._calls[key]
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        fut, leader = self._join(key, blocking_loop=_running_loop())
+        if fut is None:
+            return fn()
+        if not leader:
+            return fut.result()
+        try:
+            fut.set_result(fn())
+        except BaseException as e:
+            fut.set_exception(e)
+        finally:
+            self._finish(key, fut)
+        return fut.result()
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        fut, leader = self._join(key, leader_loop=asyncio.get_running_loop())
+        if not leader:
+            return await asyncio.wrap_future(fut)
+        try:
+            fut.set_result(await fn())
+        except BaseException as e:
+            fut.set_exception(e)
+        finally:
+            self._finish(key, fut)
+        return fut.result()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self.counters)
+            out["in_flight"] = len(self._calls)
+        return out
+
+
+# Process-wide group for LLM calls, keyed like the response cache
+llm_flights = SingleFlight()
@@ -1,19 +1,109 @@
 # app/core/storage.py
 
+import os
 import json
+import threading
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
 from app.core.context_store import ContextStore
 
-DEFAULT_PATH = Path("agentwebplus_session.json")
+# Untracked by default (see .gitignore): the checked-in agentwebplus_session.json
+# is sample data and must not pick up local runs
+DEFAULT_PATH = Path(os.getenv("AGENTWEB_SESSION_PATH", ".agentwebplus/session.json"))
+# "memory" (in-process dict, spilling to SQL) or "redis" (shared across replicas)
+CONTEXT_BACKEND = os.getenv("CONTEXT_BACKEND", "memory").lower()
+# Fold the append log into the snapshot once it holds this many records
+COMPACT_AFTER = int(os.getenv("CONTEXT_LOG_COMPACT_AFTER", "500"))
 
-def save_context(ctx: ContextStore, path: Path = DEFAULT_PATH) -> None:
-    data: Dict[str, Any] = ctx.get_all()
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+# log path -> (file size, record count) as of our last append, so a save
+# doesn't re-read the log to decide on compaction; a size we didn't write
+# (another process appended) triggers a recount
+_log_counts: Dict[str, Tuple[int, int]] = {}
+_log_counts_lock = threading.Lock()
+
+def _log_path(path: Path) -> Path:
+    return Path(str(path) + ".log")
+
+def save_context(ctx: ContextStore, path: Path = DEFAULT_PATH) -> int:
+    """
+    Append the keys changed since this path was last saved to `<path>.log`
+    (one JSON record per line) instead of rewriting the whole session.
+    Returns the number of records written.
+    """
+    sink = f"file:{Path(path).resolve()}"
+    changed, deleted = ctx.take_dirty(sink)
+    if not changed and not deleted:
+        return 0
+    log = _log_path(path)
+    log.parent.mkdir(parents=True, exist_ok=True)
+    before = _count_records(path)
+    try:
+        with open(log, "a", encoding="utf-8") as f:
+            for k, v in changed.items():
+                f.write(json.dumps({"k": k, "v": v, "ver": ctx.versions.get(k, 0)}, ensure_ascii=False) + "\n")
+            for k in deleted:
+                f.write(json.dumps({"k": k, "del": True}, ensure_ascii=False) + "\n")
+    except Exception:
+        ctx.mark_dirty(changed.keys(), deleted, sink=sink)
+        raise
+    records = before + len(changed) + len(deleted)
+    with _log_counts_lock:
+        _log_counts[str(log)] = (log.stat().st_size, records)
+    if records >= COMPACT_AFTER:
+        compact_context(path)
+    return len(changed) + len(deleted)
+
+def _count_records(path: Path) -> int:
+    log = _log_path(path)
+    try:
+        size = log.stat().st_size
+    except FileNotFoundError:
+        return 0
+    with _log_counts_lock:
+        known = _log_counts.get(str(log))
+    if known is not None and known[0] == size:
+        return known[1]
+    with open(log, "rb") as f:
+        n = sum(1 for _ in f)
+    with _log_counts_lock:
+        _log_counts[str(log)] = (size, n)
+    return n
 
 def load_context(path: Path = DEFAULT_PATH) -> Dict[str, Any]:
-    if not path.exists():
-        return {}
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    """Snapshot file plus the replayed append log."""
+    data: Dict[str, Any] = {}
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    log = _log_path(path)
+    if log.exists():
+        with open(log, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line after a crash
+                if rec.get("del"):
+                    data.pop(rec["k"], None)
+                else:
+                    data[rec["k"]] = rec.get("v")
+    return data
+
+def compact_context(path: Path = DEFAULT_PATH) -> None:
+    """Rewrite the snapshot with the latest values and truncate the log."""
+    data = load_context(path)
+    tmp = Path(str(path) + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    _log_path(path).unlink(missing_ok=True)
+    with _log_counts_lock:
+        _log_counts.pop(str(_log_path(path)), None)
+
+def make_context_store(namespace: str) -> ContextStore:
+    """Build the ContextStore for one user session according to CONTEXT_BACKEND."""
+    if CONTEXT_BACKEND == "redis":
+        from app.core.redis_store import RedisContextStore
+        return RedisContextStore(namespace=namespace)
+    from app.core.db import ContextSpill
+    return ContextStore(namespace=namespace, spill=ContextSpill())
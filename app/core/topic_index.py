@@ -0,0 +1,214 @@
+# app/core/topic_index.py
+
+import os
+import re
+import time
+import zlib
+import difflib
+import random
+import threading
+from typing import Optional, Dict, Any, List, Set
+
+from sqlalchemy import select, delete, or_, and_
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.db import SessionLocal, TopicIndexEntry, TopicIndexBand
+from app.core.plan_text import normalize_topic
+
+# Minimum character n-gram Jaccard similarity for reusing a researched topic
+SIMILARITY_THRESHOLD = float(os.getenv("TOPIC_SIMILARITY_THRESHOLD", "0.7"))
+MAX_AGE = float(os.getenv("TOPIC_INDEX_MAX_AGE", str(30 * 24 * 3600)))   # seconds; 0 = keep forever
+# Two tokens are the same word misspelt when their difflib ratio reaches this
+TYPO_RATIO = 0.8
+INDEX_ENABLED = os.getenv("TOPIC_INDEX_ENABLED", "1").lower() not in ("0", "false", "no")
+
+NGRAM = 3
+BANDS, ROWS = 16, 4            # 64 MinHash values; ~99% recall at similarity 0.7
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240917)   # fixed seed: signatures are persisted
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(BANDS * ROWS)]
+
+_STOPWORDS = {
+    "a", "an", "the", "of", "and", "in", "for", "to", "with", "on", "using", "vs", "versus",
+    "basics", "basic", "intro", "introduction", "fundamentals", "overview", "concepts", "principles",
+    "algorithm", "algorithms", "problem", "problems", "questions", "practice", "techniques",
+}
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+
+
+def stem(word: str) -> str:
+    """Light suffix stripping; both sides of a comparison are stemmed the same way."""
+    if len(word) <= 4:
+        return word[:-1] if word.endswith("s") and not word.endswith("ss") and len(word) > 3 else word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("sses"):
+        return word[:-2]
+    for suffix in ("ing", "ed"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def canonical_topic(topic: str) -> str:
+    """Order-insensitive, stemmed form: 'Binary-Trees' and 'binary tree' both become 'binary tree'."""
+    text = normalize_topic(topic).replace("-", " ").replace("_", " ")
+    tokens = [stem(t) for t in _TOKEN_RE.findall(text) if t not in _STOPWORDS]
+    if not tokens:
+        return text[:255]
+    return " ".join(sorted(set(tokens)))[:255]
+
+
+def ngrams(key: str, n: int = NGRAM) -> Set[str]:
+    # spaces dropped so "hashmap" and "hash map" compare equal
+    padded = f" {key.replace(' ', '')} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the character n-grams of two canonical keys."""
+    ga, gb = ngrams(a), ngrams(b)
+    return len(ga & gb) / len(ga | gb) if ga or gb else 1.0
+
+
+def _spelling(a: str, b: str) -> float:
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+def same_terms(a: str, b: str) -> bool:
+    """
+    Whether two canonical keys name the same terms: equal token sets, the
+    same letters with different spacing ("hash map" / "hashmap"), or a
+    one-to-one pairing of tokens that differ only by a typo. An extra or
+    different word ("dynamic programming on trees") is a different topic
+    however high the n-gram overlap.
+    """
+    ta, tb = set(a.split()), set(b.split())
+    if ta == tb or a.replace(" ", "") == b.replace(" ", ""):
+        return True
+    if len(ta) != len(tb):
+        return False
+    return all(max(_spelling(x, y) for y in tb) >= TYPO_RATIO for x in ta) and \
+        all(max(_spelling(x, y) for x in ta) >= TYPO_RATIO for y in tb)
+
+
+def minhash(key: str) -> List[int]:
+    hashes = [zlib.crc32(g.encode("utf-8")) for g in ngrams(key)]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS]
+
+
+def band_buckets(signature: List[int]) -> List[str]:
+    out = []
+    for band in range(BANDS):
+        chunk = ",".join(map(str, signature[band * ROWS:(band + 1) * ROWS]))
+        out.append(f"{zlib.crc32(chunk.encode()):08x}")
+    return out
+
+
+class TopicIndex:
+    """
+    Persistent near-duplicate index over researched topics. Topics are
+    normalised and stemmed into a canonical key; MinHash LSH bands stored
+    in `topic_index_bands` find candidate keys with one indexed query, and
+    the best candidate is reused when its n-gram similarity clears the
+    threshold and it names the same terms (see same_terms). Entries are
+    added one at a time as topics are researched.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, max_age: float = MAX_AGE,
+                 enabled: bool = INDEX_ENABLED):
+        self.threshold = threshold
+        self.max_age = max_age
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.counters = {"exact": 0, "similar": 0, "misses": 0, "writes": 0}
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self.counters[field] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+    def _fresh(self, row: TopicIndexEntry, now: float) -> bool:
+        return not self.max_age or (row.updated_at or 0) >= now - self.max_age
+
+    def lookup(self, topic: str, threshold: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return {"topic", "key", "score", "resources"} for the closest researched
+        topic at or above the threshold, or None.
+        """
+        if not self.enabled or not topic or not topic.strip():
+            return None
+        threshold = self.threshold if threshold is None else threshold
+        key = canonical_topic(topic)
+        now = time.time()
+        try:
+            with SessionLocal() as s:
+                row = s.get(TopicIndexEntry, key)
+                score = 1.0
+                if row is None or not self._fresh(row, now):
+                    row, score = None, 0.0
+                    buckets = band_buckets(minhash(key))
+                    cond = or_(*(and_(TopicIndexBand.band == i, TopicIndexBand.bucket == b)
+                                 for i, b in enumerate(buckets)))
+                    candidates = set(s.scalars(select(TopicIndexBand.key).where(cond)).all())
+                    candidates.discard(key)
+                    if candidates:
+                        rows = s.scalars(select(TopicIndexEntry).where(TopicIndexEntry.key.in_(candidates))).all()
+                        for cand in rows:
+                            if not self._fresh(cand, now):
+                                continue
+                            sim = similarity(key, cand.key)
+                            if sim >= threshold and sim > score and same_terms(key, cand.key):
+                                row, score = cand, sim
+                if row is None:
+                    self._count("misses")
+                    return None
+                row.hits = (row.hits or 0) + 1
+                s.commit()
+                self._count("exact" if score == 1.0 else "similar")
+                return {"topic": row.topic, "key": row.key, "score": round(score, 3),
+                        "resources": row.resources or []}
+        except SQLAlchemyError:
+            # best-effort like the LLM cache: fall through to a model call
+            self._count("misses")
+            return None
+
+    def add(self, topic: str, resources: List[Dict[str, Any]]) -> None:
+        """Insert or refresh one topic and its LSH bands."""
+        if not self.enabled or not topic or not topic.strip():
+            return
+        key = canonical_topic(topic)
+        signature = minhash(key)
+        try:
+            with SessionLocal() as s:
+                row = s.get(TopicIndexEntry, key)
+                if row is None:
+                    row = TopicIndexEntry(key=key, topic=normalize_topic(topic), hits=0)
+                    s.add(row)
+                    for band, bucket in enumerate(band_buckets(signature)):
+                        s.add(TopicIndexBand(band=band, bucket=bucket, key=key))
+                row.signature = signature
+                row.resources = resources
+                row.updated_at = time.time()
+                s.commit()
+                self._count("writes")
+        except SQLAlchemyError:
+            pass
+
+    def remove(self, topic: str) -> None:
+        key = canonical_topic(topic)
+        with SessionLocal() as s:
+            s.execute(delete(TopicIndexBand).where(TopicIndexBand.key == key))
+            s.execute(delete(TopicIndexEntry).where(TopicIndexEntry.key == key))
+            s.commit()
+
+
+# Process-wide index shared by research agents
+topic_index = TopicIndex()
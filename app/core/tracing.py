@@ -0,0 +1,345 @@
+# app/core/tracing.py
+"""
+Span tracing for individual user flows. A span is a timed, named block
+with a trace id shared by everything one interaction caused: the UI rerun
+(root), its script sections, agent runs, LLM requests, JSON parsing and
+SessionLocal transactions, plus background jobs the rerun submitted
+(their spans join the submitting trace). The current span lives in a
+contextvar; work handed to thread pools keeps its parent through bind().
+
+Finished spans are appended to TRACE_FILE as JSON lines. Inspect them with
+
+    python -m app.core.tracing list [-n 20]          slowest recent traces
+    python -m app.core.tracing show <trace_id>       indented span tree
+    python -m app.core.tracing folded [<trace_id>]   folded stacks for flamegraph.pl / speedscope
+
+This complements app/core/metrics.py: metrics aggregate, traces explain
+one slow request.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import argparse
+import threading
+import contextlib
+import contextvars
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1").lower() not in ("0", "false", "no")
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024 * 1024)))   # then rotated to <file>.1
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+SpanRef = Tuple[str, str]    # (trace_id, span_id), e.g. stored in a job payload
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class Span:
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "attrs", "status",
+                 "started_at", "_t0", "_token", "ended")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str], attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = _new_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.status = "ok"
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self._token: Optional[contextvars.Token] = None
+        self.ended = False
+
+    @property
+    def ref(self) -> SpanRef:
+        return self.trace_id, self.span_id
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def end(self, status: Optional[str] = None) -> None:
+        """Close the span (idempotent), deactivate it if it was current, and export it."""
+        if self.ended:
+            return
+        self.ended = True
+        duration = time.perf_counter() - self._t0
+        if status:
+            self.status = status
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:
+                pass     # ended from another context; the activating one is gone already
+            self._token = None
+        # nothing open above it in this context: the local part of the trace is complete
+        self.tracer._export(self, duration, flush=_current.get() is None)
+
+
+class Tracer:
+    """Creates spans and appends finished ones to a JSONL file."""
+
+    def __init__(self, path: str = TRACE_FILE, enabled: bool = TRACING_ENABLED, max_bytes: int = TRACE_MAX_BYTES):
+        self.path = path
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._file = None
+
+    # --- spans ---
+
+    def current(self) -> Optional[Span]:
+        return _current.get()
+
+    def current_ref(self) -> Optional[SpanRef]:
+        span = _current.get()
+        return span.ref if span is not None else None
+
+    def start(self, name: str, parent: Optional[SpanRef] = None, root: bool = False, activate: bool = False,
+              **attrs: Any) -> Optional[Span]:
+        """
+        Open a span under `parent` (default: the current span); root=True
+        starts a new trace. activate=True makes it the current span until
+        end(). Returns None when tracing is off.
+        """
+        if not self.enabled:
+            return None
+        if parent is None and not root:
+            cur = _current.get()
+            parent = cur.ref if cur is not None else None
+        trace_id, parent_id = (parent[0], parent[1]) if parent else (uuid.uuid4().hex, None)
+        span = Span(self, name, trace_id, parent_id, attrs)
+        if activate:
+            span._token = _current.set(span)
+        return span
+
+    @contextlib.contextmanager
+    def span(self, name: str, parent: Optional[SpanRef] = None, **attrs: Any):
+        """Run a block as the current span; an exception marks it 'error' and is re-raised."""
+        span = self.start(name, parent=parent, activate=True, **attrs)
+        if span is None:
+            yield None
+            return
+        try:
+            yield span
+        except BaseException as e:
+            if isinstance(e, Exception):
+                span.set(error=f"{type(e).__name__}: {e}"[:300])
+                span.end("error")
+            else:
+                span.end("cancelled")
+            raise
+        span.end()
+
+    def detach(self) -> None:
+        """Forget the current span in this context (e.g. one an interrupted Streamlit rerun left open)."""
+        _current.set(None)
+
+    def bind(self, fn: Callable) -> Callable:
+        """fn running in the caller's context (current span), e.g. for ThreadPoolExecutor.submit."""
+        ctx = contextvars.copy_context()
+        return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+    # --- export ---
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        elif self.max_bytes and self._file.tell() > self.max_bytes:
+            self._file.close()
+            os.replace(self.path, self.path + ".1")
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self._file
+
+    def _export(self, span: Span, duration: float, flush: bool = False) -> None:
+        line = json.dumps({
+            "trace_id": span.trace_id, "span_id": span.span_id, "parent_id": span.parent_id,
+            "name": span.name, "start": round(span.started_at, 6), "duration_ms": round(duration * 1000, 3),
+            "status": span.status, "thread": threading.current_thread().name, "attrs": span.attrs,
+        }, ensure_ascii=False, default=str)
+        try:
+            with self._lock:
+                f = self._open()
+                f.write(line + "\n")
+                if flush:
+                    f.flush()     # a finished trace is readable right away
+        except OSError:
+            pass     # tracing is diagnostics; never fail the traced call
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+
+# Process-wide tracer
+tracer = Tracer()
+atexit.register(tracer.flush)
+
+
+def instrument_sessions(session_factory) -> None:
+    """
+    Trace SessionLocal transactions as 'db.transaction' spans (begin to
+    commit/rollback). Only transactions inside a traced flow are recorded,
+    so background writers and UI polling don't produce a trace each.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(session_factory, "after_begin")
+    def _begin(session, transaction, connection):
+        if "trace_span" not in session.info and _current.get() is not None:
+            session.info["trace_span"] = tracer.start("db.transaction")
+
+    @event.listens_for(session_factory, "after_commit")
+    def _commit(session):
+        span = session.info.get("trace_span")
+        if span is not None:
+            span.set(outcome="commit")
+
+    @event.listens_for(session_factory, "after_transaction_end")
+    def _end(session, transaction):
+        if transaction.parent is None:
+            span = session.info.pop("trace_span", None)
+            if span is not None:
+                span.attrs.setdefault("outcome", "rollback")
+                span.end()
+
+
+# --- reading traces ---
+
+def load(path: str = TRACE_FILE) -> List[Dict[str, Any]]:
+    spans = []
+    for p in (path + ".1", path):
+        if not os.path.exists(p):
+            continue
+        with open(p, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue   # torn last line
+    return spans
+
+
+def group(spans: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    for s in spans:
+        traces.setdefault(s["trace_id"], []).append(s)
+    return traces
+
+
+def summarize(trace: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Root name, wall time from first start to last end, and span count for one trace."""
+    start = min(s["start"] for s in trace)
+    end = max(s["start"] + s["duration_ms"] / 1000 for s in trace)
+    roots = [s for s in trace if s["parent_id"] is None] or sorted(trace, key=lambda s: s["start"])[:1]
+    return {"trace_id": trace[0]["trace_id"], "root": roots[0]["name"], "started": start,
+            "duration_ms": round((end - start) * 1000, 1), "spans": len(trace),
+            "errors": sum(s["status"] == "error" for s in trace)}
+
+
+def _children(trace: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+    ids = {s["span_id"] for s in trace}
+    kids: Dict[str, List[Dict[str, Any]]] = {}
+    roots = []
+    for s in sorted(trace, key=lambda s: s["start"]):
+        if s["parent_id"] in ids:
+            kids.setdefault(s["parent_id"], []).append(s)
+        else:
+            roots.append(s)      # true roots, and spans whose parent was never exported
+    return roots, kids
+
+
+def _label(s: Dict[str, Any]) -> str:
+    attrs = s.get("attrs") or {}
+    detail = attrs.get("agent") or attrs.get("model") or attrs.get("kind") or ""
+    return f"{s['name']}({detail})" if detail else s["name"]
+
+
+def render_tree(trace: List[Dict[str, Any]]) -> str:
+    """Indented span tree with start offsets and durations."""
+    roots, kids = _children(trace)
+    t0 = min(s["start"] for s in trace)
+    lines = []
+
+    def walk(s: Dict[str, Any], depth: int) -> None:
+        attrs = {k: v for k, v in (s.get("attrs") or {}).items() if k not in ("agent", "model")}
+        extra = " " + json.dumps(attrs, ensure_ascii=False, default=str)[:120] if attrs else ""
+        flag = "" if s["status"] == "ok" else f" [{s['status']}]"
+        lines.append(f"{(s['start'] - t0) * 1000:9.1f} ms {s['duration_ms']:9.1f} ms  "
+                     f"{'  ' * depth}{_label(s)}{flag}{extra}")
+        for c in kids.get(s["span_id"], []):
+            walk(c, depth + 1)
+
+    for r in roots:
+        walk(r, 0)
+    return "\n".join(lines)
+
+
+def folded(traces: Iterable[List[Dict[str, Any]]]) -> str:
+    """
+    Folded stacks ("root;child;leaf <self time in µs>") for flamegraph.pl,
+    speedscope or inferno. Self time is a span's duration minus its
+    children's, floored at 0 for children that ran in parallel.
+    """
+    totals: Dict[str, int] = {}
+    for trace in traces:
+        roots, kids = _children(trace)
+
+        def walk(s: Dict[str, Any], stack: str) -> None:
+            path = f"{stack};{_label(s)}" if stack else _label(s)
+            children = kids.get(s["span_id"], [])
+            own = s["duration_ms"] - sum(c["duration_ms"] for c in children)
+            totals[path] = totals.get(path, 0) + max(0, int(own * 1000))
+            for c in children:
+                walk(c, path)
+
+        for r in roots:
+            walk(r, "")
+    return "\n".join(f"{k} {v}" for k, v in sorted(totals.items()) if v) + "\n"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.core.tracing", description="Inspect traces.jsonl")
+    parser.add_argument("--file", default=TRACE_FILE)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_list = sub.add_parser("list", help="slowest recent traces")
+    p_list.add_argument("-n", type=int, default=20)
+    p_list.add_argument("--recent", type=int, default=500, help="consider this many most recent traces")
+    sub.add_parser("show", help="span tree of one trace").add_argument("trace_id")
+    sub.add_parser("folded", help="folded stacks (all traces by default)").add_argument("trace_id", nargs="?")
+    args = parser.parse_args(argv)
+
+    traces = group(load(args.file))
+    if args.cmd == "list":
+        rows = sorted((summarize(t) for t in traces.values()), key=lambda r: r["started"])[-args.recent:]
+        for r in sorted(rows, key=lambda r: -r["duration_ms"])[:args.n]:
+            when = time.strftime("%H:%M:%S", time.localtime(r["started"]))
+            print(f"{r['trace_id']}  {when}  {r['duration_ms']:9.1f} ms  {r['spans']:4d} spans"
+                  f"{'  ' + str(r['errors']) + ' error(s)' if r['errors'] else ''}  {r['root']}")
+        return 0
+
+    if args.trace_id:
+        matches = [t for tid, t in traces.items() if tid.startswith(args.trace_id)]
+        if not matches:
+            print(f"no trace {args.trace_id} in {args.file}", file=sys.stderr)
+            return 1
+    else:
+        matches = list(traces.values())
+    if args.cmd == "show":
+        print(render_tree(matches[0]))
+    else:
+        sys.stdout.write(folded(matches))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
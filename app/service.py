@@ -0,0 +1,241 @@
+# app/service.py
+"""
+Headless ASGI service exposing every agent over HTTP, independent of the
+Streamlit front end. Run with:
+
+    uvicorn app.service:app --host 0.0.0.0 --port 8000
+
+    POST /agents/<name>   {"session": "<token>", "input": <agent input>}
+    GET  /sessions/<token>/context
+    GET  /healthz
+    GET  /metrics         Prometheus text format (app/core/metrics.py)
+
+Each session token gets its own ContextStore (same namespace scheme and
+persistence as the Streamlit app). At most SERVICE_MAX_CONCURRENCY agent
+calls run at once; once SERVICE_MAX_QUEUE more are waiting, new requests
+are rejected with 429 and a Retry-After header.
+"""
+
+import os
+import json
+import asyncio
+import logging
+import contextlib
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from app.core.db import init_db, load_context_entries, save_context_delta
+from app.core.storage import make_context_store
+from app.core.singleflight import llm_flights
+from app.core.model_router import model_router
+from app.core.sandbox import sandbox
+from app.core.metrics import metrics
+from app.agents.planner_agent import PlannerAgent
+from app.agents.research_agent import ResearchAgent
+from app.agents.coding_agent import CodingAgent
+from app.agents.feedback_agent import FeedbackAgent
+from app.agents.plan_parser_agent import PlanParserAgent
+from app.agents.mock_agent import MockInterviewAgent
+
+MAX_CONCURRENCY = int(os.getenv("SERVICE_MAX_CONCURRENCY", "32"))
+MAX_QUEUE = int(os.getenv("SERVICE_MAX_QUEUE", "128"))
+MAX_SESSIONS = int(os.getenv("SERVICE_MAX_SESSIONS", "1000"))
+
+log = logging.getLogger(__name__)
+
+AGENTS = {
+    "planner": PlannerAgent,
+    "research": ResearchAgent,
+    "coding": CodingAgent,
+    "feedback": FeedbackAgent,
+    "parser": PlanParserAgent,
+    "mock": MockInterviewAgent,
+}
+
+
+class SessionRegistry:
+    """
+    LRU of live per-session ContextStores; evicted sessions stay in the DB.
+    The registry lock guards only the LRU: an evicted session is saved in
+    the background, and a per-token lock runs the requests of one session
+    one at a time.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._stores: "OrderedDict[str, Tuple[Any, asyncio.Lock]]" = OrderedDict()
+        self._retiring: Dict[str, asyncio.Task] = {}
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def namespace(token: str) -> str:
+        return f"session::{token}"
+
+    async def _entry(self, token: str) -> Tuple[Any, asyncio.Lock]:
+        while True:
+            async with self._lock:
+                retiring = self._retiring.get(token)
+                if retiring is None:
+                    entry = self._stores.get(token)
+                    if entry is not None:
+                        self._stores.move_to_end(token)
+                        return entry
+                    ns = self.namespace(token)
+                    store = make_context_store(ns)
+                    if not store.keys():
+                        store.load(await asyncio.to_thread(load_context_entries, ns))
+                    entry = self._stores[token] = (store, asyncio.Lock())
+                    while len(self._stores) > self.max_sessions:
+                        old_token, old = self._stores.popitem(last=False)
+                        self._retiring[old_token] = asyncio.ensure_future(self._retire(old_token, old))
+                    return entry
+            # reloading before its eviction save lands would lose the latest writes
+            await asyncio.wait({retiring})
+
+    async def _retire(self, token: str, entry: Tuple[Any, asyncio.Lock]) -> None:
+        """Save and close an evicted session in the background, after any request still using it."""
+        store, lock = entry
+        try:
+            async with lock:
+                await asyncio.to_thread(save_context_delta, store, self.namespace(token))
+        except Exception:
+            log.exception("saving evicted session %s failed", token)
+        finally:
+            store.close()
+            self._retiring.pop(token, None)
+
+    async def get(self, token: str):
+        return (await self._entry(token))[0]
+
+    @contextlib.asynccontextmanager
+    async def session(self, token: str):
+        """The token's store, held exclusively for the duration of the block."""
+        while True:
+            entry = await self._entry(token)
+            async with entry[1]:
+                # evicted while we waited: go round and pick up the reloaded one
+                if self._stores.get(token) is entry:
+                    yield entry[0]
+                    return
+
+    async def save(self, token: str, store) -> None:
+        await asyncio.to_thread(save_context_delta, store, self.namespace(token))
+
+
+class AgentService:
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, max_queue: int = MAX_QUEUE):
+        self.sem = asyncio.Semaphore(max_concurrency)
+        self.max_queue = max_queue
+        self.waiting = 0
+        self.in_flight = 0
+        self.sessions = SessionRegistry()
+        self._db_ready = False
+
+    # --- ASGI plumbing ---
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        status, payload, headers = await self._dispatch(scope, receive)
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), b"text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"), b"application/json"
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", content_type),
+                        (b"content-length", str(len(body)).encode())] + headers,
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            msg = await receive()
+            if msg["type"] == "lifespan.startup":
+                await asyncio.to_thread(init_db)
+                self._db_ready = True
+                await send({"type": "lifespan.startup.complete"})
+            elif msg["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _read_json(self, receive) -> Any:
+        chunks = []
+        while True:
+            msg = await receive()
+            chunks.append(msg.get("body", b""))
+            if not msg.get("more_body"):
+                break
+        raw = b"".join(chunks)
+        return json.loads(raw) if raw else {}
+
+    async def _dispatch(self, scope, receive) -> Tuple[int, Any, list]:
+        method, path = scope["method"], scope["path"].rstrip("/")
+        parts = path.strip("/").split("/")
+
+        if method == "GET" and path == "/healthz":
+            return 200, {"ok": True, "in_flight": self.in_flight, "waiting": self.waiting,
+                         "llm_flights": llm_flights.stats(), "models": model_router.stats(),
+                         "sandbox": sandbox.stats()}, []
+
+        if method == "GET" and path == "/metrics":
+            return 200, metrics.prometheus(), []
+
+        if method == "GET" and len(parts) == 3 and parts[0] == "sessions" and parts[2] == "context":
+            async with self.sessions.session(parts[1]) as store:
+                return 200, await asyncio.to_thread(store.get_all), []
+
+        if method == "POST" and len(parts) == 2 and parts[0] == "agents":
+            try:
+                body = await self._read_json(receive)
+            except json.JSONDecodeError:
+                return 400, {"error": "Request body must be JSON"}, []
+            return await self._run_agent(parts[1], body)
+
+        return 404, {"error": f"No route for {method} {path}"}, []
+
+    # --- agent calls ---
+
+    async def _run_agent(self, name: str, body: Dict[str, Any]) -> Tuple[int, Any, list]:
+        cls = AGENTS.get(name)
+        if cls is None:
+            return 404, {"error": f"Unknown agent '{name}'", "agents": sorted(AGENTS)}, []
+        token = str(body.get("session") or "").strip()
+        if not token:
+            return 400, {"error": "'session' is required"}, []
+
+        # Backpressure: shed load instead of queueing without bound
+        if self.sem.locked() and self.waiting >= self.max_queue:
+            return 429, {"error": "Too many requests in flight; retry shortly"}, [(b"retry-after", b"1")]
+
+        if not self._db_ready:
+            await asyncio.to_thread(init_db)
+            self._db_ready = True
+
+        self.waiting += 1
+        try:
+            await self.sem.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            async with self.sessions.session(token) as store:
+                agent = cls(name=name, context=store)
+                try:
+                    result = await agent.arun(body.get("input"))
+                except ValueError as e:
+                    return 400, {"error": str(e)}, []
+                except Exception as e:
+                    return 502, {"error": f"{type(e).__name__}: {e}"}, []
+                await self.sessions.save(token, store)
+            return 200, {"result": result}, []
+        finally:
+            self.in_flight -= 1
+            self.sem.release()
+
+
+app = AgentService()
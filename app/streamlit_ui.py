@@ -3,76 +3,274 @@
 
 
 # ---- path shim ----
-import os, sys
+import os, sys, time
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 # -------------------
 
 import streamlit as st
-from app.core.context_store import ContextStore
-from app.core.storage import save_context, load_context
+from app.core.rerun_profiler import RerunProfiler, new_history, summarize
 
-# Agents
-from app.agents.planner_agent import PlannerAgent
-from app.agents.research_agent import ResearchAgent
-from app.agents.coding_agent import CodingAgent
-from app.agents.feedback_agent import FeedbackAgent
-from app.agents.plan_parser_agent import PlanParserAgent
-from app.agents.mock_agent import MockInterviewAgent
+# Started first so the rerun profile covers everything below
+profiler = RerunProfiler(deep=st.session_state.pop("profile_next_rerun", False))
 
+import json
+import importlib
 from uuid import uuid4
 
+from app.core.context_store import budget
+from app.core.storage import make_context_store
+from app.core.search_index import search_index
+from app.core.metrics import metrics
+from app.core import tracing
+from app.core.tracing import tracer
+from app.core.jobs import job_queue, HANDLERS, PENDING
+from app.core.db import (
+    init_db, save_context_delta, load_context_entries, log_mock_turn, fetch_mock_history,
+    get_turn_writer, WRITE_BEHIND
+)
+
+# Agent modules are imported on first use (see agent()), not on every rerun
+AGENTS = {
+    "planner": ("app.agents.planner_agent", "PlannerAgent"),
+    "research": ("app.agents.research_agent", "ResearchAgent"),
+    "parser": ("app.agents.plan_parser_agent", "PlanParserAgent"),
+    "coding": ("app.agents.coding_agent", "CodingAgent"),
+    "feedback": ("app.agents.feedback_agent", "FeedbackAgent"),
+    "mock": ("app.agents.mock_agent", "MockInterviewAgent"),
+}
+
+
+JOB_POLL_SECONDS = 1.0
+
+
+@st.cache_resource(show_spinner=False)
+def storage_ready() -> bool:
+    """Schema check once per process instead of create_all() on every rerun."""
+    init_db()
+    return True
+
+
+@st.cache_resource(show_spinner=False)
+def job_workers():
+    """One job worker pool per process (JOB_WORKERS threads), shared by every session."""
+    job_queue.start()
+    return job_queue
 
-from app.core.db import init_db, save_context_dict, load_context_dict, log_mock_turn, fetch_mock_history
- # ensures tables exist on start
-init_db()
 
-if "mock_session_id" not in st.session_state:
-    st.session_state["mock_session_id"] = str(uuid4())
+with profiler.section("startup"):
+    storage_ready()
+    job_workers()
+
+    # The session token namespaces everything this user persists. It is kept in
+    # the URL (?session=...) so a reload or reconnect resumes the same session.
+    if "mock_session_id" not in st.session_state:
+        st.session_state["mock_session_id"] = st.query_params.get("session") or str(uuid4())
+    if st.query_params.get("session") != st.session_state["mock_session_id"]:
+        st.query_params["session"] = st.session_state["mock_session_id"]
 
 
 st.set_page_config(page_title="AgentWeb+ | Interview Assistant", layout="wide")
 st.title("🧭 AgentWeb+ — Interview Assistant")
 
-# Shared context across tabs
-if "context" not in st.session_state:
-    st.session_state["context"] = ContextStore()
+def session_namespace():
+    return f"session::{st.session_state['mock_session_id']}"
+
+# Shared context across tabs. With the default backend, large/idle values
+# spill to the DB under the process-wide memory budget; with
+# CONTEXT_BACKEND=redis the context is shared by all app replicas.
+with profiler.section("startup"):
+    if "context" not in st.session_state:
+        st.session_state["context"] = make_context_store(session_namespace())
+        try:
+            if not st.session_state["context"].keys():
+                st.session_state["context"].load(load_context_entries(session_namespace()))
+        except Exception as e:
+            st.warning(f"Could not restore session: {e}")
 context = st.session_state["context"]
 
+
+def agent(name: str):
+    """
+    This session's instance of an agent, built on first use. Agents are
+    bound to the session's context, so they live in session_state and are
+    dropped with it (see Resume).
+    """
+    agents = st.session_state.setdefault("agents", {})
+    if name not in agents:
+        module, cls = AGENTS[name]
+        with profiler.section(f"import {module.rsplit('.', 1)[-1]}"):
+            agents[name] = getattr(importlib.import_module(module), cls)(name=name, context=context)
+    return agents[name]
+
+
+# ---- Background jobs ----
+# Agent calls run as jobs (app/core/jobs.py): the script only keeps job ids
+# per slot in session_state, so clicking around never discards a paid call.
+
+def session_jobs():
+    """slot -> job id for this session; rebuilt from the jobs table after a reconnect."""
+    if "jobs" not in st.session_state:
+        try:
+            latest = job_queue.latest(st.session_state["mock_session_id"])
+        except Exception:
+            latest = {}
+        st.session_state["jobs"] = {kind: j["id"] for kind, j in latest.items()}
+    return st.session_state["jobs"]
+
+
+def start_job(slot, kind, *args, **kwargs):
+    reads = {k: context.get(k) for k in HANDLERS[kind].reads}
+    session_jobs()[slot] = job_queue.submit(st.session_state["mock_session_id"], kind, args, kwargs, context=reads)
+
+
+def deliver(job) -> bool:
+    """
+    Merge a finished job's context writes into this session's context and
+    persist them before marking the job delivered, so a crash in between
+    re-delivers rather than loses them. Returns True only the first time.
+    A delivered job's keys missing from the context (a reconnect that
+    restored an older save) are merged again.
+    """
+    if job["status"] != "done":
+        return False
+    writes = (job["result"] or {}).get("context") or {}
+    if job["delivered_at"] is not None:
+        for k, v in writes.items():
+            if context.get(k) is None:
+                context.set(k, v)
+        return False
+    for k, v in writes.items():
+        context.set(k, v)
+    try:
+        save_context_delta(context, namespace=session_namespace())
+    except Exception as e:
+        st.warning(f"Could not save job results: {e}")
+    return job_queue.mark_delivered(job["id"])
+
+
+def job_result(slot, label, show_progress=None):
+    """
+    The finished job in `slot`, or None. While it is queued or running a
+    fragment polls it (rendering partial output with show_progress) and
+    reruns the app when it ends. job["fresh"] is True on the rerun that
+    delivered its result.
+    """
+    job_id = session_jobs().get(slot)
+    job = job_queue.get(job_id) if job_id else None
+    if job is None:
+        return None
+    if job["status"] in PENDING:
+        def watch():
+            current = job_queue.get(job_id)
+            if current is None or current["status"] not in PENDING:
+                st.rerun()
+            waited = time.time() - (current["created_at"] or time.time())
+            st.info(f"{label}… ({current['status']}, {waited:.0f}s) — you can keep using the app.")
+            if current["progress"] and show_progress:
+                show_progress(current)
+            if current["status"] == "queued" and st.button("Cancel", key=f"cancel_{job_id}"):
+                job_queue.cancel(job_id)
+                st.rerun()
+
+        with st.container():
+            st.fragment(watch, run_every=JOB_POLL_SECONDS)()
+        return None
+    job["fresh"] = deliver(job)
+    if job["status"] == "error":
+        st.error(f"{label} failed: {job['error']}")
+        return None
+    return job if job["status"] == "done" else None
+
+
+def render_resource(i, r):
+    title = r.get("title", "Untitled")
+    url = r.get("url", "")
+    rtype = r.get("type", "")
+    why = r.get("why", "")
+    if url:
+        st.markdown(f"**{i}. [{title}]({url})** · _{rtype}_  \n{why}")
+    else:
+        st.markdown(f"**{i}. {title}** · _{rtype}_  \n{why}")
+
+def render_resources(items):
+    for i, r in enumerate(items, start=1):
+        render_resource(i, r)
+
+def render_week_progress(job):
+    for w in json.loads(job["progress"]):
+        st.caption(f"Week {w.get('week')}: {', '.join(w.get('topics', []))}")
+
+def render_batch_progress(job):
+    done, total = json.loads(job["progress"]), len(job["args"][0])
+    st.progress(len(done) / max(1, total), text=f"Researched {len(done)}/{total}")
+    for t, items in done:
+        with st.expander(f"Resources: {t}"):
+            render_resources(items)
+
 # ---- Global controls: Save/Load session ----
 
 
-with st.sidebar:
+with st.sidebar, profiler.section("sidebar"):
     st.header("Session (PostgreSQL)")
+    st.caption(f"Session token: `{st.session_state['mock_session_id']}`")
     if st.button("💾 Save session to DB"):
-        save_context_dict(context.get_all())
-        st.success("Saved session to PostgreSQL")
+        n = save_context_delta(context, namespace=session_namespace())
+        st.success(f"Saved session to PostgreSQL ({n} changed key(s))")
     if st.button("📂 Load session from DB"):
-        data = load_context_dict()
-        for k, v in data.items():
-            context.set(k, v)
+        context.load(load_context_entries(session_namespace()))
         st.success("Loaded session from PostgreSQL")
+    resume = st.text_input("Resume another session (token)", key="resume_token")
+    if st.button("↩️ Resume") and resume.strip():
+        st.session_state["mock_session_id"] = resume.strip()
+        st.query_params["session"] = resume.strip()
+        old = st.session_state.pop("context", None)
+        st.session_state.pop("agents", None)
+        st.session_state.pop("jobs", None)
+        if old is not None:
+            old.close()
+        st.rerun()
+    mem = budget.stats()
+    st.caption(f"Context memory: {mem['resident_bytes'] / 1e6:.1f} / {mem['max_bytes'] / 1e6:.0f} MB "
+               f"across {mem['stores']} session(s), {mem['spills']} spill(s)")
+
+    # Process-wide: covers every session and the background job workers
+    with st.expander("📈 Agent metrics"):
+        rows = metrics.by_agent()
+        if rows:
+            cost = sum(r["cost_usd"] for r in rows)
+            tokens = sum(r["prompt_tokens"] + r["completion_tokens"] for r in rows)
+            st.caption(f"Since process start: {tokens:,} tokens · ~${cost:.4f}")
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+        else:
+            st.caption("No agent calls yet.")
+        db_rows = metrics.db()
+        if db_rows:
+            st.caption("Database")
+            st.dataframe(db_rows, use_container_width=True, hide_index=True)
+        st.download_button("Prometheus export", metrics.prometheus(), file_name="metrics.prom",
+                           mime="text/plain", key="metrics_export")
 
 
-tab_plan, tab_research, tab_topics, tab_coding, tab_feedback, tab_mock = st.tabs(
-    ["📅 Planner", "🔎 Research", "🧩 Topics", "💻 Coding", "✅ Feedback", "🎤 Mock Interview"]
+tab_plan, tab_research, tab_topics, tab_search, tab_coding, tab_feedback, tab_mock = st.tabs(
+    ["📅 Planner", "🔎 Research", "🧩 Topics", "🗂️ Search", "💻 Coding", "✅ Feedback", "🎤 Mock Interview"]
 )
 
 # ---------------- Planner ----------------
-with tab_plan:
+with tab_plan, profiler.section("tab: planner"):
     st.subheader("Interview Planner")
     user_goal = st.text_input("Goal", key="planner_goal", placeholder="e.g., ML internship at Amazon in 4 weeks")
     if st.button("Generate 4-Week Plan"):
         if not user_goal.strip():
             st.warning("Please enter a goal first.")
         else:
-            planner = PlannerAgent(name="planner", context=context)
-            with st.spinner("Generating your plan..."):
-                plan = planner.run(user_goal)
-            context.set("interview_plan", plan)
-            st.success("Here's your 4-week plan:")
-            st.text_area("Plan", plan, height=320, key="plan_output")
+            start_job("plan", "plan", user_goal)
+
+    job = job_result("plan", "Writing your plan", show_progress=lambda j: st.text(j["progress"]))
+    if job:
+        st.success("Here's your 4-week plan:")
+        st.text_area("Plan", job["result"]["value"], height=320, key=f"plan_output_{job['id']}")
 
     stored_plan = context.get("interview_plan")
     if stored_plan:
@@ -80,39 +278,42 @@ with tab_plan:
             st.text_area("Plan", stored_plan, height=260)
 
 # ---------------- Research ----------------
-with tab_research:
+with tab_research, profiler.section("tab: research"):
     st.subheader("Topic Research")
     topic = st.text_input("Topic to research", key="research_topic", placeholder="e.g., binary trees")
     if st.button("Find Resources"):
         if not topic.strip():
             st.warning("Please enter a topic to research.")
         else:
-            researcher = ResearchAgent(name="research", context=context)
-            with st.spinner(f"Curating resources for: {topic}"):
-                items = researcher.run(topic)
-            st.success("Curated resources:")
-            for i, r in enumerate(items, start=1):
-                title = r.get("title", "Untitled")
-                url = r.get("url", "")
-                rtype = r.get("type", "")
-                why = r.get("why", "")
-                if url:
-                    st.markdown(f"**{i}. [{title}]({url})** · _{rtype}_  \n{why}")
-                else:
-                    st.markdown(f"**{i}. {title}** · _{rtype}_  \n{why}")
+            start_job("research", "research", topic)
+
+    # each resource shows up as soon as its JSON object is complete
+    job = job_result("research", "Curating resources",
+                     show_progress=lambda j: render_resources(json.loads(j["progress"])))
+    if job:
+        st.success(f"Curated resources for: {job['args'][0]}")
+        render_resources(job["result"]["value"])
 
 # ---------------- Topics (from plan) ----------------
-with tab_topics:
+with tab_topics, profiler.section("tab: topics"):
     st.subheader("Extract Topics from Your Plan")
     plan_text = context.get("interview_plan", "")
     if not plan_text:
         st.info("Generate a plan first in the Planner tab.")
     else:
         if st.button("Extract topics per week"):
-            parser = PlanParserAgent(name="parser", context=context)
-            with st.spinner("Parsing plan into weekly topics..."):
-                data = parser.run(plan_text)
-            st.success("Topics extracted. See below.")
+            start_job("parse", "parse", plan_text)
+        job = job_result("parse", "Parsing plan into weekly topics", show_progress=render_week_progress)
+        if job and job["fresh"]:
+            how = "locally" if job["result"]["extras"].get("source") == "local" else "with the LLM"
+            st.success(f"Topics extracted {how}. See below.")
+
+        topics_flat = context.get("topics_flat", [])
+        if topics_flat and st.button(f"🔎 Research all {len(topics_flat)} topics", key="topics_research_all"):
+            start_job("research_many", "research_many", topics_flat)
+        job = job_result("research_many", "Researching topics in parallel", show_progress=render_batch_progress)
+        if job and job["fresh"]:
+            st.success("All topics researched. Results are listed per week below.")
 
         topics_by_week = context.get("topics_by_week", {})
         if topics_by_week:
@@ -124,28 +325,36 @@ with tab_topics:
                     col = cols[i % 3]
                     if col.button(f"🔎 {t}", key=f"topicbtn_{w.get('week')}_{i}"):
                         # research the clicked topic
-                        researcher = ResearchAgent(name="research", context=context)
-                        with st.spinner(f"Curating resources for: {t}"):
-                            items = researcher.run(t)
-                        st.session_state[f"topics_last_{t}"] = items
+                        start_job(f"topic::{t}", "research", t)
 
-                # show last results for each clicked topic
+                # results land in context (resources::<topic>) whichever job produced them
                 for t in topics:
-                    items = st.session_state.get(f"topics_last_{t}")
+                    job_result(f"topic::{t}", f"Curating resources for: {t}")
+                    items = context.get(f"resources::{t.lower()}")
                     if items:
                         with st.expander(f"Resources: {t}"):
-                            for j, r in enumerate(items, start=1):
-                                title = r.get("title", "Untitled")
-                                url = r.get("url", "")
-                                rtype = r.get("type", "")
-                                why = r.get("why", "")
-                                if url:
-                                    st.markdown(f"**{j}. [{title}]({url})** · _{rtype}_  \n{why}")
-                                else:
-                                    st.markdown(f"**{j}. {title}** · _{rtype}_  \n{why}")
+                            render_resources(items)
+
+# ---------------- Search (local index, no LLM) ----------------
+with tab_search, profiler.section("tab: search"):
+    st.subheader("Search Curated Resources")
+    cols = st.columns([4, 1])
+    query = cols[0].text_input("Search everything researched so far", key="search_query",
+                               placeholder="e.g., dynamic programming video")
+    rtype = cols[1].selectbox("Type", ["any", "doc", "tutorial", "practice", "video", "paper"], key="search_type")
+    if query.strip():
+        t0 = time.perf_counter()
+        hits = search_index.search(query, limit=20, type_filter=None if rtype == "any" else rtype)
+        st.caption(f"{len(hits)} result(s) in {(time.perf_counter() - t0) * 1000:.1f} ms")
+        for i, r in enumerate(hits, start=1):
+            render_resource(i, r)
+            st.caption(f"Topics: {r['topics']} · score {r['score']}")
+    if st.button("Index this session's researched topics", key="search_backfill"):
+        n = search_index.add_context(context)
+        st.success(f"Indexed {n} new or updated resource(s).")
 
 # ---------------- Coding ----------------
-with tab_coding:
+with tab_coding, profiler.section("tab: coding"):
     st.subheader("Coding Agent")
     problem = st.text_area("Problem statement", height=160, key="coding_problem",
                            placeholder="e.g., Given an array of integers, return indices of two numbers that add up to a target.")
@@ -154,21 +363,75 @@ with tab_coding:
         if not problem.strip():
             st.warning("Please enter a problem statement.")
         else:
-            solver = CodingAgent(name="coding", context=context)
-            with st.spinner("Generating solution..."):
-                result = solver.run({"problem": problem, "language": language})
-            st.success("Solution generated:")
-            st.markdown(f"**Language:** {result.get('language','')}")
-            st.code(result.get("solution_code", ""), language=result.get("language", "python"))
-            st.markdown("**Explanation**")
-            st.write(result.get("explanation", ""))
-            comp = result.get("complexity", {})
-            st.markdown(f"**Complexity:** Time — {comp.get('time','N/A')}, Space — {comp.get('space','N/A')}")
             context.set("last_problem", problem)
-            context.set("last_solution", result)
+            start_job("coding", "coding", {"problem": problem, "language": language})
+
+    job = job_result("coding", "Solving", show_progress=lambda j: st.code(j["progress"], language="json"))
+    if job:
+        result = job["result"]["value"] or {}
+        st.success("Solution generated:")
+        st.markdown(f"**Language:** {result.get('language','')}")
+        st.code(result.get("solution_code", ""), language=result.get("language", "python"))
+        st.markdown("**Explanation**")
+        st.write(result.get("explanation", ""))
+        comp = result.get("complexity", {})
+        st.markdown(f"**Complexity:** Time — {comp.get('time','N/A')}, Space — {comp.get('space','N/A')}")
 
 # ---------------- Feedback ----------------
-with tab_feedback:
+def render_feedback(fb):
+    st.success(f"Score: {fb.get('score', 'N/A')} / 5")
+    st.markdown("**Summary**")
+    st.write(fb.get("summary", ""))
+    cols = st.columns(3)
+    with cols[0]:
+        st.markdown("**Strengths**")
+        for s in fb.get("strengths", []): st.write(f"- {s}")
+    with cols[1]:
+        st.markdown("**Improvements**")
+        for s in fb.get("improvements", []): st.write(f"- {s}")
+    with cols[2]:
+        st.markdown("**Potential Bugs**")
+        for s in fb.get("potential_bugs", []): st.write(f"- {s}")
+
+    perf = fb.get("performance")
+    if perf:
+        st.markdown("**Measured performance**")
+        cand, ref = perf.get("candidate", {}), perf.get("reference")
+        if not cand.get("ok"):
+            st.warning(f"Could not run your code: {cand.get('error', 'unknown error')}")
+        else:
+            comp = cand.get("complexity") or {}
+            mem = cand.get("peak_memory_bytes")
+            line = f"Entry `{cand.get('entry')}` · measured **{comp.get('best') or 'n/a'}**"
+            if comp.get("exponent") is not None:
+                line += f" (log-log slope {comp['exponent']})"
+            if mem is not None:
+                line += f" · peak memory {mem / 1024:.1f} KiB at n={cand.get('profiled_n')}"
+            st.markdown(line)
+            if ref and ref.get("ok"):
+                rcomp = ref.get("complexity") or {}
+                st.caption(f"Reference solution: measured {rcomp.get('best') or 'n/a'}, "
+                           f"claimed {ref.get('claimed') or 'n/a'}")
+            agree = perf.get("agreement")
+            if agree and agree.get("checked"):
+                if agree["mismatches"]:
+                    st.error(f"Output differs from the reference on {agree['mismatches']} of "
+                             f"{agree['checked']} generated inputs.")
+                    st.json(agree["examples"], expanded=False)
+                else:
+                    st.caption(f"Matches the reference on {agree['checked']} generated inputs.")
+            for key, label in (("timed_out_at", "timed out"), ("memory_error_at", "ran out of memory")):
+                if cand.get(key) is not None:
+                    st.warning(f"Your code {label} at n={cand[key]}.")
+            if cand.get("error_at"):
+                st.warning(f"Your code raised at n={cand['error_at']['n']}: {cand['error_at']['error']}")
+            if cand.get("sizes"):
+                st.line_chart({"n": cand["sizes"], "seconds": cand["timings_s"]}, x="n", y="seconds")
+            if cand.get("hotspots"):
+                st.markdown("Hot spots (cProfile)")
+                st.dataframe(cand["hotspots"], use_container_width=True)
+
+with tab_feedback, profiler.section("tab: feedback"):
     st.subheader("Code Feedback")
     fb_problem = st.text_area("Problem (optional)", height=120, value=context.get("last_problem") or "", key="feedback_problem")
     user_code = st.text_area("Your code", height=220, key="feedback_code", placeholder="Paste your solution here…")
@@ -177,26 +440,17 @@ with tab_feedback:
         if not user_code.strip():
             st.warning("Please paste your code first.")
         else:
-            reviewer = FeedbackAgent(name="feedback", context=context)
-            with st.spinner("Reviewing your code..."):
-                fb = reviewer.run({"problem": fb_problem, "code": user_code, "language": fb_lang})
-            st.success(f"Score: {fb.get('score', 'N/A')} / 5")
-            st.markdown("**Summary**")
-            st.write(fb.get("summary", ""))
-            cols = st.columns(3)
-            with cols[0]:
-                st.markdown("**Strengths**")
-                for s in fb.get("strengths", []): st.write(f"- {s}")
-            with cols[1]:
-                st.markdown("**Improvements**")
-                for s in fb.get("improvements", []): st.write(f"- {s}")
-            with cols[2]:
-                st.markdown("**Potential Bugs**")
-                for s in fb.get("potential_bugs", []): st.write(f"- {s}")
+            start_job("feedback", "feedback", {"problem": fb_problem, "code": user_code, "language": fb_lang})
+
+    job = job_result("feedback", "Reviewing your code")
+    if job:
+        render_feedback(job["result"]["value"] or {})
 
 
 # ---------------- Mock Interview ----------------
-with tab_mock:
+DB_HISTORY_SHOWN = 20
+
+with tab_mock, profiler.section("tab: mock interview"):
     st.subheader("Mock Interview")
 
     # Simple per-user session id (persists in this browser session)
@@ -210,16 +464,39 @@ with tab_mock:
         if not role.strip() or not focus.strip():
             st.warning("Please provide both role and focus.")
         else:
-            mock = MockInterviewAgent(name="mock", context=context)
-            with st.spinner("Generating questions..."):
-                session = mock.start_session(role, focus)
-            st.success("Session started.")
+            start_job("mock_start", "mock_start", role, focus, user=session_id)
+    job = job_result("mock_start", "Generating questions")
+    if job and job["fresh"]:
+        reused = (job["result"]["value"] or {}).get("from_bank", 0)
+        st.success("Session started." + (f" {reused} question(s) from the question bank." if reused else ""))
+
+    grading = colB.radio(
+        "Grading", ["immediate", "background", "batch at end"], horizontal=True, key="mock_grading",
+        help="background: next question appears at once, grades arrive later. "
+             "batch at end: all answers are graded in one call when you finish.",
+    )
+
+    def log_turns(turns):
+        for t in turns:
+            try:
+                log_mock_turn(session_id=session_id, question=t["question"],
+                              answer=t["answer"], evaluation=t["evaluation"])
+                st.session_state["mock_db_history_stale"] = True
+            except Exception as e:
+                st.warning(f"Could not log mock turn: {e}")
 
     session = context.get("mock_session", {}) or {}
     questions = session.get("questions", [])
     idx = session.get("index", 0)
 
     if questions:
+        # Attach any background grades that finished since the last rerun
+        mock = agent("mock")
+        graded = mock.collect_evaluations()
+        log_turns(graded)
+        for t in graded:
+            st.toast(f"Graded: {t['evaluation'].get('score', 'N/A')}/5 — {t['question'][:60]}")
+
         if idx < len(questions):
             st.markdown(f"**Question {idx+1}/{len(questions)}**")
             st.write(questions[idx])
@@ -227,7 +504,10 @@ with tab_mock:
             answer = st.text_area("Your answer", key=f"mock_answer_{idx}", height=160)
 
             if st.button("Submit answer", key=f"mock_submit_{idx}"):
-                mock = MockInterviewAgent(name="mock", context=context)
+                if grading != "immediate":
+                    mock.submit_answer(answer, grading="batch" if grading == "batch at end" else "background")
+                    st.rerun()  # show the next question right away
+
                 with st.spinner("Evaluating your answer..."):
                     res = mock.evaluate_answer(answer)
 
@@ -246,6 +526,7 @@ with tab_mock:
                             answer=answer,
                             evaluation=res.get("evaluation", {}),
                         )
+                        st.session_state["mock_db_history_stale"] = True
                     except Exception as e:
                         st.warning(f"Could not log mock turn: {e}")
 
@@ -256,6 +537,17 @@ with tab_mock:
                                 st.write(f"- {p}")
         else:
             st.success("✅ Session complete! See your history below.")
+            ungraded = sum(1 for h in session.get("history", []) if h.get("eval") is None)
+            if ungraded:
+                if mock.pending_count():
+                    if st.button(f"Wait for {mock.pending_count()} pending grade(s)", key="mock_wait_btn"):
+                        with st.spinner("Waiting for background grading..."):
+                            log_turns(mock.collect_evaluations(timeout=None))
+                        st.rerun()
+                elif st.button(f"Grade all {ungraded} answer(s)", key="mock_grade_all_btn"):
+                    with st.spinner("Grading all answers in one pass..."):
+                        log_turns(mock.evaluate_batch())
+                    st.rerun()
 
         # In-memory history
         history = session.get("history", [])
@@ -265,23 +557,82 @@ with tab_mock:
                     st.markdown(f"**Q{i}:** {h['q']}")
                     st.markdown(f"**Your answer:** {h['a']}")
                     ev = h['eval']
+                    if ev is None:
+                        st.caption("Grading pending…")
+                        continue
                     st.markdown(f"**Score:** {ev.get('score','N/A')}/5")
                     st.markdown(f"**Feedback:** {ev.get('feedback','')}")
 
-        # DB-backed history
-        with st.expander("DB-backed History (from PostgreSQL)"):
+        # DB-backed history: only queried while shown, and then only when this
+        # session logged a turn since the last fetch (or on Refresh), for the
+        # turns after the last one fetched (keyset on id)
+        if st.toggle("Show DB-backed History (from PostgreSQL)", key="mock_show_db_history"):
+            cache = st.session_state.setdefault("mock_db_history", {"session_id": session_id, "rows": None})
+            if cache["session_id"] != session_id:
+                cache.update(session_id=session_id, rows=None)
+            refresh = st.button("Refresh", key="mock_db_history_refresh")
             try:
-                rows = fetch_mock_history(session_id=session_id)
+                stale = st.session_state.pop("mock_db_history_stale", False)
+                if cache["rows"] is None or refresh or stale:
+                    # turns are logged write-behind: land them before reading, and
+                    # keep the flag if they couldn't be so the next rerun re-fetches
+                    if WRITE_BEHIND and not get_turn_writer().flush(timeout=2.0):
+                        st.session_state["mock_db_history_stale"] = True
+                    rows = cache["rows"] or []
+                    since = rows[-1]["id"] if rows else 0
+                    cache["rows"] = rows + fetch_mock_history(session_id=session_id, since_id=since)
+                rows = cache["rows"]
                 if not rows:
                     st.caption("No turns logged yet.")
-                for r in rows:
+                elif len(rows) > DB_HISTORY_SHOWN:
+                    st.caption(f"Showing the latest {DB_HISTORY_SHOWN} of {len(rows)} turns.")
+                for r in rows[-DB_HISTORY_SHOWN:]:
                     st.markdown(f"- **Q:** {r['question']}")
                     st.markdown(f"  **A:** {r['answer']}")
                     st.markdown(
-                        f"  **Score:** {r['evaluation'].get('score','N/A')} | "
+                        f"  **Score:** {(r['evaluation'] or {}).get('score','N/A')} | "
                         f"**When:** {r['created_at']}"
                     )
             except Exception as e:
                 st.warning(f"Could not load DB history: {e}")
     else:
         st.info("Click **Start Session** to generate interview questions.")
+
+
+# ---------------- Rerun profile ----------------
+with st.sidebar:
+    history = st.session_state.setdefault("rerun_history", new_history())
+    last = profiler.finish(history)
+    with st.expander(f"⏱️ Last rerun: {last['total_ms']:.0f} ms"):
+        st.caption("Time per part of the script on the last rerun (ms)")
+        st.dataframe([{"part": k, "ms": v} for k, v in last["sections_ms"].items()]
+                     + [{"part": "(other)", "ms": last["other_ms"]}], use_container_width=True)
+        agg = summarize(history)
+        st.caption(f"Last {agg['reruns']} rerun(s): mean {agg['mean_ms']} ms · "
+                   f"p95 {agg['p95_ms']} ms · max {agg['max_ms']} ms")
+        if last.get("top_functions"):
+            st.caption("cProfile, by cumulative time")
+            st.dataframe(last["top_functions"], use_container_width=True)
+        if st.button("Profile next rerun with cProfile", key="profile_next_btn"):
+            st.session_state["profile_next_rerun"] = True
+            st.rerun()
+        if last.get("trace_id"):
+            st.caption(f"Trace `{last['trace_id']}` (`python -m app.core.tracing show {last['trace_id'][:12]}`)")
+
+    # Reads the trace file only while toggled on
+    with st.expander("🔍 Slow traces"):
+        if st.toggle("Load traces", key="traces_open"):
+            traces = tracing.group(tracing.load(tracer.path))
+            slowest = sorted((tracing.summarize(t) for t in traces.values()),
+                             key=lambda r: r["started"])[-500:]
+            slowest.sort(key=lambda r: -r["duration_ms"])
+            if not slowest:
+                st.caption(f"No spans in {tracer.path} yet.")
+            else:
+                picked = st.selectbox(
+                    "Trace", [r["trace_id"] for r in slowest[:20]], key="trace_pick",
+                    format_func=lambda tid: next(f"{r['duration_ms']:.0f} ms · {r['root']} · {r['spans']} spans"
+                                                 for r in slowest if r["trace_id"] == tid))
+                st.code(tracing.render_tree(traces[picked]), language=None)
+                st.download_button("Folded stacks (flame graph)", tracing.folded([traces[picked]]),
+                                   file_name=f"trace-{picked[:12]}.folded", mime="text/plain", key="trace_folded")
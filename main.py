@@ -1,12 +1,55 @@
+import argparse
+from pathlib import Path
+
 from app.core.context_store import ContextStore
+from app.core.db import init_db
+from app.core.pipeline import Pipeline
+from app.core.storage import save_context, load_context, DEFAULT_PATH
 from app.agents.planner_agent import PlannerAgent
+from app.agents.plan_parser_agent import PlanParserAgent
+from app.agents.research_agent import ResearchAgent
+from app.agents.mock_agent import MockInterviewAgent
+
+
+def build_pipeline(context: ContextStore, workers: int = 4) -> Pipeline:
+    """goal -> plan -> topics -> resources, with the question set generated alongside."""
+    return Pipeline.from_agents([
+        PlannerAgent(name="planner", context=context),
+        PlanParserAgent(name="parser", context=context),
+        ResearchAgent(name="research", context=context),
+        MockInterviewAgent(name="mock", context=context),
+    ], max_workers=workers)
+
 
 if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Run the AgentWeb+ pipeline headlessly.")
+    ap.add_argument("--goal", default="I want to get a machine learning internship at Amazon in 4 weeks")
+    ap.add_argument("--role", default="ML Engineer Intern")
+    ap.add_argument("--focus", default="machine learning fundamentals")
+    ap.add_argument("--session", type=Path, default=DEFAULT_PATH,
+                    help="session file to resume from and save to")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--force", action="store_true", help="re-run every step even if its inputs are unchanged")
+    args = ap.parse_args()
+
+    init_db()  # creates kv_store / llm_cache tables if missing
     context = ContextStore()
-    planner = PlannerAgent(name="planner", context=context)
+    context.load(load_context(args.session))
+    # Only touch inputs that changed so unchanged steps are skipped on resume
+    for k, v in (("goal", args.goal), ("mock_role", args.role), ("mock_focus", args.focus)):
+        if context.get(k) != v:
+            context.set(k, v)
 
-    user_goal = "I want to get a machine learning internship at Amazon in 4 weeks"
-    output = planner.run(user_goal)
+    pipeline = build_pipeline(context, workers=args.workers)
+    try:
+        pipeline.run(context, force=args.force,
+                     on_event=lambda node, st: print(f"[{node}] {st}"))
+    finally:
+        save_context(context, args.session)
 
     print("\nGenerated Interview Plan:\n")
-    print(output)
+    print(context.get("interview_plan", ""))
+    print("\nTopics:", ", ".join(context.get("topics_flat", []) or []))
+    print("\nMock questions:")
+    for q in (context.get("mock_session") or {}).get("questions", []):
+        print(f"- {q}")
@@ -0,0 +1,57 @@
+# scripts/bench_mock_writes.py
+"""
+Throughput of mock-turn logging: one transaction per turn vs the
+write-behind MockTurnWriter.
+
+    python scripts/bench_mock_writes.py                      # temp SQLite file
+    DATABASE_URL=postgresql+psycopg://... python scripts/bench_mock_writes.py
+"""
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+tmpdir = tempfile.mkdtemp(prefix="agentweb-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tmpdir}/bench.db")
+
+from app.core import db  # noqa: E402  (DATABASE_URL must be set first)
+
+
+def bench_sync(n: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        db.log_mock_turn("bench-sync", f"q{i}", "answer", {"score": 3}, sync=True)
+    return time.perf_counter() - t0
+
+
+def bench_write_behind(n: int) -> float:
+    writer = db.MockTurnWriter(journal_path=os.path.join(tmpdir, "bench.journal"))
+    t0 = time.perf_counter()
+    for i in range(n):
+        writer.submit({"session_id": "bench-wb", "question": f"q{i}", "answer": "answer",
+                       "evaluation": {"score": 3}})
+    enqueue = time.perf_counter() - t0
+    writer.flush()
+    total = time.perf_counter() - t0
+    writer.close()
+    print(f"  write-behind enqueue only: {enqueue * 1e6 / n:8.1f} us/turn (request-path cost)")
+    return total
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=2000)
+    args = ap.parse_args()
+
+    db.init_db()
+    print(f"DATABASE_URL={db.DATABASE_URL}  turns={args.n}")
+    t_sync = bench_sync(args.n)
+    print(f"  sync (1 txn/turn):         {args.n / t_sync:8.0f} turns/s")
+    t_wb = bench_write_behind(args.n)
+    print(f"  write-behind (bulk):       {args.n / t_wb:8.0f} turns/s")
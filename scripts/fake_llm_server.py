@@ -0,0 +1,139 @@
+# scripts/fake_llm_server.py
+"""
+Local OpenAI-compatible stand-in that injects throttling, for exercising
+app.core.rate_limit without spending real tokens.
+
+    python scripts/fake_llm_server.py --port 8089 --rpm 60 --p429 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake streamlit run app/streamlit_ui.py
+
+    # or start it in-process and fire a burst of agent calls at it:
+    python scripts/fake_llm_server.py --drive 40 --rpm 30 --p429 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+class Throttle:
+    def __init__(self, rpm: int, p429: float):
+        self.rpm = rpm
+        self.p429 = p429
+        self.window = deque()
+        self.lock = threading.Lock()
+        self.served = 0
+        self.rejected = 0
+
+    def admit(self) -> bool:
+        now = time.monotonic()
+        with self.lock:
+            while self.window and now - self.window[0] > 60:
+                self.window.popleft()
+            if len(self.window) >= self.rpm or random.random() < self.p429:
+                self.rejected += 1
+                return False
+            self.window.append(now)
+            self.served += 1
+            return True
+
+
+def make_handler(throttle: Throttle, latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload, headers=()):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(body)))
+            for k, v in headers:
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("content-length", 0))
+            req = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                return self._send(404, {"error": {"message": "not found"}})
+            if not throttle.admit():
+                return self._send(429, {"error": {"message": "Rate limit reached (fake)", "type": "requests"}},
+                                  headers=[("retry-after", "1")])
+            time.sleep(random.uniform(latency * 0.5, latency * 1.5))
+            content = json.dumps({"resources": [{"title": "Fake resource", "url": "", "type": "doc",
+                                                 "why": "served by fake_llm_server"}]})
+            self._send(200, {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                "model": req.get("model", "fake"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": 50, "completion_tokens": 30, "total_tokens": 80},
+            })
+    return Handler
+
+
+def serve(port: int, rpm: int, p429: float, latency: float):
+    throttle = Throttle(rpm, p429)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(throttle, latency))
+    return server, throttle
+
+
+def drive(n: int, port: int):
+    """Fire n concurrent uncached ResearchAgent calls through the shared limiter."""
+    from concurrent.futures import ThreadPoolExecutor
+    from app.core.db import init_db
+    from app.core.context_store import ContextStore
+    from app.core.rate_limit import rate_limiter
+    from app.agents.research_agent import ResearchAgent
+
+    init_db()
+    agent = ResearchAgent(name="research", context=ContextStore(), cache=False)
+    ok = failed = 0
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        for fut in [pool.submit(agent.run, f"topic {i}") for i in range(n)]:
+            try:
+                fut.result()
+                ok += 1
+            except Exception as e:
+                failed += 1
+                print("failed:", type(e).__name__, e)
+    print(f"{ok}/{n} succeeded, {failed} failed in {time.monotonic() - t0:.1f}s")
+    print("limiter:", rate_limiter.stats())
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--rpm", type=int, default=60, help="requests per minute before 429s")
+    ap.add_argument("--p429", type=float, default=0.0, help="probability of a random 429")
+    ap.add_argument("--latency", type=float, default=0.3, help="mean response latency (s)")
+    ap.add_argument("--drive", type=int, default=0, help="run N agent calls against the server, then exit")
+    args = ap.parse_args()
+
+    server, throttle = serve(args.port, args.rpm, args.p429, args.latency)
+    if not args.drive:
+        print(f"fake LLM on http://127.0.0.1:{args.port}/v1 (rpm={args.rpm}, p429={args.p429})")
+        server.serve_forever()
+    else:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "fake")
+        os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/fake.db")
+        drive(args.drive, args.port)
+        print(f"server: served={throttle.served} rejected(429)={throttle.rejected}")
+        server.shutdown()
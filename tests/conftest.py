@@ -0,0 +1,23 @@
+# tests/conftest.py
+"""
+Point the app at throwaway state before anything imports it: settings are
+read with os.getenv at import time (DATABASE_URL in app.core.db, ...).
+"""
+
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="agentweb-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["MOCK_TURN_JOURNAL"] = os.path.join(_tmp, "mock_turns.journal")
+os.environ["TRACE_FILE"] = os.path.join(_tmp, "traces.jsonl")
+os.environ["AGENTWEB_SESSION_PATH"] = os.path.join(_tmp, "session.json")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def db():
+    from app.core.db import init_db
+    init_db()
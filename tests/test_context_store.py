@@ -0,0 +1,93 @@
+# tests/test_context_store.py
+
+from app.core.context_store import ContextStore
+from app.core.db import ContextSpill, load_context_entries, save_context_delta
+
+
+class DictSpill:
+    def __init__(self):
+        self.rows = {}
+
+    def put(self, namespace, key, value, version=0):
+        self.rows[(namespace, key)] = value
+
+    def get(self, namespace, key):
+        return self.rows.get((namespace, key))
+
+    def delete(self, namespace, key):
+        self.rows.pop((namespace, key), None)
+
+    def clear(self, namespace):
+        for k in [k for k in self.rows if k[0] == namespace]:
+            del self.rows[k]
+
+
+def test_each_sink_sees_every_change():
+    ctx = ContextStore()
+    ctx.set("a", 1)
+    ctx.set("b", 2)
+    assert ctx.take_dirty("file") == ({"a": 1, "b": 2}, set())
+    ctx.set("a", 3)
+    ctx.delete("b")
+    assert ctx.take_dirty("db") == ({"a": 3}, {"b"})
+    assert ctx.take_dirty("file") == ({"a": 3}, {"b"})
+    assert ctx.take_dirty("file") == ({}, set())
+
+
+def test_loaded_values_are_not_dirty():
+    ctx = ContextStore()
+    ctx.load({"a": 1})
+    assert ctx.take_dirty() == ({}, set())
+
+
+def test_failed_save_is_retried_for_that_sink_only():
+    ctx = ContextStore()
+    ctx.set("a", 1)
+    changed, deleted = ctx.take_dirty("file")
+    ctx.mark_dirty(changed.keys(), deleted, sink="file")
+    assert ctx.take_dirty("file") == ({"a": 1}, set())
+    assert ctx.take_dirty("db") == ({"a": 1}, set())
+    assert ctx.take_dirty("db") == ({}, set())
+
+
+def test_spilled_changes_stay_dirty():
+    ctx = ContextStore(namespace="ns", spill=DictSpill())
+    try:
+        ctx.set("big", "x" * 100)
+        ctx._spill("big")
+        assert "big" not in ctx.store
+        assert ctx.take_dirty("file") == ({"big": "x" * 100}, set())
+    finally:
+        ctx.close()
+
+
+def test_spill_rows_follow_the_key():
+    spill = DictSpill()
+    ctx = ContextStore(namespace="ns", spill=spill)
+    try:
+        for key in ("a", "b", "c"):
+            ctx.set(key, key * 10)
+            ctx._spill(key)
+        assert len(spill.rows) == 3
+        ctx.set("a", "new")
+        ctx.delete("b")
+        assert set(spill.rows) == {("ns", "c")}
+        assert ctx.get("a") == "new" and ctx.get("b") is None
+    finally:
+        ctx.close()
+    assert spill.rows == {}
+
+
+def test_db_spill_is_kept_apart_from_saved_entries(db):
+    ctx = ContextStore(namespace="spill-test", spill=ContextSpill())
+    try:
+        ctx.set("saved", 1)
+        save_context_delta(ctx, "spill-test")
+        ctx.set("unsaved", 2)
+        ctx._spill("unsaved")
+        assert load_context_entries("spill-test") == {"saved": 1}
+        assert ctx.get("unsaved") == 2
+        ctx._spill("unsaved")
+    finally:
+        ctx.close()
+    assert load_context_entries("spill::spill-test") == {}
@@ -0,0 +1,110 @@
+# tests/test_jobs.py
+
+import time
+
+import pytest
+from sqlalchemy import delete, update
+
+from app.core import jobs
+from app.core.db import SessionLocal, Job
+from app.core.jobs import JobQueue, JobSpec, HANDLERS
+
+
+class EchoAgent:
+    """Stand-in agent: echoes its input and writes one context key."""
+
+    def __init__(self, name, context):
+        self.context = context
+
+    def run(self, value):
+        if value == "boom":
+            raise RuntimeError("boom")
+        self.context.set("echo", value)
+        return {"echo": value, "seen": self.context.get("seed")}
+
+
+@pytest.fixture
+def queue(db, monkeypatch):
+    with SessionLocal() as s:
+        s.execute(delete(Job))
+        s.commit()
+    monkeypatch.setitem(HANDLERS, "echo", JobSpec(__name__, "EchoAgent", "run", reads=("seed",)))
+    return JobQueue(workers=0)
+
+
+def _set(job_id, **values):
+    with SessionLocal() as s:
+        s.execute(update(Job).where(Job.id == job_id).values(**values))
+        s.commit()
+
+
+def test_claim_run_finish(queue):
+    job_id = queue.submit("s1", "echo", ["hi"], context={"seed": 7, "unrelated": 1})
+    assert queue.get(job_id)["status"] == "queued"
+
+    job = queue._claim()
+    assert job.id == job_id and job.attempts == 1
+    assert queue.get(job_id)["status"] == "running"
+    assert queue._claim() is None          # nothing else queued
+
+    result = queue._execute(job)
+    assert result["value"] == {"echo": "hi", "seen": 7}
+    assert result["context"] == {"echo": "hi"}
+    assert queue._finish(job, "done", result=result)
+    row = queue.get(job_id)
+    assert row["status"] == "done" and row["result"]["value"]["echo"] == "hi"
+
+
+def test_finish_is_ignored_after_requeue(queue):
+    job_id = queue.submit("s1", "echo", ["hi"])
+    job = queue._claim()
+    # swept as stale and claimed again (possibly by another process)
+    _set(job_id, worker="elsewhere:1", attempts=2)
+    assert not queue._finish(job, "done", result={"value": 1})
+    assert queue.get(job_id)["status"] == "running"
+
+
+def test_stale_jobs_are_requeued_then_failed(queue, monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_ATTEMPTS", 2)
+    job_id = queue.submit("s1", "echo", ["hi"])
+    queue._claim()
+    _set(job_id, heartbeat_at=time.time() - jobs.STALE_AFTER - 1)
+    job = queue._claim()                   # requeued, then claimed again
+    assert job.id == job_id and job.attempts == 2
+    _set(job_id, heartbeat_at=time.time() - jobs.STALE_AFTER - 1)
+    assert queue._claim() is None
+    row = queue.get(job_id)
+    assert row["status"] == "error" and "stopped responding" in row["error"]
+
+
+def test_cancel_only_while_queued(queue):
+    queued = queue.submit("s1", "echo", ["a"])
+    assert queue.cancel(queued)
+    assert queue.get(queued)["status"] == "cancelled"
+    assert queue._claim() is None
+
+    running = queue.submit("s1", "echo", ["b"])
+    queue._claim()
+    assert not queue.cancel(running)
+
+
+def test_mark_delivered_once(queue):
+    job_id = queue.submit("s1", "echo", ["hi"])
+    assert queue.mark_delivered(job_id)
+    assert not queue.mark_delivered(job_id)
+
+
+def test_workers_record_success_and_failure(queue):
+    ok = queue.submit("s2", "echo", ["hi"])
+    bad = queue.submit("s2", "echo", ["boom"])
+    queue.start(workers=2)
+    try:
+        deadline = time.time() + 10
+        while time.time() < deadline and any(queue.get(j)["status"] in jobs.PENDING for j in (ok, bad)):
+            time.sleep(0.05)
+    finally:
+        queue.stop()
+    assert queue.get(ok)["status"] == "done"
+    failed = queue.get(bad)
+    assert failed["status"] == "error" and "RuntimeError: boom" in failed["error"]
+    assert queue.latest("s2")["echo"]["id"] in (ok, bad)
@@ -0,0 +1,59 @@
+# tests/test_json_stream.py
+
+import json
+
+import pytest
+
+from app.core.json_stream import extract_json, ArrayItemStream
+
+
+def test_extract_plain_json():
+    assert extract_json('{"a": 1}') == {"a": 1}
+
+
+def test_extract_from_fence_and_prose():
+    text = 'Sure! Here it is:\n```json\n{"score": 4, "notes": ["x"]}\n```\nHope that helps.'
+    assert extract_json(text) == {"score": 4, "notes": ["x"]}
+
+
+def test_extract_skips_values_of_the_wrong_type():
+    text = 'Ranked [1, 2] as follows: {"questions": ["q1"]}'
+    assert extract_json(text, expect=dict) == {"questions": ["q1"]}
+    assert extract_json(text, expect=list) == [1, 2]
+
+
+def test_extract_raises_when_nothing_parses():
+    with pytest.raises(json.JSONDecodeError):
+        extract_json("no json here {oops")
+
+
+def _feed_all(stream, text, size):
+    out = []
+    for i in range(0, len(text), size):
+        out.extend(stream.feed(text[i:i + size]))
+    return out
+
+
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_array_items_arrive_as_they_close(size):
+    doc = ('```json\n{"topic": "graphs", "resources": ['
+           '{"title": "BFS [intro]", "url": "https://x/\\"q\\""}, '
+           '{"title": "DFS", "tags": ["a", "b"]}]}\n```')
+    stream = ArrayItemStream("resources")
+    items = _feed_all(stream, doc, size)
+    assert items == [{"title": "BFS [intro]", "url": 'https://x/"q"'}, {"title": "DFS", "tags": ["a", "b"]}]
+    assert stream.done and stream.count == 2
+
+
+def test_array_items_are_emitted_before_the_array_closes():
+    stream = ArrayItemStream()
+    assert stream.feed('[{"n": 1}, {"n"') == [{"n": 1}]
+    # strings close on their quote; bare scalars need the following , or ]
+    assert stream.feed(': 2}, 3, "four", null') == [{"n": 2}, 3, "four"]
+    assert stream.feed("]") == [None]
+    assert stream.feed(', [5]') == []
+
+
+def test_array_key_must_match():
+    stream = ArrayItemStream("weeks")
+    assert stream.feed('{"other": [1, 2], "weeks": [{"week": 1}]}') == [{"week": 1}]
@@ -0,0 +1,87 @@
+# tests/test_llm_cache.py
+
+import pytest
+
+from app.core import llm_cache as lc
+from app.core.db import SessionLocal, LLMCacheEntry
+from app.core.llm_cache import LLMCache
+
+
+class FakeTime:
+    """Stands in for the time module inside llm_cache; each read moves the clock by a tick."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        self.now += 0.001
+        return self.now
+
+    monotonic = time
+
+
+@pytest.fixture
+def clock(db, monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(lc, "time", fake)
+    LLMCache().clear()
+    return fake
+
+
+def _row(key):
+    with SessionLocal() as s:
+        return s.get(LLMCacheEntry, key)
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = LLMCache(default_ttl=60)
+    cache.put("ttl", "answer")
+    assert cache.get("ttl") == "answer"
+    clock.now += 61
+    assert cache.get("ttl") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_ttl_zero_never_expires(clock, monkeypatch):
+    monkeypatch.setattr(lc, "EVICT_EVERY", 1)
+    cache = LLMCache(default_ttl=60)
+    cache.put("forever", "kept", ttl=0)
+    assert _row("forever").expires_at is None
+    clock.now += 10 * 365 * 86400
+    cache.put("other", "x")                     # runs eviction
+    assert cache.get("forever") == "kept"
+
+
+def test_least_recently_used_rows_are_evicted_over_the_cap(clock, monkeypatch):
+    monkeypatch.setattr(lc, "EVICT_EVERY", 1)
+    cache = LLMCache(max_entries=3)
+    for key in ("a", "b", "c"):
+        cache.put(key, key)
+    assert cache.get("a") == "a"                # buffered touch, flushed before evicting
+    cache.put("d", "d")
+    assert [k for k in "abcd" if _row(k) is not None] == ["a", "c", "d"]
+
+
+def test_hits_are_buffered_and_written_in_one_batch(clock, monkeypatch):
+    monkeypatch.setattr(lc, "HIT_FLUSH_INTERVAL", 3600)
+    cache = LLMCache()
+    cache.put("hot", "v")
+    cache.put("warm", "v")
+    for _ in range(3):
+        cache.get("hot")
+    cache.get("warm")
+    assert _row("hot").hits == 0                # nothing written on the read path
+    assert cache.flush_hits() == 2
+    assert (_row("hot").hits, _row("warm").hits) == (3, 1)
+    assert cache.flush_hits() == 0
+
+
+def test_hit_batch_flushes_itself_when_due(clock, monkeypatch):
+    monkeypatch.setattr(lc, "HIT_FLUSH_MAX", 2)
+    cache = LLMCache()
+    cache.put("x", "v")
+    cache.put("y", "v")
+    cache.get("x")
+    assert _row("x").hits == 0
+    cache.get("y")                              # second distinct key reaches HIT_FLUSH_MAX
+    assert (_row("x").hits, _row("y").hits) == (1, 1)
@@ -0,0 +1,118 @@
+# tests/test_model_router.py
+
+import asyncio
+import time
+
+import pytest
+
+from app.core import model_router as mr
+from app.core.model_router import ModelRouter
+
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setattr(mr, "HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(mr, "HEDGE_MIN_DELAY", 0.05)
+    return ModelRouter(routes={"default": "standard", "parser": "fast"},
+                       models={"fast": "m-fast", "standard": "m-std"},
+                       fallbacks={"fast": "standard", "standard": "fast"}, hedge=True)
+
+
+def _warm(router, model, latency=0.01, ok=True, n=5):
+    for _ in range(n):
+        router.stats_for(model).add(latency, ok=ok)
+
+
+def test_routes_resolve_to_tier_models(router):
+    assert router.route("parser") == ("m-fast", "m-std")
+    assert router.route("unknown") == ("m-std", "m-fast")
+
+
+def test_no_hedge_until_enough_samples(router):
+    assert router.hedge_delay("m-std") is None
+    _warm(router, "m-std")
+    assert router.hedge_delay("m-std") == 0.05     # p95 below the floor
+
+
+def test_slow_primary_is_hedged_to_the_fallback(router):
+    _warm(router, "m-std")
+
+    def fn(model):
+        time.sleep(0.5 if model == "m-std" else 0.01)
+        return model
+
+    start = time.monotonic()
+    assert router.call("m-std", "m-fast", fn) == ("m-fast", "m-fast")
+    assert time.monotonic() - start < 0.3          # hedge delay + fallback, not the slow primary
+    assert router.counters["hedged"] == 1 and router.counters["hedge_wins"] == 1
+
+
+def test_fast_primary_is_not_hedged(router):
+    _warm(router, "m-std")
+    assert router.call("m-std", "m-fast", lambda m: m) == ("m-std", "m-std")
+    assert router.counters["hedged"] == 0
+    assert router._pool is None                    # the hedge pool is for duplicates only
+
+
+def test_primaries_are_not_capped_by_the_hedge_pool(router, monkeypatch):
+    import threading
+    monkeypatch.setattr(mr, "HEDGE_WORKERS", 1)
+    monkeypatch.setattr(mr, "HEDGE_MIN_DELAY", 5.0)
+    _warm(router, "m-std")
+    gate = threading.Barrier(4)
+
+    def fn(model):
+        gate.wait(timeout=2)     # every primary must be running at once to pass
+        return model
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(router.call("m-std", "m-fast", fn)))
+               for _ in range(3)]
+    for t in threads:
+        t.start()
+    assert router.call("m-std", "m-fast", fn) == ("m-std", "m-std")
+    for t in threads:
+        t.join()
+    assert len(results) == 3
+
+
+def test_async_hedge_cancels_the_loser(router):
+    _warm(router, "m-std")
+    cancelled = []
+
+    async def fn(model):
+        async def request():
+            try:
+                await asyncio.sleep(0.5 if model == "m-std" else 0.01)
+            except asyncio.CancelledError:
+                cancelled.append(model)
+                raise
+            return model
+        return await router.aobserve(model, request())
+
+    async def main():
+        result = await router.acall("m-std", "m-fast", fn)
+        await asyncio.sleep(0)
+        return result
+
+    start = time.monotonic()
+    assert asyncio.run(main()) == ("m-fast", "m-fast")
+    assert time.monotonic() - start < 0.3
+    assert cancelled == ["m-std"]
+    # the cancelled loser is neither a latency sample nor a success
+    assert len(router.stats_for("m-std").samples) == 5
+    assert len(router.stats_for("m-fast").samples) == 1
+
+
+def test_failing_tier_is_rerouted(router):
+    _warm(router, "m-std", ok=False)
+    assert router.route("unknown") == ("m-fast", "m-std")
+
+
+def test_stream_observations_count_errors_but_not_latency(router):
+    router.observe("m-std", lambda: None, latency=False)
+    with pytest.raises(RuntimeError):
+        router.observe("m-std", lambda: (_ for _ in ()).throw(RuntimeError("x")), latency=False)
+    stats = router.stats_for("m-std")
+    assert stats.latencies() == []
+    assert stats.error_rate() == 0.5
@@ -0,0 +1,104 @@
+# tests/test_pipeline.py
+
+import pytest
+
+from app.core.context_store import ContextStore
+from app.core.pipeline import Node, Pipeline
+
+from main import build_pipeline
+
+
+def _writer(key, value, calls, name):
+    def fn(ctx):
+        calls.append(name)
+        ctx.set(key, value(ctx) if callable(value) else value)
+    return fn
+
+
+def _plan(calls, fail=()):
+    def topics(ctx):
+        calls.append("parser")
+        if "parser" in fail:
+            raise RuntimeError("bad plan")
+        ctx.set("topics_flat", ctx.get("interview_plan").split())
+
+    def research(ctx):
+        calls.append("research")
+        for t in ctx.get("topics_flat"):
+            ctx.set(f"resources::{t}", [t])
+
+    return Pipeline([
+        Node("planner", _writer("interview_plan", lambda c: f"{c.get('goal')} graphs", calls, "planner"),
+             reads=("goal",), writes=("interview_plan",)),
+        Node("parser", topics, reads=("interview_plan",), writes=("topics_flat",)),
+        Node("research", research, reads=("topics_flat",), writes=("resources::*",)),
+        Node("digest", _writer("digest", lambda c: sorted(c.keys()), calls, "digest"),
+             reads=("resources::*",), writes=("digest",)),
+        Node("mock", _writer("mock_session", "q", calls, "mock"), reads=("mock_role",), writes=("mock_session",)),
+    ])
+
+
+def _ctx(**values):
+    ctx = ContextStore()
+    for k, v in values.items():
+        ctx.set(k, v)
+    return ctx
+
+
+def test_dependencies_follow_reads_and_writes_including_globs():
+    deps = _plan([]).deps
+    assert deps == {"planner": [], "parser": ["planner"], "research": ["parser"],
+                    "digest": ["research"], "mock": []}
+
+
+def test_cycles_and_duplicate_names_are_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        Pipeline([Node("a", None, reads=("x",), writes=("y",)), Node("b", None, reads=("y",), writes=("x",))])
+    with pytest.raises(ValueError, match="Duplicate"):
+        Pipeline([Node("a", None), Node("a", None)])
+
+
+def test_second_run_skips_unchanged_nodes_and_reruns_downstream_of_a_change():
+    calls = []
+    pipeline, ctx = _plan(calls), _ctx(goal="arrays", mock_role="SWE")
+    assert set(pipeline.run(ctx).values()) == {"ran"}
+
+    calls.clear()
+    assert set(pipeline.run(ctx).values()) == {"skipped"} and calls == []
+
+    ctx.set("goal", "trees")
+    status = pipeline.run(ctx)
+    assert status["mock"] == "skipped"
+    assert {n for n, s in status.items() if s == "ran"} == {"planner", "parser", "research", "digest"}
+
+
+def test_missing_outputs_and_force_rerun_a_node():
+    calls = []
+    pipeline, ctx = _plan(calls), _ctx(goal="arrays", mock_role="SWE")
+    pipeline.run(ctx)
+    ctx.delete("mock_session")
+    calls.clear()
+    assert pipeline.run(ctx)["mock"] == "ran" and calls == ["mock"]
+    assert set(pipeline.run(ctx, force=True).values()) == {"ran"}
+
+
+def test_failure_blocks_downstream_and_is_retried_next_run():
+    calls, fail = [], {"parser"}
+    pipeline, ctx = _plan(calls, fail), _ctx(goal="arrays", mock_role="SWE")
+    events = []
+    status = pipeline.run(ctx, on_event=lambda n, s: events.append((n, s)))
+    assert status["parser"] == "failed: bad plan"
+    assert status["research"] == status["digest"] == "blocked"
+    assert status["planner"] == status["mock"] == "ran"
+    assert dict(events) == status
+
+    fail.clear()
+    calls.clear()
+    status = pipeline.run(ctx)
+    assert status["planner"] == "skipped" and calls == ["parser", "research", "digest"]
+
+
+def test_headless_pipeline_wires_the_agents():
+    deps = build_pipeline(ContextStore()).deps
+    assert deps["parser"] == ["planner"] and deps["research"] == ["parser"]
+    assert deps["planner"] == [] and deps["mock"] == []
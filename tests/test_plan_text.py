@@ -0,0 +1,86 @@
+# tests/test_plan_text.py
+
+from app.core.plan_text import parse_plan, normalize_topic, dedupe_topics, MAX_TOPICS_PER_WEEK
+from app.agents.plan_parser_agent import MIN_CONFIDENCE
+
+PLAN = """\
+**Week 1: Arrays and Strings**
+- Review arrays and strings
+- Practice 15 LeetCode problems on two pointers and sliding window
+- Learn hashing & prefix sums
+
+**Week 2: Trees and Graphs**
+- Study binary trees, BSTs, and heaps
+- Graphs: BFS, DFS, topological sort
+- Solve 10 problems per day
+
+**Week 3: System Design**
+- Understand A/B testing and experimentation
+- Caching, load balancing, and sharding
+- Do 3 full mock interviews
+
+**Week 4: ML System Design & Review**
+- ML system design
+- Review weak areas
+- Rest before the interview
+"""
+
+
+def _topics(data):
+    return {w["week"]: w["topics"] for w in data["weeks"]}
+
+
+def test_parses_week_layout():
+    data, confidence = parse_plan(PLAN)
+    topics = _topics(data)
+    assert topics[1] == ["arrays", "strings", "two pointers", "sliding window", "hashing", "prefix sums"]
+    assert topics[2] == ["binary trees", "bsts", "heaps", "graphs", "bfs", "dfs", "topological sort"]
+    assert topics[4] == ["ml system design"]
+    assert confidence == 1.0
+
+
+def test_slashes_survive_and_activities_are_dropped():
+    topics = _topics(parse_plan(PLAN)[0])[3]
+    assert "a/b testing" in topics
+    assert not any("mock" in t or "problems" in t for t in topics)
+
+
+def test_truncation_lowers_confidence():
+    line = "Week 1: " + ", ".join(f"topic{i}" for i in range(MAX_TOPICS_PER_WEEK + 5))
+    data, confidence = parse_plan(line)
+    assert len(data["weeks"][0]["topics"]) == MAX_TOPICS_PER_WEEK
+    assert confidence < MIN_CONFIDENCE
+
+
+def test_language_names_are_not_split():
+    data, confidence = parse_plan("Week 1: Foundations\n- Review C++ STL and C# basics\n- Arrays & strings\n"
+                                  "Week 2: Languages\n- F# + Rust\n- R&D notes")
+    topics = _topics(data)
+    assert topics[1] == ["c++ stl", "c# basics", "arrays", "strings"]
+    assert topics[2] == ["f#", "rust", "r&d notes"]
+    assert confidence >= MIN_CONFIDENCE
+    assert normalize_topic("## C# generics") == "c# generics"
+
+
+def test_stub_topics_and_empty_weeks_fall_back_to_the_llm():
+    _, confidence = parse_plan("Week 1: C, STL, hashing\nWeek 2: graphs, trees")
+    assert confidence < MIN_CONFIDENCE
+    data, confidence = parse_plan("Week 1: arrays, strings\nWeek 2: Mock Interviews\n- Do 3 mock interviews\n"
+                                  "- Design a URL shortener")
+    assert _topics(data)[2] == []
+    assert confidence < MIN_CONFIDENCE
+
+
+def test_skipped_weeks_lower_confidence():
+    _, confidence = parse_plan("Week 1: arrays, strings\nWeek 3: graphs, trees")
+    assert confidence == 0.5
+
+
+def test_unstructured_text_has_no_confidence():
+    assert parse_plan("Just study hard and sleep well.") == ({"weeks": []}, 0.0)
+    assert parse_plan("") == ({"weeks": []}, 0.0)
+
+
+def test_topic_normalisation_and_dedupe():
+    assert normalize_topic("  Dynamic   Programming. ") == normalize_topic("dynamic programming")
+    assert dedupe_topics(["Graphs", "graphs", "Trees"]) == ["graphs", "trees"]
@@ -0,0 +1,48 @@
+# tests/test_question_bank.py
+
+import time
+
+from sqlalchemy import update
+
+from app.core.db import SessionLocal, QuestionBankEntry, log_mock_turn
+from app.core.question_bank import QuestionBank, bank_key
+
+
+def _set(role, focus, question, **values):
+    role_key, focus_key = bank_key(role, focus)
+    with SessionLocal() as s:
+        s.execute(update(QuestionBankEntry).where(
+            QuestionBankEntry.role_key == role_key, QuestionBankEntry.focus_key == focus_key,
+            QuestionBankEntry.question == question).values(**values))
+        s.commit()
+
+
+def test_take_skips_answered_questions_despite_whitespace_and_case(db):
+    bank = QuestionBank()
+    bank.add("qb-role", "normalise", ["Explain a hash map.", "What is a heap?"])
+    log_mock_turn("qb-user", "  explain a  HASH map. ", "answer", {"score": 4}, sync=True)
+    assert bank.take("qb-role", "normalise", 5, user="qb-user") == ["What is a heap?"]
+    assert bank.take("qb-role", "normalise", 5, exclude=["what is a heap?"]) == ["Explain a hash map."]
+
+
+def test_take_prefers_less_served_fresher_and_harder_questions(db):
+    bank = QuestionBank()
+    bank.add("qb-role", "rank", ["served", "old", "easy", "hard", "plain"])
+    now = time.time()
+    _set("qb-role", "rank", "served", times_served=3)
+    _set("qb-role", "rank", "old", created_at=now - 30 * 86400)       # 1.5 servings' worth of age
+    _set("qb-role", "rank", "easy", answers=4, score_sum=20.0, score_count=4)
+    _set("qb-role", "rank", "hard", answers=4, score_sum=4.0, score_count=4)
+    assert bank.take("qb-role", "rank", 5) == ["hard", "plain", "old", "easy", "served"]
+    assert bank.take("qb-role", "rank", 2) == ["hard", "plain"]
+
+
+def test_sync_stats_feeds_the_ranking(db):
+    bank = QuestionBank()
+    bank.add("qb-role", "sync", ["aced", "missed"])
+    bank.sync_stats()
+    for _ in range(3):
+        log_mock_turn("qb-sync", "aced", "a", {"score": 5}, sync=True)
+        log_mock_turn("qb-sync", "missed", "a", {"score": 1}, sync=True)
+    assert bank.sync_stats() >= 6
+    assert bank.take("qb-role", "sync", 2) == ["missed", "aced"]
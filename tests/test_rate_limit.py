@@ -0,0 +1,134 @@
+# tests/test_rate_limit.py
+
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.core import rate_limit
+from app.core.rate_limit import AdaptiveConcurrency, RateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _limiter(clock, rpm=60, tpm=6000, max_retries=2):
+    limiter = RateLimiter(rpm=rpm, tpm=tpm, max_retries=max_retries)
+    limiter.requests = TokenBucket(rpm, clock=clock)
+    limiter.tokens = TokenBucket(tpm, clock=clock)
+    return limiter
+
+
+def _response(status, headers=None):
+    return httpx.Response(status, headers=headers or {}, request=httpx.Request("POST", "https://api.test/v1"))
+
+
+def _rate_limited(retry_after=None):
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else None
+    return openai.RateLimitError("slow down", response=_response(429, headers), body=None)
+
+
+def test_bucket_refills_continuously_and_reports_the_wait():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock)           # one unit per second
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(2) == pytest.approx(2.0)
+    clock.now += 2
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    clock.now += 120                                 # refill stops at capacity
+    bucket.reserve(0)
+    assert bucket.tokens == 60
+
+
+def test_oversize_reservation_does_not_deadlock():
+    bucket = TokenBucket(60, clock=FakeClock())
+    assert bucket.reserve(10_000) == 0.0             # clamped to one minute of budget
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_usage_is_settled_in_both_directions():
+    clock = FakeClock()
+    limiter = _limiter(clock)
+    limiter._settle(1000, SimpleNamespace(total_tokens=400))
+    assert limiter.tokens.tokens == 6000             # refund capped at capacity
+    limiter.tokens.reserve(1000)
+    limiter._settle(1000, SimpleNamespace(total_tokens=1500))
+    assert limiter.tokens.tokens == pytest.approx(4500)
+    limiter._settle(1000, None)
+    assert limiter.tokens.tokens == pytest.approx(4500)
+
+
+def test_aimd_grows_slowly_halves_on_throttling_and_backs_off_on_latency():
+    c = AdaptiveConcurrency(initial=4, min_limit=1, max_limit=8, target_latency=1.0)
+    for _ in range(4):
+        c.acquire()
+        c.release(latency=0.1)
+    assert c.limit == pytest.approx(5.0, abs=0.1)
+    c.acquire()
+    c.release(throttled=True)
+    assert c.limit == pytest.approx(2.5, abs=0.05)
+    c.acquire()
+    c.release(latency=5.0)
+    assert c.limit == pytest.approx(2.25, abs=0.05)
+    for _ in range(10):
+        c.acquire()
+        c.release(throttled=True)
+    assert c.limit == 1 and c.in_flight == 0
+
+
+def test_retryable_errors_back_off_and_honour_retry_after(monkeypatch):
+    monkeypatch.setattr(rate_limit.random, "uniform", lambda a, b: b)
+    limiter = _limiter(FakeClock())
+    limiter.concurrency.acquire()
+    assert limiter._failed(0, _rate_limited(retry_after=7), 100) == pytest.approx(7 + rate_limit.BACKOFF_BASE)
+    limiter.concurrency.acquire()
+    assert limiter._failed(1, openai.APIConnectionError(request=httpx.Request("POST", "https://api.test")), 100) \
+        == pytest.approx(rate_limit.BACKOFF_BASE * 2)
+    assert limiter.counters["throttled"] == 1 and limiter.counters["retries"] == 1
+
+
+def test_non_retryable_errors_give_up_and_refund():
+    limiter = _limiter(FakeClock())
+    limiter.tokens.reserve(500)
+    limiter.concurrency.acquire()
+    bad = openai.BadRequestError("nope", response=_response(400), body=None)
+    assert limiter._failed(0, bad, 500) is None
+    assert limiter.tokens.tokens == 6000
+    limiter.concurrency.acquire()
+    assert limiter._failed(0, ValueError("bug"), 0) is None
+
+
+def test_call_retries_then_succeeds(monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "sleep", lambda s: None)
+    limiter = _limiter(FakeClock())
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _rate_limited(retry_after=0)
+        return SimpleNamespace(usage=SimpleNamespace(total_tokens=10))
+
+    messages = [{"role": "user", "content": "hi"}]
+    assert limiter.call(fn, messages, "gpt-4o-mini", max_tokens=50).usage.total_tokens == 10
+    assert len(attempts) == 3 and limiter.concurrency.in_flight == 0
+    assert limiter.requests.tokens == pytest.approx(57)    # one request per attempt
+
+
+def test_call_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "sleep", lambda s: None)
+    limiter = _limiter(FakeClock(), max_retries=2)
+
+    def fn():
+        raise _rate_limited(retry_after=0)
+
+    with pytest.raises(openai.RateLimitError):
+        limiter.call(fn, [{"role": "user", "content": "hi"}], "gpt-4o-mini", max_tokens=50)
+    assert limiter.counters["failures"] == 1 and limiter.concurrency.in_flight == 0
+    assert limiter.tokens.tokens == 6000
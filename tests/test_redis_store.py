@@ -0,0 +1,35 @@
+# tests/test_redis_store.py
+
+from app.core.redis_store import RedisContextStore, InMemoryRedis
+
+
+def _replicas(n=2):
+    shared = {}
+    return [RedisContextStore(namespace="ns", client=InMemoryRedis(shared), validate_interval=0)
+            for _ in range(n)]
+
+
+def test_replicas_see_each_others_writes():
+    a, b = _replicas()
+    a.set("k", 1)
+    assert b.get("k") == 1
+    a.set("k", 2)
+    assert b.get("k") == 2
+
+
+def test_delete_then_reset_invalidates_other_replicas():
+    a, b = _replicas()
+    a.set("k", "old")
+    assert b.get("k") == "old"        # now cached on b
+    a.delete("k")
+    a.set("k", "new")                 # b never looked in between
+    assert b.get("k") == "new"
+
+
+def test_delete_is_seen_by_other_replicas():
+    a, b = _replicas()
+    a.set("k", 1)
+    assert b.get("k") == 1
+    a.delete("k")
+    assert b.get("k", "gone") == "gone"
+    assert b.keys() == set()
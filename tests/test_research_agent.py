@@ -0,0 +1,33 @@
+# tests/test_research_agent.py
+
+import asyncio
+
+from app.agents.research_agent import ResearchAgent
+from app.core.context_store import ContextStore
+
+
+class FlakyResearch(ResearchAgent):
+    def run(self, topic):
+        if topic == "graphs":
+            raise RuntimeError("upstream 500")
+        return [{"title": topic, "url": "", "type": "doc", "why": ""}]
+
+    async def arun(self, topic):
+        await asyncio.sleep(0)
+        return self.run(topic)
+
+
+def _agent():
+    return FlakyResearch("research", ContextStore())
+
+
+def test_arun_many_keeps_other_topics_when_one_fails():
+    out = asyncio.run(_agent().arun_many(["arrays", "graphs", "heaps"]))
+    assert [r["title"] for r in out["arrays"]] == ["arrays"]
+    assert [r["title"] for r in out["heaps"]] == ["heaps"]
+    assert out["graphs"][0]["type"] == "note" and "upstream 500" in out["graphs"][0]["why"]
+
+
+def test_run_many_and_arun_many_report_failures_alike():
+    agent = _agent()
+    assert dict(agent.run_many(["graphs", "arrays"])) == asyncio.run(agent.arun_many(["graphs", "arrays"]))
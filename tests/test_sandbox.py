@@ -0,0 +1,60 @@
+# tests/test_sandbox.py
+
+import os
+
+import pytest
+
+from app.core.sandbox import Sandbox, profile_code
+
+sandbox = Sandbox(workers=2)
+
+
+def _run(code: str):
+    return sandbox.submit(code + "\n\ndef solve(nums):\n    return sum(nums)\n", wall=10).result()
+
+
+def test_measures_a_plain_solution():
+    result = profile_code("def solve(nums):\n    return sorted(nums)\n")["candidate"]
+    assert result["ok"] and result["entry"] == "solve"
+    assert result["complexity"]["best"] is not None
+
+
+@pytest.mark.parametrize("code", [
+    "open(os.environ.get('X', '/etc/hostname')).read()",
+    "open('/proc/1/environ').read()",
+    "open('../' + 'x').read()",
+])
+def test_reads_outside_the_job_directory_are_refused(code):
+    result = _run("import os\n" + code)
+    assert not result["ok"] and "PermissionError" in result["error"]
+
+
+def test_app_database_is_unreadable():
+    path = os.environ["DATABASE_URL"].split("sqlite:///", 1)[1]
+    open(path, "ab").close()
+    result = _run(f"open({path!r}, 'rb').read()")
+    assert not result["ok"] and "PermissionError" in result["error"]
+
+
+def test_stdlib_imports_still_work():
+    assert _run("import collections, heapq, bisect, json, itertools")["ok"]
+
+
+@pytest.mark.parametrize("code", [
+    "import os; os.fork()",
+    "import os; os.posix_spawn('/bin/true', ['true'], {})",
+    "import os; os.system('true')",
+    "import _posixsubprocess",
+    "import subprocess",
+    "import socket; socket.socket()",
+])
+def test_process_creation_and_network_are_refused(code):
+    result = _run(code)
+    assert not result["ok"] and "PermissionError" in result["error"]
+
+
+def test_child_does_not_load_subprocess_or_see_server_secrets():
+    code = ("import os, sys\n"
+            "assert '_posixsubprocess' not in sys.modules and 'subprocess' not in sys.modules\n"
+            "assert 'OPENAI_API_KEY' not in os.environ and 'DATABASE_URL' not in os.environ\n")
+    assert _run(code)["ok"]
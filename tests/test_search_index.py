@@ -0,0 +1,69 @@
+# tests/test_search_index.py
+
+import pytest
+from sqlalchemy import delete
+
+from app.core import search_index as si
+from app.core.db import SessionLocal, SearchDoc, SearchPosting
+
+
+@pytest.fixture
+def index(db):
+    with SessionLocal() as s:
+        s.execute(delete(SearchPosting))
+        s.execute(delete(SearchDoc))
+        s.commit()
+    return si.SearchIndex(enabled=True)
+
+
+def test_bm25_ranks_title_matches_first(index):
+    index.add("graphs", [
+        {"title": "Dijkstra shortest paths", "url": "https://x/dijkstra", "type": "article", "why": "weighted graphs"},
+        {"title": "Graph traversal", "url": "https://x/bfs", "type": "video", "why": "BFS and DFS, then Dijkstra"},
+    ])
+    index.add("trees", [{"title": "Binary trees", "url": "https://x/trees", "type": "article", "why": "basics"}])
+    ranked = index.search("dijkstra")
+    assert [r["url"] for r in ranked] == ["https://x/dijkstra", "https://x/bfs"]
+    assert ranked[0]["score"] > ranked[1]["score"]
+    assert [r["url"] for r in index.search("dijkstra", type_filter="video")] == ["https://x/bfs"]
+    assert index.search("kubernetes") == []
+
+
+def test_same_resource_gains_topics_instead_of_duplicating(index):
+    r = {"title": "Graph traversal", "url": "https://x/bfs/", "type": "video"}
+    assert index.add("graphs", [r]) == 1
+    assert index.add("graphs", [dict(r, url="https://X/bfs")]) == 0
+    assert index.add("bfs", [r]) == 1
+    assert index.stats()["docs"] == 1
+    assert index.search("traversal")[0]["topics"] == "graphs, bfs"
+
+
+def test_losing_an_insert_race_merges_into_the_winner(index, monkeypatch):
+    r = {"title": "Heaps", "url": "https://x/heaps", "type": "article"}
+    index.add("heaps", [r])
+    real = si.SearchIndex._upsert
+    raced = []
+
+    def upsert(self, s, topic, res):
+        if not raced:
+            # our lookup ran before the other writer's insert committed
+            raced.append(True)
+            scalar, s.scalar = s.scalar, lambda *a, **k: None
+            try:
+                return real(self, s, topic, res)
+            finally:
+                s.scalar = scalar
+        return real(self, s, topic, res)
+
+    monkeypatch.setattr(si.SearchIndex, "_upsert", upsert)
+    assert index.add("priority queues", [r]) == 1
+    assert index.search("heaps")[0]["topics"] == "heaps, priority queues"
+
+
+def test_corpus_stats_expire(index, monkeypatch):
+    other = si.SearchIndex(enabled=True)
+    assert other.stats()["docs"] == 0
+    index.add("graphs", [{"title": "Graphs", "url": "https://x/g"}])
+    assert other.stats()["docs"] == 0          # cached in the other "process"
+    monkeypatch.setattr(si, "CORPUS_TTL", 0)
+    assert other.stats()["docs"] == 1
@@ -0,0 +1,87 @@
+# tests/test_service.py
+
+import asyncio
+import threading
+
+import app.service as service
+from app.core.context_store import ContextStore
+from app.core.mcp import BaseAgent
+from app.service import SessionRegistry
+
+
+class EchoAgent(BaseAgent):
+    reads = ("goal", "level")
+
+    def run(self, input_data):
+        return input_data
+
+
+def test_run_from_context_passes_the_read_keys():
+    ctx = ContextStore()
+    ctx.set("goal", "SWE")
+    ctx.set("level", "senior")
+    assert EchoAgent("echo", ctx).run_from_context() == {"goal": "SWE", "level": "senior"}
+
+    class OneKey(EchoAgent):
+        reads = ("goal",)
+    assert OneKey("one", ctx).run_from_context() == "SWE"
+
+
+def test_eviction_save_does_not_hold_the_registry(db, monkeypatch):
+    release, saving = threading.Event(), threading.Event()
+    saved = []
+
+    def slow_save(store, namespace):
+        saving.set()
+        release.wait(5)
+        saved.append(namespace)
+        return 0
+
+    monkeypatch.setattr(service, "save_context_delta", slow_save)
+
+    async def scenario():
+        reg = SessionRegistry(max_sessions=1)
+        await reg.get("slow-a")
+        await reg.get("slow-b")                              # evicts slow-a
+        await asyncio.to_thread(saving.wait, 5)
+        await asyncio.wait_for(reg.get("slow-c"), 2)         # not stuck behind the save
+        reloading = asyncio.ensure_future(reg.get("slow-a"))
+        await asyncio.sleep(0.05)
+        assert not reloading.done()                          # waits for its own save
+        release.set()
+        await asyncio.wait_for(reloading, 2)
+
+    asyncio.run(scenario())
+    assert saved[0] == SessionRegistry.namespace("slow-a")
+
+
+def test_requests_on_one_session_run_one_at_a_time(db):
+    active, overlaps = [], []
+
+    async def request(reg, i):
+        async with reg.session("serial") as store:
+            active.append(i)
+            overlaps.append(len(active))
+            await asyncio.sleep(0.01)
+            store.set("last", i)
+            active.remove(i)
+
+    async def scenario():
+        reg = SessionRegistry()
+        await asyncio.gather(*(request(reg, i) for i in range(5)))
+
+    asyncio.run(scenario())
+    assert max(overlaps) == 1
+
+
+def test_evicted_session_is_reloaded_with_its_writes(db):
+    async def scenario():
+        reg = SessionRegistry(max_sessions=1)
+        async with reg.session("keep-a") as store:
+            store.set("goal", "staff engineer")
+        async with reg.session("keep-b"):
+            pass
+        async with reg.session("keep-a") as store:
+            return store.get("goal")
+
+    assert asyncio.run(scenario()) == "staff engineer"
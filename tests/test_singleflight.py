@@ -0,0 +1,122 @@
+# tests/test_singleflight.py
+
+import asyncio
+import threading
+import time
+
+from app.core.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return "value"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do("k", fn)))
+    leader.start()
+    started.wait(2)
+    followers = [threading.Thread(target=lambda: results.append(flights.do("k", fn))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    while flights.stats()["coalesced"] < 3:
+        time.sleep(0.001)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(2)
+    assert results == ["value"] * 4 and len(calls) == 1
+    assert flights.in_flight() == 0
+
+
+def test_leader_failure_reaches_every_waiter_and_is_not_cached():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def boom():
+        started.set()
+        release.wait(2)
+        raise ValueError("upstream down")
+
+    errors = []
+
+    def call():
+        try:
+            flights.do("k", boom)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait(2)
+    threads.append(threading.Thread(target=call))
+    threads[1].start()
+    while flights.stats()["coalesced"] < 1:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(2)
+    assert errors == ["upstream down"] * 2
+    assert flights.do("k", lambda: "recovered") == "recovered"
+
+
+def test_async_waiters_get_the_leaders_exception():
+    flights = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise KeyError("x")
+
+    async def main():
+        return await asyncio.gather(flights.ado("k", boom), flights.ado("k", boom), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, KeyError) for r in results)
+    assert flights.stats()["executed"] == 1
+
+
+def test_thread_caller_waits_on_a_coroutine_leader():
+    flights = SingleFlight()
+    started = threading.Event()
+    results = []
+
+    async def fetch():
+        started.set()
+        await asyncio.sleep(0.05)
+        return "from loop"
+
+    def other_thread():
+        started.wait(2)
+        results.append(flights.do("k", lambda: "own call"))
+
+    t = threading.Thread(target=other_thread)
+    t.start()
+    assert asyncio.run(flights.ado("k", fetch)) == "from loop"
+    t.join(2)
+    assert results == ["from loop"]
+
+
+def test_sync_call_on_the_leaders_loop_runs_directly_instead_of_deadlocking():
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "async"
+
+    async def main():
+        leader = asyncio.ensure_future(flights.ado("k", fetch))
+        await asyncio.sleep(0)                   # the leader is now in flight on this loop
+        inline = flights.do("k", lambda: "sync")  # would block the loop the leader runs on
+        return inline, await leader
+
+    result = []
+    t = threading.Thread(target=lambda: result.append(asyncio.run(main())), daemon=True)
+    t.start()
+    t.join(2)
+    assert result == [("sync", "async")]
+    assert flights.stats()["bypassed"] == 1
@@ -0,0 +1,34 @@
+# tests/test_solution_reference.py
+
+import json
+
+from app.agents.coding_agent import CodingAgent
+from app.agents.feedback_agent import FeedbackAgent
+from app.core.context_store import ContextStore
+from app.core.jobs import HANDLERS
+
+SOLUTION = {"language": "python", "solution_code": "def solve(nums):\n    return sorted(nums)\n",
+            "explanation": "sort", "complexity": {"time": "O(n log n)", "space": "O(n)"}}
+
+
+def _solved(problem):
+    ctx = ContextStore()
+    result = CodingAgent("coding", ctx)._finish(json.dumps(SOLUTION), {"problem": problem})
+    return ctx, result
+
+
+def test_solution_result_is_returned_unchanged():
+    ctx, result = _solved("Sort the array")
+    assert result == SOLUTION and "problem" not in ctx.get("last_solution")
+    assert ctx.get("last_solution_problem") == "Sort the array"
+
+
+def test_feedback_uses_the_reference_only_for_the_same_problem():
+    ctx, _ = _solved("Sort  the array")
+    feedback = FeedbackAgent("feedback", ctx)
+    assert feedback._reference({"problem": "sort the ARRAY"}) == SOLUTION
+    assert feedback._reference({"problem": "Reverse a list"}) is None
+
+
+def test_feedback_job_is_seeded_with_the_solved_problem():
+    assert set(HANDLERS["feedback"].reads) >= set(CodingAgent.writes)
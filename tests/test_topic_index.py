@@ -0,0 +1,56 @@
+# tests/test_topic_index.py
+
+from app.core.topic_index import TopicIndex, canonical_topic, similarity, same_terms, minhash, band_buckets
+
+
+def test_canonical_topic_ignores_order_case_and_plurals():
+    assert canonical_topic("Binary-Trees") == canonical_topic("binary tree")
+    assert canonical_topic("Trees, Binary") == canonical_topic("binary trees")
+
+
+def test_similarity_ranks_near_duplicates_higher():
+    key = canonical_topic("dynamic programming")
+    assert similarity(key, key) == 1.0
+    near = similarity(key, canonical_topic("dynamic programing"))
+    far = similarity(key, canonical_topic("graph algorithms"))
+    assert near > 0.7 > far
+
+
+def test_language_names_keep_their_symbols():
+    assert canonical_topic("C# templates") == "c# template"
+    assert canonical_topic("C# templates") != canonical_topic("C++ templates")
+
+
+def test_same_terms_allows_spelling_but_not_extra_words():
+    key = canonical_topic("dynamic programming")
+    assert same_terms(key, canonical_topic("dynamic programing"))
+    assert same_terms(canonical_topic("hash map"), canonical_topic("hashmap"))
+    assert not same_terms(key, canonical_topic("dynamic programming on trees"))
+    assert not same_terms(canonical_topic("binary tree"), canonical_topic("binary trie"))
+
+
+def test_minhash_is_deterministic_and_bands_collide_for_near_duplicates():
+    a, b = canonical_topic("hash map"), canonical_topic("hashmap")
+    assert minhash(a) == minhash(a)
+    assert set(band_buckets(minhash(a))) & set(band_buckets(minhash(b)))
+
+
+def test_lookup_finds_exact_and_similar_topics(db):
+    index = TopicIndex(threshold=0.7)
+    resources = [{"title": "DP primer", "url": "https://x/dp"}]
+    index.add("Dynamic Programming", resources)
+    exact = index.lookup("dynamic programming")
+    assert exact["score"] == 1.0 and exact["resources"] == resources
+    similar = index.lookup("dynamic programing")
+    assert similar is not None and 0.7 <= similar["score"] < 1.0
+    assert index.lookup("operating systems") is None
+
+
+def test_lookup_reuses_variants_but_not_narrower_topics(db):
+    index = TopicIndex(threshold=0.7)
+    index.add("Binary Tree Traversal", [{"title": "Traversals", "url": "https://x/bt"}])
+    assert index.lookup("binary-trees traversals")["score"] == 1.0
+    index.add("Dynamic Programming", [{"title": "DP primer", "url": "https://x/dp"}])
+    assert index.lookup("dynamic programming on trees") is None
+    index.add("C++ templates", [{"title": "Templates", "url": "https://x/cpp"}])
+    assert index.lookup("C# templates") is None
@@ -0,0 +1,94 @@
+# tests/test_turn_writer.py
+
+import json
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.core import db as dbmod
+from app.core.db import MockTurnWriter, fetch_mock_history
+
+
+def _turn(session, question):
+    return {"session_id": session, "question": question, "answer": "a", "evaluation": {"score": 3}}
+
+
+def _questions(session):
+    return [r["question"] for r in fetch_mock_history(session)]
+
+
+@pytest.fixture
+def base(db, tmp_path):
+    return tmp_path / "turns.journal"
+
+
+def test_turns_reach_the_database_and_the_journal_is_removed(base):
+    w = MockTurnWriter(base, flush_interval=0.05)
+    for i in range(3):
+        w.submit(_turn("tw-basic", f"q{i}"))
+    assert w.flush(5)
+    assert _questions("tw-basic") == ["q0", "q1", "q2"]
+    w.close()
+    assert list(base.parent.iterdir()) == []
+
+
+def test_orphaned_journals_are_replayed_past_their_checkpoint(base):
+    dead = base.with_name(base.name + ".999999-deadbeef")
+    dead.write_text("".join(json.dumps(_turn("tw-orphan", f"q{i}")) + "\n" for i in range(3))
+                    + '{"torn": ')
+    base.with_name(dead.name + ".ckpt").write_text("1")
+    # the old single shared journal is adopted too
+    base.write_text(json.dumps(_turn("tw-orphan", "legacy")) + "\n")
+
+    w = MockTurnWriter(base, flush_interval=0.05)
+    assert w.stats["replayed"] == 3
+    assert w.flush(5)
+    assert sorted(_questions("tw-orphan")) == ["legacy", "q1", "q2"]
+    w.close()
+    assert list(base.parent.iterdir()) == []
+
+
+def test_a_live_writer_keeps_its_journal(base):
+    first = MockTurnWriter(base, flush_interval=60)
+    first.submit(_turn("tw-live", "mine"))
+    second = MockTurnWriter(base, flush_interval=0.05)
+    assert second.stats["replayed"] == 0
+    second.close()
+    assert first.flush(5)
+    first.close()
+    assert _questions("tw-live") == ["mine"]
+
+
+def test_flush_returns_while_the_database_is_down(base, monkeypatch):
+    def broken():
+        raise OperationalError("INSERT", {}, Exception("down"))
+
+    w = MockTurnWriter(base, flush_interval=0.01)
+    monkeypatch.setattr(dbmod, "SessionLocal", broken)
+    w.submit(_turn("tw-down", "kept"))
+    start = time.monotonic()
+    while w.stats["errors"] == 0 and time.monotonic() - start < 5:
+        time.sleep(0.01)
+    assert w.flush() is False
+    w.close(timeout=1)
+    monkeypatch.undo()
+
+    journals = [p for p in base.parent.iterdir() if not p.name.endswith(".ckpt")]
+    assert len(journals) == 1 and "kept" in journals[0].read_text()
+    again = MockTurnWriter(base, flush_interval=0.05)
+    assert again.stats["replayed"] == 1 and again.flush(5)
+    again.close()
+    assert _questions("tw-down") == ["kept"]
+
+
+def test_init_db_replays_orphans_at_startup(db, monkeypatch):
+    monkeypatch.setattr(dbmod, "_turn_writer", None)
+    base = dbmod.TURN_JOURNAL_PATH
+    base.with_name(base.name + ".999998-cafebabe").write_text(json.dumps(_turn("tw-startup", "crashed")) + "\n")
+    dbmod.init_db()
+    w = dbmod._turn_writer
+    assert w is not None and w.stats["replayed"] == 1
+    assert w.flush(5)
+    w.close()
+    assert _questions("tw-startup") == ["crashed"]